@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 # filename: __init__.py
-# modified: 2019-09-13
+# modified: 2026-10-18
 
-__version__ = "6.0.0"
-__date__    = "2021.03.12"
+__version__ = "6.1.0"
+__date__    = "2026.10.18"
 __author__  = "Rabbit"
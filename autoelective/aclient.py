@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: aclient.py
+# modified: 2026-10-18
+
+"""
+Awaitable counterparts of ElectiveClient and IAAAClient for the asyncio engine (see `aloop.py`).
+
+An async client owns a sync client and runs its requests in an executor, so the session,
+the request templates, the hooks of `hook.py` and the exceptions of `exceptions.py` are
+exactly those of the threaded engine: an exception raised by a hook in the executor
+thread is raised again by `await`. Properties and the methods without I/O are delegated
+to the sync client, which is also available as `client`.
+"""
+
+import asyncio
+import functools
+from .elective import ElectiveClient
+from .iaaa import IAAAClient
+
+
+def _async_method(name):
+
+    async def method(self, *args, **kwargs):
+        return await self._run(getattr(self._client, name), *args, **kwargs)
+
+    method.__name__ = name
+    return method
+
+
+class AsyncClient(object):
+
+    client_class = None
+
+    def __init__(self, *args, executor=None, **kwargs):
+        """
+        executor        where the requests run, default to the executor of the event loop
+        """
+        if self.__class__ is __class__:
+            raise NotImplementedError
+        self._client = self.__class__.client_class(*args, **kwargs)
+        self._executor = executor
+
+    @property
+    def client(self):
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+
+class AsyncIAAAClient(AsyncClient):
+
+    client_class = IAAAClient
+
+    oauth_home = _async_method("oauth_home")
+    oauth_login = _async_method("oauth_login")
+
+
+class AsyncElectiveClient(AsyncClient):
+
+    client_class = ElectiveClient
+
+    sso_login = _async_method("sso_login")
+    sso_login_dual_degree = _async_method("sso_login_dual_degree")
+    logout = _async_method("logout")
+    get_HelpController = _async_method("get_HelpController")
+    get_ShowResults = _async_method("get_ShowResults")
+    get_SupplyCancel = _async_method("get_SupplyCancel")
+    get_supplement = _async_method("get_supplement")
+    get_DrawServlet = _async_method("get_DrawServlet")
+    get_Validate = _async_method("get_Validate")
+    get_ElectSupplement = _async_method("get_ElectSupplement")
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: adapter.py
+# modified: 2026-10-18
+
+"""
+HTTPAdapter of BaseClient which times every request by phase into the HTTPStats of the
+client (see `histogram.py`):
+
+    dns         name resolution of a new connection
+    connect     TCP handshake of a new connection
+    tls         TLS handshake of a new connection
+    ttfb        from sending the request to the response headers, excluding the above
+    body        reading the response body
+    total       the whole `send`
+
+The phases of a new connection are measured by the connection classes of the pools, which
+hand them to the adapter through a thread-local, since a request is sent and its connection
+opened in the same thread. A request which doesn't open one reuses a kept-alive connection.
+
+A new connection is made through the Resolver of the adapter (see `resolver.py`), which
+resolves the host with its cache and races the connection across the addresses.
+
+The pools also record when each connection is put back, so the kept-alive connections of
+an idle session can be checked and reopened ahead of its next request (see `warmer.py`).
+"""
+
+import time
+import socket
+import threading
+from queue import Empty, Full
+from functools import partial
+from requests.adapters import HTTPAdapter
+from requests.utils import select_proxy
+from requests.exceptions import ConnectTimeout, ReadTimeout
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import NewConnectionError, ConnectTimeoutError
+from urllib3.util.connection import is_connection_dropped
+from .histogram import get_endpoint
+from .resolver import Resolver
+
+_local = threading.local()
+_default_resolver = Resolver(ttl=0)
+
+
+class _TimedConnectionMixin(object):
+
+    resolver = None # set by the pool
+
+    def _new_conn(self):
+        """
+        Resolve the host first to time it apart from the TCP handshake, then race the
+        connection across the addresses. Resolution errors are left to urllib3 to raise.
+        """
+        resolver = self.resolver or _default_resolver
+
+        t0 = time.perf_counter()
+        try:
+            addrs = resolver.resolve(self._dns_host.strip("[]"), self.port)
+        except socket.gaierror:
+            addrs = []
+        t1 = time.perf_counter()
+
+        if len(addrs) == 0:
+            return super()._new_conn()
+
+        timeout = self.timeout if isinstance(self.timeout, (int, float)) else socket.getdefaulttimeout()
+        try:
+            sock = resolver.connect(addrs, timeout, self.source_address, self.socket_options)
+        except socket.timeout as e:
+            raise ConnectTimeoutError(self, "Connection to %s timed out. (connect timeout=%s)" % (self.host, timeout)) from e
+        except OSError as e:
+            raise NewConnectionError(self, "Failed to establish a new connection: %s" % e) from e
+
+        self._connect_times = (t1 - t0, time.perf_counter() - t1)
+        return sock
+
+    def connect(self):
+        self._connect_times = (0.0, 0.0)
+        t0 = time.perf_counter()
+        super().connect()
+        t_dns, t_connect = self._connect_times
+        t_tls = max(0.0, time.perf_counter() - t0 - t_dns - t_connect) if self.__class__.is_tls else 0.0
+        _local.connect = (t_dns, t_connect, t_tls)
+
+
+class _HTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    is_tls = False
+
+class _HTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    is_tls = True
+
+class _PoolMixin(object):
+
+    def __init__(self, *args, resolver=None, **kwargs):
+        self._resolver = resolver
+        super().__init__(*args, **kwargs)
+
+    def _new_conn(self):
+        conn = super()._new_conn()
+        conn.resolver = self._resolver
+        return conn
+
+    def _put_conn(self, conn):
+        if conn is not None:
+            conn.idle_since = time.monotonic()
+        super()._put_conn(conn)
+
+    def warm(self, max_idle):
+        """
+        Close the idle connections which are dropped or have been idle for max_idle s, and
+        open one if none of them is left. The idle connections are checked in place, so the
+        pool stays usable by the other requests of the session, only the slot of the one to
+        be opened is taken out meanwhile. The connections in use are left alone.
+        -> (opened, closed)
+        """
+        pool = self.pool
+        if pool is None: # closed
+            return (0, 0)
+
+        opened = closed = 0
+        kept = False
+        now = time.monotonic()
+        with pool.mutex:
+            for conn in pool.queue:
+                if conn is None or conn.sock is None:
+                    continue
+                if now - conn.idle_since < max_idle and not is_connection_dropped(conn):
+                    kept = True
+                else:
+                    conn.close()
+                    closed += 1
+        if kept:
+            return (opened, closed)
+
+        try:
+            conn = pool.get(block=False) # the slot to be got first
+        except Empty: # all in use
+            return (opened, closed)
+
+        try:
+            # a None is a slot where no connection is made yet
+            if conn is None:
+                conn = self._new_conn()
+            try:
+                conn.connect()
+            except Exception:
+                conn.close()
+                raise
+            conn.idle_since = time.monotonic()
+            opened += 1
+        finally:
+            try:
+                pool.put(conn, block=False)
+            except Full: # refilled by the other requests meanwhile
+                if conn is not None:
+                    conn.close()
+
+        return (opened, closed)
+
+
+class _HTTPConnectionPool(_PoolMixin, HTTPConnectionPool):
+    ConnectionCls = _HTTPConnection
+
+class _HTTPSConnectionPool(_PoolMixin, HTTPSConnectionPool):
+    ConnectionCls = _HTTPSConnection
+
+
+class InstrumentedHTTPAdapter(HTTPAdapter):
+
+    def __init__(self, stats, *args, resolver=None, **kwargs):
+        """
+        stats           HTTPStats to record into
+        resolver        Resolver of the new connections, None for no cache
+        """
+        self._stats = stats
+        self._resolver = resolver
+        super().__init__(*args, **kwargs)
+
+    @property
+    def stats(self):
+        return self._stats
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": partial(_HTTPConnectionPool, resolver=self._resolver),
+            "https": partial(_HTTPSConnectionPool, resolver=self._resolver),
+        }
+
+    def warm(self, request, max_idle, verify=True, proxies=None, cert=None):
+        """
+        Warm the pool of the host of request.url, see `_PoolMixin.warm`. Connections
+        through a proxy are left to the proxy.
+        -> (opened, closed)
+        """
+        if select_proxy(request.url, proxies):
+            return (0, 0)
+        if hasattr(self, "get_connection_with_tls_context"): # requests >= 2.32.2
+            pool = self.get_connection_with_tls_context(request, verify, proxies, cert)
+        else:
+            pool = self.get_connection(request.url, proxies)
+        return pool.warm(max_idle)
+
+    def send(self, request, stream=False, timeout=None, **kwargs):
+        endpoint = get_endpoint(request.url)
+        _local.connect = None
+        if timeout is not None:
+            self._stats.set_timeout(endpoint, timeout)
+
+        t0 = time.perf_counter()
+        try:
+            r = super().send(request, stream=stream, timeout=timeout, **kwargs)
+            t1 = time.perf_counter()
+            if not stream:
+                r.content  # read here to time it, Session.send() would read it anyway
+        except (ConnectTimeout, ReadTimeout) as e:
+            self._stats.add_timeout(endpoint, isinstance(e, ConnectTimeout), time.perf_counter() - t0)
+            raise
+        except Exception:
+            self._stats.add_error(endpoint)
+            raise
+        t2 = time.perf_counter()
+
+        connect = _local.connect
+        ttfb = t1 - t0
+        if connect is not None:
+            ttfb = max(0.0, ttfb - sum(connect))
+        nbytes = r.raw.tell() if hasattr(r.raw, "tell") else len(r.content)
+
+        self._stats.add(endpoint, connect, ttfb, t2 - t1, t2 - t0, nbytes)
+        return r
@@ -0,0 +1,520 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: aloop.py
+# modified: 2026-10-18
+
+"""
+The asyncio engine of the elective loop, selected by `--engine asyncio`.
+
+The threaded engine polls the pooled clients one after another in a single elective thread
+and logs them in through the IAAA thread. Here every pooled client is polled by its own
+task with its own pacing, the tasks start staggered by `refresh_interval / pool_size` so
+the page is refreshed at a steady rate, and a client which needs to login again does it in
+its own task while the others keep polling. Logins are serialized by a lock as the IAAA
+loop does. The rounds are handled by the same functions as the threaded engine in `loop.py`,
+so the hooks, exceptions, counters and logs are the same.
+
+It's an asyncio scheduler over worker threads rather than non-blocking I/O: the async
+clients of `aclient.py` run the blocking requests of the sync clients in an executor, with
+a worker per client since a client is used by one request at a time, and captcha
+recognition runs in its own executor. The event loop only paces and coordinates the
+clients, the concurrency of the requests is still that of the threads.
+
+Two clients may find the same course available at the same time, so an election holds the
+lock of its course, and a course elected by one client isn't elected again by the others
+until a page refreshed after the election shows whether it's really elected.
+
+A round holds the lock of its client, so with `refresh_hedge` a slow refresh is hedged on a
+client whose task is sleeping, and the round goes on with the client whose page wins. The
+lock of the other one is released when its request is done (see `hedge.py`), and if it
+failed for an expired session, its own task logs it in again before the next round.
+
+A task warms the connections of its client while it sleeps, holding the lock of the client,
+as the threaded engine does for the client of the next round (see `warmer.py`).
+"""
+
+import time
+import random
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from .aclient import AsyncElectiveClient, AsyncIAAAClient
+from .const import USER_AGENT_LIST
+from .exceptions import *
+from .parser import get_sida
+from .loop import environ, cout, username, password, is_dual_degree, identity, refresh_interval,\
+    supply_cancel_page, iaaa_client_timeout, iaaa_client_reuse, elective_client_timeout, login_loop_interval,\
+    elective_client_pool_size, captcha_confidence_threshold, captcha_max_low_confidence_skips,\
+    captcha_nbest_retries, recognizer, resolver, prefetcher, hedger, warmer, ignored,\
+    _ElectiveNeedsLogin, _ElectiveExpired, _create_adaptive_timeout, _get_refresh_interval, _get_warm_delay,\
+    _warm_clients, _add_captcha_result, _parse_validation, _parse_token, _on_login_success, _handle_iaaa_error,\
+    _load_rules, _print_header, _print_tasks, _print_client, _parse_courses, _dump_empty_page, _get_tasks,\
+    _is_mutex, _check_validation, _handle_election_error, _handle_elective_error
+
+_recognizeExecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="recognize")
+
+_iaaa = None
+_loginLock = None   # asyncio.Lock, created in the running event loop
+_courseLocks = {}   # { Course: asyncio.Lock }
+_electedAt = {}     # { Course: time of ElectionSuccess }, not yet confirmed by a refreshed page
+_clients = []       # [ AsyncElectiveClient ] of all tasks
+_clientLocks = {}   # { client id: asyncio.Lock }, held while the client is in use
+_needsRelogin = set() # { client id }, whose hedged request found it needs to login again
+
+
+async def _run_in_executor(executor, fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+def _get_course_lock(course):
+    lock = _courseLocks.get(course)
+    if lock is None:
+        lock = _courseLocks[course] = asyncio.Lock()
+    return lock
+
+def _forget_elections(elected, refreshed_at):
+    """
+    Drop the elections that a page requested after them doesn't show, so the course
+    can be elected again
+    """
+    for course, elected_at in list(_electedAt.items()):
+        if elected_at < refreshed_at and course not in elected:
+            del _electedAt[course]
+
+
+async def _sleep_and_warm(t, aelective):
+    """
+    sleep t s before the next round, and warm the connections of the client meanwhile,
+    unless it's lent to a hedged request, which keeps them warm anyway
+    """
+    elective = aelective.client
+    if warmer is None or not elective.has_logined:
+        await asyncio.sleep(t)
+        return
+    t0 = time.time()
+    await asyncio.sleep(_get_warm_delay(t))
+    lock = _clientLocks[elective.id]
+    if not lock.locked():
+        async with lock: # acquired at once, a hedge won't take the client while it's warmed
+            await _run_in_executor(None, warmer.warm, elective, max(0.0, t - (time.time() - t0)))
+    await asyncio.sleep(max(0.0, t - (time.time() - t0)))
+
+
+async def _login(aelective):
+
+    global _iaaa
+
+    elective = aelective.client
+
+    async with _loginLock:
+
+        while True:
+
+            environ.iaaa_loop += 1
+            user_agent = random.choice(USER_AGENT_LIST)
+
+            cout.info("Try to login IAAA (client: %s)" % elective.id)
+            cout.info("User-Agent: %s" % user_agent)
+
+            try:
+
+                if _iaaa is None or not iaaa_client_reuse:
+                    _iaaa = AsyncIAAAClient(timeout=iaaa_client_timeout, http_stats=environ.http_stats["iaaa"],
+                                            adaptive_timeout=_create_adaptive_timeout(), resolver=resolver)
+                else:
+                    _iaaa.clear_cookies() # start a new login, but keep the connections to IAAA
+                _iaaa.set_user_agent(user_agent)
+
+                t0 = time.time()
+                iaaa_connections = _iaaa.connections
+                elective_connections = elective.connections
+
+                # request elective's home page to get cookies
+                r = await _iaaa.oauth_home()
+
+                r = await _iaaa.oauth_login(username, password)
+                token = _parse_token(r)
+
+                t_token = time.time() - t0
+
+                if prefetcher is not None:
+                    await _run_in_executor(None, prefetcher.discard, elective) # captcha of the old session is useless
+                elective.clear_cookies()
+                elective.set_user_agent(user_agent)
+
+                r = await aelective.sso_login(token)
+
+                if is_dual_degree:
+                    sida = get_sida(r)
+                    sttp = identity
+                    referer = r.url
+                    r = await aelective.sso_login_dual_degree(sida, sttp, referer)
+
+                _on_login_success(elective, t_token, time.time() - t0,
+                                  max(0, _iaaa.connections - iaaa_connections),
+                                  max(0, elective.connections - elective_connections))
+                return
+
+            except Exception as e:
+                _handle_iaaa_error(e)
+
+            finally:
+                t = login_loop_interval
+                cout.info("")
+                cout.info("IAAA login loop sleep %s s" % t)
+                cout.info("")
+                await asyncio.sleep(t)
+
+
+async def _get_page(aelective):
+    """
+    -> (page_r, elected, plans), see `run_elective_loop` for the retry of non-first pages
+    """
+    if supply_cancel_page == 1:
+
+        cout.info("Get SupplyCancel page %s" % supply_cancel_page)
+
+        r = await aelective.get_SupplyCancel(username)
+        try:
+            elected, plans = _parse_courses(r)
+        except IndexError as e:
+            _dump_empty_page(r)
+            raise UnexceptedHTMLFormat
+        return r, elected, plans
+
+    retry = 3
+    while True:
+        if retry == 0:
+            raise OperationFailedError(msg="unable to get normal Supplement page %s" % supply_cancel_page)
+
+        cout.info("Get Supplement page %s" % supply_cancel_page)
+        r = await aelective.get_supplement(username, page=supply_cancel_page) # 双学位第二页
+        try:
+            elected, plans = _parse_courses(r)
+        except IndexError as e:
+            cout.warning("IndexError encountered")
+            cout.info("Get SupplyCancel first to prevent empty table returned")
+            _ = await aelective.get_SupplyCancel(username)
+        else:
+            return r, elected, plans
+        finally:
+            retry -= 1
+
+
+def _take_idle_client(aelective):
+    """
+    -> a logged-in client of another task to hedge on, locked, None if there is none
+    """
+    for other in _clients:
+        elective = other.client
+        lock = _clientLocks[elective.id]
+        if other is aelective or lock.locked() or elective.id in _needsRelogin:
+            continue
+        if elective.has_logined and not elective.is_expired:
+            return other
+    return None
+
+def _release_hedge_client(aelective, error):
+    """
+    Release a client whose hedged request is done, and leave it to its own task to login
+    again if its error needs it. A fatal error isn't raised again here.
+    """
+    elective = aelective.client
+    if error is not None:
+        try:
+            if _handle_elective_error(error, elective):
+                _needsRelogin.add(elective.id)
+        except Exception:
+            pass  # already logged
+    _clientLocks[elective.id].release()
+
+async def _get_page_hedged(aelective):
+    """
+    -> (aelective, page_r, elected, plans), where aelective is the client whose page wins,
+       the lock of the other client is released once its request is done
+    """
+    environ.hedge_counters["refreshes"] += 1
+
+    delay = hedger.get_delay(aelective.client)
+    if delay is None:
+        return (aelective,) + await _get_page(aelective)
+
+    primary = asyncio.ensure_future(_get_page(aelective))
+    done, _ = await asyncio.wait([primary], timeout=delay)
+    if len(done) > 0:
+        return (aelective,) + primary.result()
+
+    environ.hedge_counters["delayed"] += 1
+
+    other = _take_idle_client(aelective)
+    if other is None:
+        environ.hedge_counters["no_idle_client"] += 1
+        return (aelective,) + await primary
+
+    if not hedger.acquire():
+        return (aelective,) + await primary
+
+    lock = _clientLocks[other.client.id]
+    await lock.acquire() # it's unlocked, so it's acquired at once
+
+    cout.info("Refresh takes longer than %d ms, hedge it on client: %s" % (delay * 1000, other.client.id))
+
+    hedge = asyncio.ensure_future(_get_page(other))
+    clients = { primary: aelective, hedge: other }
+    winner = None
+    pending = { primary, hedge }
+
+    while winner is None and len(pending) > 0:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for future in (primary, hedge):
+            if future in done and future.exception() is None:
+                winner = future
+                break
+
+    if winner is None:
+        environ.hedge_counters["failed"] += 1
+        _release_hedge_client(other, hedge.exception())
+        return (aelective,) + primary.result()  # raise the error of the original client
+
+    t_won = time.time()
+    loser = hedge if winner is primary else primary
+    hedger.record_result(winner is hedge)
+    cout.info("Page of client: %s wins" % clients[winner].client.id)
+
+    def _on_loser_done(future):
+        error = None if future.cancelled() else future.exception()
+        if future.cancelled() or error is not None:
+            environ.hedge_counters["loser_errors"] += 1
+        elif winner is hedge:
+            hedger.record_saved(time.time() - t_won)
+        _release_hedge_client(clients[loser], error)
+
+    loser.add_done_callback(_on_loser_done)
+
+    return (clients[winner],) + winner.result()
+
+
+async def _pass_captcha(aelective):
+
+    elective = aelective.client
+
+    skips = 0
+    passed = False
+    captcha = None
+
+    if prefetcher is not None:
+        captcha = await _run_in_executor(None, prefetcher.take, elective)
+
+    while not passed:
+
+        if captcha is None:
+            cout.info("Fetch a captcha")
+            r = await aelective.get_DrawServlet()
+            environ.captcha_counters["fetches"] += 1
+
+            captcha = await _run_in_executor(_recognizeExecutor, recognizer.recognize, r.content)
+            environ.captcha_counters["recognitions"] += 1
+        else:
+            cout.info("Use the prefetched captcha")
+
+        cout.info("Recognition result: %s (confidence: %.4f)" % (captcha.code, captcha.confidence))
+
+        if captcha.confidence < captcha_confidence_threshold and skips < captcha_max_low_confidence_skips:
+            cout.info("Low confidence, fetch another captcha")
+            _add_captcha_result(captcha, "skipped")
+            skips += 1
+            captcha = None
+            continue
+
+        # the recognized code first, then the next-best codes of the same image
+        for cix, (code, prob) in enumerate(captcha.candidates(1 + captcha_nbest_retries)):
+
+            if cix > 0:
+                cout.info("Try next-best code: %s (probability: %.4f)" % (code, prob))
+
+            r = await aelective.get_Validate(username, code)
+            res = _check_validation(captcha, cix, code, _parse_validation(r))
+            if res is not False: # passed or unknown
+                passed = res is True
+                break
+
+        if not passed:
+            cout.info("Try again")
+            captcha = None
+
+
+async def _run_elective_task(aelective, offset):
+
+    elective = aelective.client
+    relogin = False
+
+    await asyncio.sleep(offset)
+
+    while True:
+
+        noWait = False
+
+        if relogin:
+            async with _clientLocks[elective.id]: # not to be lent to a hedge meanwhile
+                _needsRelogin.discard(elective.id)
+                await _login(aelective)
+            relogin = False
+
+        environ.elective_loop += 1
+        n_loop = environ.elective_loop
+
+        cout.info("")
+        cout.info("======== Loop %d ========" % n_loop)
+        cout.info("")
+
+        current = _print_tasks()
+
+        if len(current) == 0:
+            cout.info("No tasks")
+            return
+
+        _print_client(elective, elective_client_pool_size)
+
+        await _clientLocks[elective.id].acquire() # wait for the hedged request on it if any
+        round_client = aelective # the client of this round, may be changed to the hedged one
+
+        try:
+
+            if not elective.has_logined or elective.id in _needsRelogin:
+                raise _ElectiveNeedsLogin  # quit this loop
+
+            if elective.is_expired:
+                try:
+                    cout.info("Logout")
+                    r = await aelective.logout()
+                except Exception as e:
+                    cout.warning("Logout error")
+                    cout.exception(e)
+                raise _ElectiveExpired   # quit this loop
+
+            ## prefetch a captcha while refreshing the page
+
+            if prefetcher is not None:
+                prefetcher.submit(elective)
+
+            ## check supply/cancel page
+
+            page_r = None
+            refreshed_at = time.time()
+
+            if hedger is not None:
+                round_client, page_r, elected, plans = await _get_page_hedged(aelective)
+            else:
+                page_r, elected, plans = await _get_page(aelective)
+            _forget_elections(elected, refreshed_at)
+
+            ## check available courses
+
+            tasks = _get_tasks(elected, plans)
+
+            ## elect available courses
+
+            if len(tasks) == 0:
+                cout.info("No course available")
+                continue
+
+            elected = []  # cache elected courses dynamically from `get_ElectSupplement`
+
+            while len(tasks) > 0:
+
+                ix, course = tasks.popleft()
+
+                if _is_mutex(ix, course, elected):
+                    continue
+
+                async with _get_course_lock(course):
+
+                    if course in ignored or course in _electedAt:
+                        cout.info("%s is handled by another client, skip" % course)
+                        continue
+
+                    cout.info("Try to elect %s" % course)
+
+                    ## validate captcha first
+
+                    await _pass_captcha(round_client)
+
+                    ## try to elect
+
+                    try:
+                        r = await round_client.get_ElectSupplement(course.href)
+                    except ElectionSuccess as e:
+                        _electedAt[course] = time.time()
+                        _handle_election_error(e, course, elected, page_r)
+                    except Exception as e:
+                        _handle_election_error(e, course, elected, page_r)
+
+        except Exception as e:
+            # a hedged client is left to its own task to login again
+            if _handle_elective_error(e, round_client.client):
+                if round_client is aelective:
+                    relogin = True
+                    noWait = True
+                else:
+                    _needsRelogin.add(round_client.client.id)
+
+        finally:
+
+            _clientLocks[round_client.client.id].release()
+
+            if noWait:
+                cout.info("")
+                cout.info("======== END Loop %d ========" % n_loop)
+                cout.info("")
+            else:
+                t = _get_refresh_interval()
+                cout.info("")
+                cout.info("======== END Loop %d ========" % n_loop)
+                cout.info("Main loop sleep %s s (client: %s)" % (t, elective.id))
+                cout.info("")
+                await _sleep_and_warm(t, aelective)
+
+
+async def _run_elective_tasks():
+
+    global _loginLock
+
+    _loginLock = asyncio.Lock()
+
+    # every blocking call of a task runs under the lock of a client, so there are at most
+    # as many of them in flight as clients, including hedged requests and logins
+    executor = ThreadPoolExecutor(max_workers=elective_client_pool_size, thread_name_prefix="aio")
+    asyncio.get_running_loop().set_default_executor(executor)
+
+    offset = refresh_interval / elective_client_pool_size
+    tasks = []
+
+    for ix in range(1, elective_client_pool_size + 1):
+        aelective = AsyncElectiveClient(id=ix, timeout=elective_client_timeout,
+                                        http_stats=environ.http_stats["elective:%d" % ix],
+                                        adaptive_timeout=_create_adaptive_timeout(), resolver=resolver)
+        aelective.set_user_agent(random.choice(USER_AGENT_LIST))
+        _clients.append(aelective)
+        _clientLocks[ix] = asyncio.Lock()
+
+    await _run_in_executor(None, _warm_clients, [ aelective.client for aelective in _clients ])
+
+    for ix, aelective in enumerate(_clients):
+        tasks.append(asyncio.ensure_future(_run_elective_task(aelective, ix * offset)))
+
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if task.exception() is not None:
+                raise task.exception()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def run_async_loop():
+
+    _load_rules()
+    _print_header()
+
+    asyncio.run(_run_elective_tasks())
+
+    cout.info("Quit elective loop")
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: archive.py
+# modified: 2026-10-18
+
+"""
+An append-only, content-addressed archive of validated captchas.
+
+    <folder>/archive.dat        GIFs concatenated one after another
+    <folder>/archive.idx        one JSON line per validation:
+                                {"hash", "offset", "size", "code", "timestamp", "confidence", "valid"}
+
+GIFs are identified by their sha1 and stored only once, validations of the same GIF
+(e.g. a rejected code followed by an accepted next-best candidate) share its bytes.
+`valid` tells whether the server accepted `code`, records without it are failures.
+Segments are not stored, they can be reproduced from the GIF by `processor.split_captcha`.
+
+Captchas are handed to a background writer, so the elective loop never waits for disk
+I/O. When the data file grows beyond `max_size`, the oldest GIFs are evicted by
+rewriting both files. An archive has only one writer, the elective loop of a user writes
+its own archive in a subfolder of the captcha cache (see `loop.py`), and the GIFs read
+back are checked against their hashes.
+
+Export the archived GIFs as `<code>_<timestamp>.gif` files, e.g. for labeling, by
+
+    $ python3 -m autoelective.captcha.archive [-d ARCHIVE_DIR] -x OUTPUT_DIR
+
+the archives of all users in the folder are exported by default.
+"""
+
+import os
+import time
+import hashlib
+import threading
+from queue import Queue, Full
+from optparse import OptionParser
+from requests.compat import json
+
+DATA_FILENAME = "archive.dat"
+INDEX_FILENAME = "archive.idx"
+
+
+def find_archives(folder):
+    """ -> folders of the archives in the folder and its subfolders, e.g. one per user """
+    folders = []
+    if os.path.exists(os.path.join(folder, INDEX_FILENAME)):
+        folders.append(folder)
+    if os.path.isdir(folder):
+        for name in sorted(os.listdir(folder)):
+            subfolder = os.path.join(folder, name)
+            if os.path.exists(os.path.join(subfolder, INDEX_FILENAME)):
+                folders.append(subfolder)
+    return folders
+
+
+class CaptchaArchive(object):
+
+    def __init__(self, folder, max_size=64 * 1024 * 1024, max_pending=256, readonly=False):
+        """
+        max_size        max bytes of the data file, 0 means unlimited
+        max_pending     captchas waiting for the writer, more are dropped
+        readonly        only read the archive, e.g. while the elective loop is writing it
+        """
+        self._folder = folder
+        self._data_file = os.path.join(folder, DATA_FILENAME)
+        self._index_file = os.path.join(folder, INDEX_FILENAME)
+        self._max_size = max_size
+        self._readonly = readonly
+        self._queue = Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._records = []      # [dict], in the order of validation
+        self._blobs = {}        # { hash: (offset, size) }
+        self._keys = set()      # { (hash, code, valid) }
+        self._size = 0
+        self._thread = None
+        self.counters = { "archived": 0, "duplicated": 0, "dropped": 0, "evicted": 0, "corrupted": 0 }
+
+        if not readonly:
+            os.makedirs(folder, exist_ok=True)
+        self._load()
+
+    @property
+    def records(self):
+        with self._lock:
+            return list(self._records)
+
+    def _set_records(self, records):
+        self._records = records
+        self._blobs = { r["hash"]: (r["offset"], r["size"]) for r in records }
+        self._keys = { (r["hash"], r["code"], r.get("valid", False)) for r in records }
+        self._size = max( offset + size for offset, size in self._blobs.values() ) if records else 0
+
+    def _load(self):
+        data_size = os.path.getsize(self._data_file) if os.path.exists(self._data_file) else 0
+        records = []
+        if os.path.exists(self._index_file):
+            with open(self._index_file, 'r', encoding='utf-8') as fp:
+                for line in fp:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break  # partially written by a crashed writer
+                    if record["offset"] + record["size"] > data_size:
+                        break
+                    records.append(record)
+
+        # a crash during _evict() may leave the index and the data file out of sync,
+        # it's detected by the hash of the last GIF
+        if records and not self._verify(max(records, key=lambda r: r["offset"])):
+            verified = {}
+            for record in records:
+                if record["hash"] not in verified:
+                    verified[record["hash"]] = self._verify(record)
+            records = [ record for record in records if verified[record["hash"]] ]
+
+        self._set_records(records)
+
+        if self._readonly:
+            return
+
+        # drop the bytes and lines which aren't referenced by a complete record
+        if data_size != self._size:
+            with open(self._data_file, 'ab') as fp:
+                fp.truncate(self._size)
+        self._write_index(self._index_file, records)
+
+    def _verify(self, record):
+        with open(self._data_file, 'rb') as fp:
+            fp.seek(record["offset"])
+            return hashlib.sha1(fp.read(record["size"])).hexdigest() == record["hash"]
+
+    def _write_index(self, file, records):
+        with open(file, 'w', encoding='utf-8') as fp:
+            for record in records:
+                fp.write(json.dumps(record) + "\n")
+
+    def _ensure_writer(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run_writer, name="captcha-archive", daemon=True)
+            self._thread.start()
+
+    def submit(self, captcha, valid=False, code=None):
+        """
+        Hand a validated captcha to the background writer, never blocks. `code` is the
+        submitted code if it isn't `captcha.code`, e.g. a next-best candidate
+        """
+        assert not self._readonly
+        self._ensure_writer()
+        item = (code or captcha.code, captcha.im_data, captcha.confidence, valid, time.time())
+        try:
+            self._queue.put_nowait(item)
+        except Full:
+            self.counters["dropped"] += 1
+
+    def flush(self):
+        """ block until all submitted captchas are written """
+        self._queue.join()
+
+    def _run_writer(self):
+        while True:
+            item = self._queue.get()
+            try:
+                self._append(*item)
+            except OSError:
+                self.counters["dropped"] += 1
+            finally:
+                self._queue.task_done()
+
+    def _append(self, code, im_data, confidence, valid, timestamp):
+        digest = hashlib.sha1(im_data).hexdigest()
+        if (digest, code, valid) in self._keys:
+            self.counters["duplicated"] += 1
+            return
+
+        blob = self._blobs.get(digest)
+        if blob is None:
+            with open(self._data_file, 'ab') as fp:
+                blob = (fp.tell(), len(im_data)) # the real end of the file
+                fp.write(im_data)
+
+        record = {
+            "hash": digest,
+            "offset": blob[0],
+            "size": blob[1],
+            "code": code,
+            "timestamp": int(timestamp * 1000),
+            "confidence": confidence,
+            "valid": valid,
+        }
+        with open(self._index_file, 'a', encoding='utf-8') as fp:
+            fp.write(json.dumps(record) + "\n")
+
+        with self._lock:
+            self._records.append(record)
+            self._keys.add((digest, code, valid))
+            if digest not in self._blobs:
+                self._blobs[digest] = blob
+                self._size = max(self._size, blob[0] + blob[1])
+        self.counters["archived"] += 1
+
+        if self._max_size > 0 and self._size > self._max_size:
+            self._evict()
+
+    def _evict(self):
+        """ keep the newest GIFs within 3/4 of max_size, so that it doesn't run every time """
+        budget = self._max_size * 3 // 4
+        kept = set()
+        total = 0
+        for record in reversed(self._records):
+            if record["hash"] in kept:
+                continue
+            if total + record["size"] > budget:
+                break
+            kept.add(record["hash"])
+            total += record["size"]
+
+        tmp_data = self._data_file + ".tmp"
+        tmp_index = self._index_file + ".tmp"
+        offsets = {}
+        new_records = []
+        offset = 0
+        with open(self._data_file, 'rb') as fin, open(tmp_data, 'wb') as fout:
+            for record in self._records:
+                digest = record["hash"]
+                if digest not in kept:
+                    continue
+                if digest not in offsets:
+                    fin.seek(record["offset"])
+                    fout.write(fin.read(record["size"]))
+                    offsets[digest] = offset
+                    offset += record["size"]
+                new_records.append(dict(record, offset=offsets[digest]))
+        self._write_index(tmp_index, new_records)
+
+        os.replace(tmp_data, self._data_file)
+        os.replace(tmp_index, self._index_file)
+
+        with self._lock:
+            self.counters["evicted"] += len(self._records) - len(new_records)
+            self._set_records(new_records)
+
+    def iter_gifs(self):
+        """
+        -> (record, im_data), records of the same GIF share im_data, those whose bytes
+           don't match the hash are skipped
+        """
+        records = self.records
+        if len(records) == 0:
+            return
+        cache = {}
+        with open(self._data_file, 'rb') as fp:
+            for record in records:
+                digest = record["hash"]
+                if digest not in cache:
+                    fp.seek(record["offset"])
+                    im_data = fp.read(record["size"])
+                    if hashlib.sha1(im_data).hexdigest() != digest:
+                        im_data = None
+                    cache[digest] = im_data
+                if cache[digest] is None:
+                    self.counters["corrupted"] += 1
+                    continue
+                yield record, cache[digest]
+
+    def iter_samples(self):
+        """
+        -> (label or None, rejected codes, im_data) for every GIF, the label is the code
+        accepted by the server
+        """
+        samples = {}
+        for record, im_data in self.iter_gifs():
+            sample = samples.setdefault(record["hash"], [None, set(), im_data])
+            if record.get("valid", False):
+                sample[0] = record["code"]
+            else:
+                sample[1].add(record["code"])
+        for label, rejected, im_data in samples.values():
+            yield label, rejected, im_data
+
+
+def main():
+    from ..const import CAPTCHA_CACHE_DIR
+
+    parser = OptionParser(description='Export GIFs of the captcha archive')
+    parser.add_option('-d', '--dir', dest='folder', default=CAPTCHA_CACHE_DIR, metavar="DIR",
+                      help='folder of the archives, default to the captcha cache')
+    parser.add_option('-x', '--export', dest='output', default=None, metavar="DIR",
+                      help='export GIFs into this folder')
+    options, args = parser.parse_args()
+
+    for folder in find_archives(options.folder):
+
+        archive = CaptchaArchive(folder, readonly=True)
+        records = archive.records
+        n_valid = sum( record.get("valid", False) for record in records )
+        print("%d validations (passed: %d, failed: %d), %.1f KB in %s" % (
+              len(records), n_valid, len(records) - n_valid, archive._size / 1024, folder))
+
+        if options.output is not None:
+            os.makedirs(options.output, exist_ok=True)
+            for record, im_data in archive.iter_gifs():
+                filename = "%s_%d.gif" % (record["code"], record["timestamp"])
+                with open(os.path.join(options.output, filename), 'wb') as fp:
+                    fp.write(im_data)
+            if archive.counters["corrupted"] > 0:
+                print("Skip %d records whose GIF doesn't match the hash" % archive.counters["corrupted"])
+            print("Export to %s" % options.output)
+
+if __name__ == '__main__':
+    main()
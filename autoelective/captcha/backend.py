@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: backend.py
+# modified: 2026-10-18
+
+"""
+Inference backends of CaptchaRecognizer. A backend maps a float32 array of captcha
+segments with shape (batch, 1, 52, 52) to the log-probs of shape (batch, 29).
+
+Backends import their runtime lazily, so that choosing the numpy backend never
+imports torch.
+"""
+
+import os
+
+CAPTCHA_LABELS = '2345678abcdefghklmnpqrstuvwxy'
+
+
+def get_finetuned_file(model_file):
+    """ -> the output of `python3 -m autoelective.captcha.finetune` for the model """
+    if model_file.endswith(".ft.pt"):
+        return model_file
+    return os.path.splitext(model_file)[0] + ".ft.pt"
+
+
+class BaseBackend(object):
+
+    name = None
+
+    def __init__(self, model_file, optimize=False, num_threads=0):
+        if self.__class__ is __class__:
+            raise NotImplementedError
+        self._model_file = model_file
+
+    @property
+    def labels(self):
+        return CAPTCHA_LABELS
+
+    @property
+    def source_file(self):
+        """ the file the weights are loaded from, a newer file means the weights are updated """
+        return self._model_file
+
+    def forward(self, X):
+        raise NotImplementedError
+
+
+class TorchBackend(BaseBackend):
+
+    name = "torch"
+
+    def __init__(self, model_file, optimize=False, num_threads=0):
+        super().__init__(model_file)
+
+        import inspect
+        import torch
+        from .cnn import CaptchaCNN, get_arch
+        from .weights import load_state_dict
+
+        if num_threads > 0:
+            torch.set_num_threads(num_threads)
+
+        # copy-on-write mapping, the pages stay shared unless fold_batchnorm() writes them
+        sd = { k: torch.from_numpy(v) for k, v in load_state_dict(model_file, writable=True).items() }
+
+        self._torch = torch
+        self._model = CaptchaCNN(**get_arch(sd))
+        if "assign" in inspect.signature(self._model.load_state_dict).parameters:
+            self._model.load_state_dict(sd, assign=True)  # torch >= 2.1, use the mapping in place
+        else:
+            self._model.load_state_dict(sd)
+        self._model.eval()
+
+        if optimize:
+            self._model.fold_batchnorm()
+            self._model.requires_grad_(False)
+
+    def forward(self, X):
+        torch = self._torch
+        with torch.no_grad():
+            return self._model(torch.from_numpy(X)).numpy()
+
+
+class NumpyBackend(BaseBackend):
+
+    name = "numpy"
+
+    def __init__(self, model_file, optimize=False, num_threads=0):
+        super().__init__(model_file)
+
+        from .npcnn import NumpyCaptchaCNN, load_weights
+
+        self._model = NumpyCaptchaCNN(load_weights(model_file))
+
+    def forward(self, X):
+        return self._model(X)
+
+
+class TorchInt8Backend(BaseBackend):
+    """
+    Run the int8 post-training-quantized CaptchaCNN, the quantized model should be
+    produced by `python3 -m autoelective.captcha.quantize` in advance.
+    """
+
+    name = "torch-int8"
+
+    def __init__(self, model_file, optimize=False, num_threads=0):
+        super().__init__(model_file)
+
+        import torch
+        from .quantize import get_int8_file, load_int8
+
+        int8_file = get_int8_file(model_file)
+        if not os.path.exists(int8_file):
+            raise FileNotFoundError("Int8 model was not found: %s, create it by "
+                                    "`python3 -m autoelective.captcha.quantize` first" % int8_file)
+
+        if num_threads > 0:
+            torch.set_num_threads(num_threads)
+
+        self._torch = torch
+        self._int8_file = int8_file
+        self._model = load_int8(int8_file)
+
+    @property
+    def source_file(self):
+        return self._int8_file
+
+    def forward(self, X):
+        torch = self._torch
+        with torch.no_grad():
+            return self._model(torch.from_numpy(X)).numpy()
+
+
+class OpenCVBackend(BaseBackend):
+    """
+    Run the ONNX export of CaptchaCNN with cv2.dnn, segmentation already runs in opencv,
+    so the whole pipeline works without torch. The .onnx file should be exported by
+    `python3 -m autoelective.captcha.export` in advance.
+    """
+
+    name = "opencv"
+
+    def __init__(self, model_file, optimize=False, num_threads=0):
+        super().__init__(model_file)
+
+        import cv2
+        from .export import get_onnx_file
+
+        onnx_file = get_onnx_file(model_file)
+        if not os.path.exists(onnx_file):
+            raise FileNotFoundError("ONNX model was not found: %s, export it by "
+                                    "`python3 -m autoelective.captcha.export` first" % onnx_file)
+
+        if num_threads > 0:
+            cv2.setNumThreads(num_threads)
+
+        self._onnx_file = onnx_file
+        self._net = cv2.dnn.readNet(onnx_file)
+        self._net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+
+    @property
+    def source_file(self):
+        return self._onnx_file
+
+    def forward(self, X):
+        self._net.setInput(X)
+        return self._net.forward()
+
+
+BACKENDS = {
+    clz.name: clz for clz in (TorchBackend, TorchInt8Backend, NumpyBackend, OpenCVBackend)
+}
+
+def get_backend_class(name):
+    clz = BACKENDS.get(name)
+    if clz is None:
+        raise ValueError("unsupported captcha backend %r, backend must be in %s" % (name, tuple(BACKENDS)))
+    return clz
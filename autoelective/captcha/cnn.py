@@ -1,36 +1,72 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 # filename: cnn.py
-# modified: 2020-02-15
+# modified: 2026-10-18
 
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
+from .backend import CAPTCHA_LABELS
+
+DEFAULT_CHANNELS = (16, 32, 64, 128, 256, 512)
+DEFAULT_HIDDEN = (512, 128)
+
+# the distilled student, see `distill.py`
+LITE_CHANNELS = (8, 16, 32, 32, 64, 64)
+LITE_HIDDEN = (128, 64)
+
+
+def get_arch(state_dict):
+    """
+    Detect the widths of a CaptchaCNN from its state_dict, values may be torch tensors
+    or numpy arrays -> kwargs of CaptchaCNN
+    """
+    return {
+        "channels": tuple( int(state_dict["conv%d.weight" % ix].shape[0]) for ix in range(1, 7) ),
+        "hidden": tuple( int(state_dict["fc%d.weight" % ix].shape[0]) for ix in (1, 2) ),
+    }
+
 
 class CaptchaCNN(nn.Module):
 
-    CAPTCHA_LABELS = '2345678abcdefghklmnpqrstuvwxy'
+    CAPTCHA_LABELS = CAPTCHA_LABELS
 
-    def __init__(self):
+    def __init__(self, channels=DEFAULT_CHANNELS, hidden=DEFAULT_HIDDEN):
+        """
+        channels    output channels of conv1..conv6
+        hidden      output features of fc1, fc2
+
+        The layers are the same for every width, so the state_dicts of all variants share
+        the same keys and every backend, exporter and quantizer works on them.
+        """
         super().__init__()
+        c1, c2, c3, c4, c5, c6 = channels
+        h1, h2 = hidden
         self.bn0 = nn.BatchNorm2d(1)
-        self.bn1 = nn.BatchNorm2d(16)
-        self.bn2 = nn.BatchNorm2d(32)
-        self.bn3 = nn.BatchNorm2d(64)
-        self.bn4 = nn.BatchNorm2d(128)
-        self.bn5 = nn.BatchNorm2d(256)
-        self.bn6 = nn.BatchNorm2d(512)
-        self.conv1 = nn.Conv2d(1, 16, 3)
-        self.conv2 = nn.Conv2d(16, 32, 3)
-        self.conv3 = nn.Conv2d(32, 64, 3)
-        self.conv4 = nn.Conv2d(64, 128, 3)
-        self.conv5 = nn.Conv2d(128, 256, 3)
-        self.conv6 = nn.Conv2d(256, 512, 3)
-        self.fc1 = nn.Linear(2048, 512)
-        self.fc2 = nn.Linear(512, 128)
-        self.fc3 = nn.Linear(128, len(self.CAPTCHA_LABELS)) # 29
+        self.bn1 = nn.BatchNorm2d(c1)
+        self.bn2 = nn.BatchNorm2d(c2)
+        self.bn3 = nn.BatchNorm2d(c3)
+        self.bn4 = nn.BatchNorm2d(c4)
+        self.bn5 = nn.BatchNorm2d(c5)
+        self.bn6 = nn.BatchNorm2d(c6)
+        self.conv1 = nn.Conv2d(1, c1, 3)
+        self.conv2 = nn.Conv2d(c1, c2, 3)
+        self.conv3 = nn.Conv2d(c2, c3, 3)
+        self.conv4 = nn.Conv2d(c3, c4, 3)
+        self.conv5 = nn.Conv2d(c4, c5, 3)
+        self.conv6 = nn.Conv2d(c5, c6, 3)
+        self.fc1 = nn.Linear(c6 * 2 * 2, h1)
+        self.fc2 = nn.Linear(h1, h2)
+        self.fc3 = nn.Linear(h2, len(self.CAPTCHA_LABELS)) # 29
+
+    @classmethod
+    def from_state_dict(cls, state_dict):
+        model = cls(**get_arch(state_dict))
+        model.load_state_dict(state_dict)
+        return model
 
     def forward(self, x):
+        # shapes of the default widths
         x = self.bn0(x)         # batch*1*52*52
         x = F.relu(x)
         x = self.conv1(x)       # batch*16*50*50
@@ -62,3 +98,69 @@ class CaptchaCNN(nn.Module):
         x = self.fc3(x)         # batch*29
         x = F.log_softmax(x, dim=1)
         return x
+
+    @torch.no_grad()
+    def fold_batchnorm(self):
+        """
+        Fold bn1..bn6 into the weights of the preceding convs for inference, the folded
+        BatchNorm2d layers are replaced by nn.Identity. bn0 is followed by relu before
+        conv1, so it can't be folded and is kept as it is.
+        """
+        assert not self.training
+        for ix in range(1, 7):
+            conv = getattr(self, "conv%d" % ix)
+            bn = getattr(self, "bn%d" % ix)
+            if isinstance(bn, nn.Identity):
+                continue
+            scale = bn.weight / torch.sqrt(bn.running_var + bn.eps)
+            conv.weight.mul_(scale.reshape(-1, 1, 1, 1))
+            conv.bias.sub_(bn.running_mean).mul_(scale).add_(bn.bias)
+            setattr(self, "bn%d" % ix, nn.Identity())
+        return self
+
+
+class QuantizableCaptchaCNN(CaptchaCNN):
+    """
+    CaptchaCNN with relu modules and quant/dequant stubs for eager-mode post-training
+    quantization. It shares the state_dict of CaptchaCNN, bn1..bn6 must be folded before
+    fusing conv+relu. bn0 is kept in float before the QuantStub.
+    """
+
+    def __init__(self, channels=DEFAULT_CHANNELS, hidden=DEFAULT_HIDDEN):
+        super().__init__(channels, hidden)
+        from torch.quantization import QuantStub, DeQuantStub
+        self.quant = QuantStub()
+        self.dequant = DeQuantStub()
+        for ix in range(1, 7):
+            setattr(self, "relu%d" % ix, nn.ReLU())
+        self.relu_fc1 = nn.ReLU()
+        self.relu_fc2 = nn.ReLU()
+
+    def forward(self, x):
+        x = self.bn0(x)
+        x = F.relu(x)
+        x = self.quant(x)
+        x = self.relu1(self.conv1(x))
+        x = self.relu2(self.conv2(x))
+        x = F.avg_pool2d(x, 2)
+        x = self.relu3(self.conv3(x))
+        x = self.relu4(self.conv4(x))
+        x = F.avg_pool2d(x, 2)
+        x = self.relu5(self.conv5(x))
+        x = F.avg_pool2d(x, 2)
+        x = self.relu6(self.conv6(x))
+        x = torch.flatten(x, 1)
+        x = self.relu_fc1(self.fc1(x))
+        x = self.relu_fc2(self.fc2(x))
+        x = self.fc3(x)
+        x = self.dequant(x)
+        x = F.log_softmax(x, dim=1)
+        return x
+
+    def fuse_modules(self):
+        from torch.quantization import fuse_modules
+        assert all( isinstance(getattr(self, "bn%d" % ix), nn.Identity) for ix in range(1, 7) )
+        pairs = [ ["conv%d" % ix, "relu%d" % ix] for ix in range(1, 7) ]
+        pairs += [ ["fc1", "relu_fc1"], ["fc2", "relu_fc2"] ]
+        fuse_modules(self, pairs, inplace=True)
+        return self
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: dataset.py
+# modified: 2026-10-18
+
+"""
+Helpers to collect captcha GIFs saved in local folders. The label is taken from the
+filename, e.g. `er47.gif` or `er47_1615447831000.gif` (the format of `Captcha.save`).
+
+Note that the GIFs saved by the elective loop on failed validations are named by the
+recognized code, which is known to be wrong. GIFs in a captcha archive (see `archive.py`)
+in the folders are loaded as well, labeled by the code accepted by the server, if any.
+"""
+
+import os
+from .backend import CAPTCHA_LABELS
+from .archive import CaptchaArchive, find_archives
+
+
+def parse_label(filename):
+    stem = os.path.basename(filename).split('.')[0]
+    code = stem.split('_')[0]
+    if len(code) == 4 and all( c in CAPTCHA_LABELS for c in code ):
+        return code
+    return None
+
+def iter_gif_files(*folders):
+    for folder in folders:
+        if not os.path.isdir(folder):
+            continue
+        for filename in sorted(os.listdir(folder)):
+            if filename.endswith('.gif'):
+                yield os.path.join(folder, filename)
+
+def iter_archive_samples(*folders):
+    """
+    -> (label or None, rejected codes, im_data) for every GIF in the archives of the
+       folders and their subfolders
+    """
+    for folder in folders:
+        for archive_folder in find_archives(folder):
+            yield from CaptchaArchive(archive_folder, readonly=True).iter_samples()
+
+def load_gifs(*folders):
+    """ -> [(label or None, im_data)] """
+    samples = []
+    for file in iter_gif_files(*folders):
+        with open(file, 'rb') as fp:
+            samples.append((parse_label(file), fp.read()))
+    samples.extend( (label, im_data) for label, _, im_data in iter_archive_samples(*folders) )
+    return samples
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: distill.py
+# modified: 2026-10-18
+
+"""
+Train a narrow CaptchaCNN (LITE_CHANNELS / LITE_HIDDEN in `cnn.py`) on CPU by knowledge
+distillation from the current model, on locally stored captchas.
+
+    $ python3 -m autoelective.captcha.distill [-t TEACHER] [-d DIR ...] [-o OUTPUT] [-e EPOCHS]
+
+Labeled GIFs (label taken from the filename, see `dataset.parse_label`, or the code
+accepted by the server for GIFs in the captcha archive) are trained on both the teacher's
+soft targets and the labels, unlabeled ones on the soft targets only. The student is saved
+as a plain state_dict, the loader detects its widths, so it's selected by `model` in
+`[captcha]` like any other model file. A report comparing the student with the teacher is printed at last.
+"""
+
+import os
+import time
+import multiprocessing
+from optparse import OptionParser
+import numpy as np
+import torch
+import torch.nn.functional as F
+from .cnn import CaptchaCNN, LITE_CHANNELS, LITE_HIDDEN
+from .dataset import iter_gif_files, iter_archive_samples
+from .backend import CAPTCHA_LABELS
+from .evaluate import _split_file, _split_sample
+
+N = 52
+
+
+def get_lite_file(model_file):
+    return os.path.splitext(model_file)[0] + ".lite.pt"
+
+def load_segments(folders, pool):
+    """ -> (uint8 segments [n][n_chars][N][N], labels [n] with None for unlabeled) """
+    labels, segs = [], []
+    for label, s in pool.map(_split_file, list(iter_gif_files(*folders)), chunksize=32):
+        if s is not None:
+            labels.append(label)
+            segs.append(s)
+    samples = [ (label, im_data) for label, _, im_data in iter_archive_samples(*folders) ]
+    for label, s in pool.map(_split_sample, samples, chunksize=32):
+        if s is not None:
+            labels.append(label)
+            segs.append(s)
+    return np.array(segs, dtype=np.uint8).reshape(-1, 4, N, N), labels
+
+def _char_targets(labels):
+    """ -> int64 [n*n_chars], -1 for unlabeled """
+    ixs = { c: ix for ix, c in enumerate(CAPTCHA_LABELS) }
+    return np.array([ ixs[c] if label is not None else -1
+                      for label in labels for c in (label or "????") ], dtype=np.int64)
+
+@torch.no_grad()
+def _predict(model, X, batch_size=1024):
+    model.eval()
+    return torch.cat([ model(X[ix : ix+batch_size]) for ix in range(0, len(X), batch_size) ])
+
+def _accuracy(log_probs, y, teacher_log_probs):
+    pred = log_probs.argmax(dim=1)
+    labeled = y >= 0
+    char_acc = (pred[labeled] == y[labeled]).float().mean().item() if labeled.any() else float('nan')
+    code_hits = (pred == y).reshape(-1, 4).all(dim=1)[labeled.reshape(-1, 4).all(dim=1)]
+    code_acc = code_hits.float().mean().item() if len(code_hits) else float('nan')
+    agreement = (pred == teacher_log_probs.argmax(dim=1)).float().mean().item()
+    return char_acc, code_acc, agreement
+
+def distill(teacher, X, y, X_val, y_val, epochs=30, batch_size=256, lr=2e-3, T=4.0, alpha=0.7,
+            max_shift=2, seed=0):
+    """
+    X: float32 tensor [n][1][N][N], y: int64 tensor [n], -1 for unlabeled chars
+    """
+    torch.manual_seed(seed)
+    student = CaptchaCNN(LITE_CHANNELS, LITE_HIDDEN)
+    optimizer = torch.optim.Adam(student.parameters(), lr=lr)
+    scheduler = torch.optim.lr_scheduler.CosineAnnealingLR(optimizer, epochs)
+
+    soft = _predict(teacher, X)
+    soft_val = _predict(teacher, X_val)
+    best_score, best_state = None, None
+
+    for epoch in range(1, epochs + 1):
+        student.train()
+        t0 = time.perf_counter()
+        total = 0.0
+        perm = torch.randperm(len(X))
+        for ix in range(0, len(X), batch_size):
+            b = perm[ix : ix+batch_size]
+            xb, yb, sb = X[b], y[b], soft[b]
+            if max_shift > 0:
+                dy, dx = np.random.randint(-max_shift, max_shift + 1, size=2).tolist()
+                xb = torch.roll(xb, shifts=(dy, dx), dims=(2, 3))
+
+            out = student(xb)  # log-probs, log_softmax(out / T) is the tempered distribution
+            loss = alpha * T * T * F.kl_div(F.log_softmax(out / T, dim=1), F.log_softmax(sb / T, dim=1),
+                                            reduction='batchmean', log_target=True)
+            labeled = yb >= 0
+            if labeled.any():
+                loss = loss + (1 - alpha) * F.nll_loss(out[labeled], yb[labeled])
+
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total += loss.item() * len(b)
+        scheduler.step()
+
+        char_acc, code_acc, agreement = _accuracy(_predict(student, X_val), y_val, soft_val)
+        score = char_acc if not np.isnan(char_acc) else agreement
+        if best_score is None or score >= best_score:
+            best_score = score
+            best_state = { k: v.clone() for k, v in student.state_dict().items() }
+
+        print("epoch %2d  loss %.4f  val char_acc %.4f  code_acc %.4f  teacher agreement %.4f  %.1f s" % (
+              epoch, total / len(X), char_acc, code_acc, agreement, time.perf_counter() - t0))
+
+    student.load_state_dict(best_state)
+    student.eval()
+    return student
+
+
+def report(model_files, X_val, y_val, backends=("torch", "numpy"), rounds=100):
+    """
+    Accuracy on the validation captchas and the latency of one captcha (4 segments)
+    """
+    from .recognizer import CaptchaRecognizer
+
+    teacher_pred = None
+    rows = []
+    for name, file in model_files:
+        for backend in backends:
+            b = CaptchaRecognizer(file, backend=backend, optimize=True).backend
+            log_probs = torch.from_numpy(np.concatenate([ b.forward(X_val[ix : ix+256].numpy())
+                                                          for ix in range(0, len(X_val), 256) ]))
+            if teacher_pred is None:
+                teacher_pred = log_probs
+            char_acc, code_acc, agreement = _accuracy(log_probs, y_val, teacher_pred)
+
+            X = np.zeros((4, 1, N, N), dtype=np.float32)
+            b.forward(X)
+            t0 = time.perf_counter()
+            for _ in range(rounds):
+                b.forward(X)
+            t_forward = (time.perf_counter() - t0) / rounds
+
+            rows.append((name, backend, char_acc, code_acc, agreement, t_forward * 1000, os.path.getsize(file) / 1024))
+
+    print("%-8s  %-7s  %8s  %8s  %9s  %12s  %10s" % (
+          "model", "backend", "char_acc", "code_acc", "agreement", "captcha_ms", "size_kb"))
+    for row in rows:
+        print("%-8s  %-7s  %8.4f  %8.4f  %9.4f  %12.3f  %10.1f" % row)
+
+
+def main():
+    from ..const import CNN_MODEL_FILE, CAPTCHA_CACHE_DIR, TEST_DATA_DIR
+
+    parser = OptionParser(description='Distill a lightweight CaptchaCNN from the current model')
+    parser.add_option('-t', '--teacher', dest='teacher_file', default=CNN_MODEL_FILE, metavar="FILE")
+    parser.add_option('-o', '--output', dest='output', default=None, metavar="FILE",
+                      help='output file, default to <teacher>.lite.pt')
+    parser.add_option('-d', '--data', dest='folders', action='append', default=None, metavar="DIR",
+                      help='folders of GIFs, default to the captcha cache and test/data')
+    parser.add_option('-e', '--epochs', dest='epochs', type='int', default=30)
+    parser.add_option('-T', '--temperature', dest='temperature', type='float', default=4.0)
+    parser.add_option('-a', '--alpha', dest='alpha', type='float', default=0.7,
+                      help='weight of the distillation loss against the label loss')
+    parser.add_option('--val-ratio', dest='val_ratio', type='float', default=0.1)
+    options, args = parser.parse_args()
+
+    folders = options.folders or [CAPTCHA_CACHE_DIR, TEST_DATA_DIR]
+    output = options.output or get_lite_file(options.teacher_file)
+
+    with multiprocessing.Pool() as pool:
+        segs, labels = load_segments(folders, pool)
+    if len(segs) == 0:
+        raise ValueError("no GIFs in %s" % folders)
+
+    # hold out captchas, not chars, so that the code accuracy is meaningful
+    rng = np.random.RandomState(0)
+    perm = rng.permutation(len(segs))
+    n_val = max(1, int(len(segs) * options.val_ratio))
+    val, train = perm[:n_val], perm[n_val:]
+    if len(train) == 0:
+        train = val
+    print("captchas: %d (labeled: %d), train: %d, validation: %d" % (
+          len(segs), sum( l is not None for l in labels ), len(train), len(val)))
+
+    def _tensors(ixs):
+        X = torch.from_numpy(segs[ixs].reshape(-1, 1, N, N).astype(np.float32))
+        y = torch.from_numpy(_char_targets([ labels[ix] for ix in ixs ]))
+        return X, y
+
+    teacher = CaptchaCNN.from_state_dict(torch.load(options.teacher_file, map_location='cpu'))
+    teacher.eval()
+
+    X, y = _tensors(train)
+    X_val, y_val = _tensors(val)
+    student = distill(teacher, X, y, X_val, y_val, epochs=options.epochs, T=options.temperature,
+                      alpha=options.alpha)
+    torch.save(student.state_dict(), output)
+    print("Save student model to %s" % output)
+    print("")
+
+    report([ ("teacher", options.teacher_file), ("student", output) ], X_val, y_val)
+
+if __name__ == '__main__':
+    main()
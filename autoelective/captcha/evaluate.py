@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: evaluate.py
+# modified: 2026-10-18
+
+"""
+Offline evaluation of the captcha recognizer on folders of labeled GIFs, the label is
+taken from the filename (see `dataset.parse_label`), unlabeled files are skipped. The
+captcha archives in the folders (see `archive.py`) are read as well, only the captchas
+which passed the validation are used, labeled by the submitted code.
+
+    $ python3 -m autoelective.captcha.evaluate DIR [DIR ...] [-b BACKEND] [-j WORKERS] [-o REPORT]
+
+`split_captcha` runs in a process pool and the model runs batched inference in the main
+process. Files are processed chunk by chunk, only two chunks of segments are in memory
+at any time, so the corpus can be far larger than RAM.
+"""
+
+import os
+import time
+import multiprocessing
+from itertools import islice
+from optparse import OptionParser
+import numpy as np
+from requests.compat import json
+from .processor import split_captcha
+from .dataset import iter_gif_files, iter_archive_samples, parse_label
+from .backend import CAPTCHA_LABELS
+
+
+def _split_file(file):
+    """ -> (label, uint8 segments [n_chars][N][N] or None) """
+    label = parse_label(file)
+    try:
+        with open(file, 'rb') as fp:
+            segs = split_captcha(fp.read())
+    except Exception:
+        return label, None
+    return label, np.array(segs, dtype=np.uint8)
+
+def _split_sample(sample):
+    """ (label, im_data) -> (label, uint8 segments [n_chars][N][N] or None) """
+    label, im_data = sample
+    try:
+        segs = split_captcha(im_data)
+    except Exception:
+        return label, None
+    return label, np.array(segs, dtype=np.uint8)
+
+def _split_item(item):
+    return _split_file(item) if isinstance(item, str) else _split_sample(item)
+
+def iter_labeled_samples(*folders):
+    """
+    -> paths of the labeled GIFs, then (label, im_data) of the passed captchas in the
+       archives of the folders
+    """
+    for file in iter_gif_files(*folders):
+        if parse_label(file) is not None:
+            yield file
+    for label, _, im_data in iter_archive_samples(*folders):
+        if label is not None:
+            yield (label, im_data)
+
+def _iter_chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if len(chunk) == 0:
+            return
+        yield chunk
+
+
+class Evaluation(object):
+
+    def __init__(self, labels=CAPTCHA_LABELS):
+        self._labels = labels
+        self._label_ix = { c: ix for ix, c in enumerate(labels) }
+        self.confusion = np.zeros((len(labels), len(labels)), dtype=np.int64)  # [true][predicted]
+        self.position_hits = None
+        self.codes = 0
+        self.code_hits = 0
+        self.errors = 0
+
+    def update(self, labels, predicted):
+        """
+        labels: [str], predicted: int [n][n_chars]
+        """
+        truth = np.array([ [ self._label_ix[c] for c in label ] for label in labels ], dtype=np.int64)
+        hits = (truth == predicted)
+        np.add.at(self.confusion, (truth.ravel(), predicted.ravel()), 1)
+        if self.position_hits is None:
+            self.position_hits = np.zeros(truth.shape[1], dtype=np.int64)
+        self.position_hits += hits.sum(axis=0)
+        self.code_hits += int(hits.all(axis=1).sum())
+        self.codes += len(labels)
+
+    def top_confusions(self, n=10):
+        M = self.confusion.copy()
+        np.fill_diagonal(M, 0)
+        ixs = np.argsort(-M, axis=None)[:n]
+        return [
+            (self._labels[i], self._labels[j], int(M[i, j]))
+            for i, j in zip(*np.unravel_index(ixs, M.shape)) if M[i, j] > 0
+        ]
+
+    def report(self):
+        chars = int(self.confusion.sum())
+        support = self.confusion.sum(axis=1)
+        recall = np.divide(np.diag(self.confusion), support, out=np.zeros(len(support)), where=support > 0)
+        return {
+            "codes": self.codes,
+            "errors": self.errors,
+            "code_acc": self.code_hits / self.codes if self.codes else float('nan'),
+            "char_acc": int(np.trace(self.confusion)) / chars if chars else float('nan'),
+            "position_acc": (self.position_hits / self.codes).tolist() if self.codes else [],
+            "char_recall": { c: float(r) for c, r, n in zip(self._labels, recall, support) if n > 0 },
+            "top_confusions": self.top_confusions(),
+            "confusion": self.confusion.tolist(),
+        }
+
+
+def evaluate(samples, backend, pool, chunk_size=1024, batch_size=256):
+    """
+    samples: iterable of labeled GIF paths or (label, im_data), see `iter_labeled_samples`
+    backend: see `backend.BaseBackend`
+    """
+    N = 52
+    res = Evaluation(backend.labels)
+    t_forward = 0.0
+
+    chunks = _iter_chunks(samples, chunk_size)
+    pending = None
+    chunk = next(chunks, None)
+    if chunk is not None:
+        pending = pool.map_async(_split_item, chunk, chunksize=32)
+
+    while pending is not None:
+        results = pending.get()
+
+        # split the next chunk while running the model on this one
+        chunk = next(chunks, None)
+        pending = pool.map_async(_split_item, chunk, chunksize=32) if chunk is not None else None
+
+        labels = [ label for label, segs in results if segs is not None ]
+        res.errors += len(results) - len(labels)
+        if len(labels) == 0:
+            continue
+        X = np.stack([ segs for _, segs in results if segs is not None ])
+        n_chars = X.shape[1]
+
+        t0 = time.perf_counter()
+        predicted = []
+        for ix in range(0, len(X), batch_size):
+            Xb = X[ix : ix+batch_size].reshape(-1, 1, N, N).astype(np.float32)
+            predicted.append(np.argmax(backend.forward(Xb), axis=1).reshape(-1, n_chars))
+        t_forward += time.perf_counter() - t0
+
+        res.update(labels, np.concatenate(predicted))
+
+    return res, t_forward
+
+
+def main():
+    from .recognizer import CaptchaRecognizer
+    from ..const import CNN_MODEL_FILE
+
+    parser = OptionParser(usage='%prog [options] DIR [DIR ...]',
+                          description='Evaluate the captcha recognizer on folders of labeled GIFs '
+                                      'and captcha archives')
+    parser.add_option('-m', '--model', dest='model_file', default=CNN_MODEL_FILE, metavar="FILE")
+    parser.add_option('-b', '--backend', dest='backend', default='torch')
+    parser.add_option('-j', '--workers', dest='workers', type='int', default=os.cpu_count(),
+                      help='processes running split_captcha')
+    parser.add_option('-c', '--chunk-size', dest='chunk_size', type='int', default=1024,
+                      help='files per chunk, bounds the memory')
+    parser.add_option('-B', '--batch-size', dest='batch_size', type='int', default=256,
+                      help='captchas per forward pass')
+    parser.add_option('-o', '--output', dest='output', default=None, metavar="FILE",
+                      help='write the full report with the confusion matrix to a JSON file')
+    options, folders = parser.parse_args()
+
+    if len(folders) == 0:
+        parser.error("no folder is given")
+
+    # fork the workers before the model runtime starts its threads
+    with multiprocessing.Pool(options.workers) as pool:
+        r = CaptchaRecognizer(options.model_file, backend=options.backend, optimize=True)
+        t0 = time.perf_counter()
+        res, t_forward = evaluate(iter_labeled_samples(*folders), r.backend, pool,
+                                  options.chunk_size, options.batch_size)
+        t_total = time.perf_counter() - t0
+
+    report = res.report()
+    report["seconds"] = t_total
+    report["forward_seconds"] = t_forward
+    report["images_per_second"] = report["codes"] / t_total if t_total > 0 else float('nan')
+
+    print("captchas: %d (unreadable: %d)" % (report["codes"], report["errors"]))
+    print("code_acc: %.4f" % report["code_acc"])
+    print("char_acc: %.4f" % report["char_acc"])
+    print("position_acc: %s" % ", ".join( "%.4f" % acc for acc in report["position_acc"] ))
+    print("top confusions (true -> predicted):")
+    for c0, c1, n in report["top_confusions"]:
+        print("  %s -> %s  %d" % (c0, c1, n))
+    print("%.1f images/s, %.2f s in total, %.2f s in forward" % (
+          report["images_per_second"], t_total, t_forward))
+
+    if options.output is not None:
+        with open(options.output, 'w', encoding='utf-8') as fp:
+            json.dump(report, fp, indent=4)
+        print("Report is written to %s" % options.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: export.py
+# modified: 2026-10-18
+
+"""
+Export CaptchaCNN to ONNX, so that it can be loaded by `cv2.dnn.readNet` and the
+opencv backend can run without torch.
+
+    $ python3 -m autoelective.captcha.export [-m model/cnn.20210311.1.pt] [-o model/cnn.20210311.1.onnx]
+
+torch (and the onnx package required by torch.onnx) is only needed for the export.
+"""
+
+import os
+import inspect
+from optparse import OptionParser
+
+
+def get_onnx_file(model_file):
+    return os.path.splitext(model_file)[0] + ".onnx"
+
+def export_onnx(model_file, onnx_file=None, opset_version=11):
+    import torch
+    from .cnn import CaptchaCNN
+
+    if onnx_file is None:
+        onnx_file = get_onnx_file(model_file)
+
+    model = CaptchaCNN.from_state_dict(torch.load(model_file, map_location='cpu'))
+    model.eval()
+    model.fold_batchnorm()
+
+    kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        kwargs["dynamo"] = False  # cv2.dnn reads the TorchScript-based export best
+
+    N = 52
+    X = torch.zeros((4, 1, N, N), dtype=torch.float32)
+    torch.onnx.export(
+        model,
+        X,
+        onnx_file,
+        input_names=["input"],
+        output_names=["output"],
+        dynamic_axes={
+            "input": {0: "batch"},
+            "output": {0: "batch"},
+        },
+        opset_version=opset_version,
+        **kwargs,
+    )
+    return onnx_file
+
+
+def main():
+    from ..const import CNN_MODEL_FILE
+
+    parser = OptionParser(description='Export CaptchaCNN to ONNX for the opencv backend')
+    parser.add_option('-m', '--model', dest='model_file', default=CNN_MODEL_FILE, metavar="FILE",
+                      help='state_dict of CaptchaCNN saved by torch')
+    parser.add_option('-o', '--output', dest='onnx_file', default=None, metavar="FILE",
+                      help='output file, default to the model file with .onnx extension')
+    options, args = parser.parse_args()
+
+    onnx_file = export_onnx(options.model_file, options.onnx_file)
+    print("Export %s to %s" % (options.model_file, onnx_file))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: finetune.py
+# modified: 2026-10-18
+
+"""
+Fine-tune CaptchaCNN on CPU with the outcomes of `get_Validate` collected by the elective
+loop in the captcha archive (see `archive.py`), every validation is a free label:
+
+    passed      the submitted code is the label, trained with the usual NLL loss
+    failed      the submitted code is wrong, its joint probability is pushed down
+                by -log(1 - p(code)), the other codes are left to the model
+
+A distillation term against the frozen input model keeps the weights close to it, since
+there are far fewer samples than the model was trained on.
+
+    $ python3 -m autoelective.captcha.finetune [-m MODEL] [-d DIR ...] [-o OUTPUT] [-e EPOCHS]
+
+Part of the passed captchas is held out, the model is written only if its code accuracy
+on them isn't worse than the input model's. The output defaults to `<model>.ft.pt`, or the
+model itself if it's already a fine-tuned one. It's replaced atomically, so elective loops
+with `reload_interval` in `[captcha]` pick up the new weights without restarting, those
+using the input model switch to the `.ft.pt` file once it's written.
+"""
+
+import os
+import time
+import multiprocessing
+from optparse import OptionParser
+import numpy as np
+import torch
+import torch.nn.functional as F
+from .cnn import CaptchaCNN
+from .processor import split_captcha
+from .dataset import iter_archive_samples
+from .backend import CAPTCHA_LABELS, get_finetuned_file
+from .distill import _predict
+
+N = 52
+
+
+def load_validations(folders, pool):
+    """
+    -> (uint8 segments [n][n_chars][N][N], labels [n] with None for failed-only captchas,
+        rejected codes [n])
+    """
+    samples = [ s for s in iter_archive_samples(*folders) if s[0] is not None or s[1] ]
+    segs = pool.map(_split, [ im_data for _, _, im_data in samples ], chunksize=32)
+    labels, rejected, X = [], [], []
+    for (label, codes, _), s in zip(samples, segs):
+        if s is None:
+            continue
+        labels.append(label)
+        rejected.append(sorted(codes))
+        X.append(s)
+    return np.array(X, dtype=np.uint8).reshape(-1, 4, N, N), labels, rejected
+
+def _split(im_data):
+    try:
+        return np.array(split_captcha(im_data), dtype=np.uint8)
+    except Exception:
+        return None
+
+def _code_targets(codes):
+    """ -> int64 [n][n_chars] """
+    ixs = { c: ix for ix, c in enumerate(CAPTCHA_LABELS) }
+    return np.array([ [ ixs[c] for c in code ] for code in codes ], dtype=np.int64).reshape(-1, 4)
+
+def _code_log_probs(log_probs, codes):
+    """ log_probs: [n][n_chars][n_labels], codes: int64 [n][n_chars] -> joint log-probs [n] """
+    return log_probs.gather(2, codes.unsqueeze(2)).squeeze(2).sum(dim=1)
+
+def _code_accuracy(model, X, codes):
+    if len(X) == 0:
+        return float('nan')
+    pred = _predict(model, X.reshape(-1, 1, N, N)).argmax(dim=1).reshape(-1, 4)
+    return (pred == codes).all(dim=1).float().mean().item()
+
+def _repeat_rate(model, X, rejected):
+    """ fraction of failed captchas still recognized as one of their rejected codes """
+    if len(X) == 0:
+        return float('nan')
+    pred = _predict(model, X.reshape(-1, 1, N, N)).argmax(dim=1).reshape(-1, 4).tolist()
+    codes = [ ''.join( CAPTCHA_LABELS[ix] for ix in row ) for row in pred ]
+    return float(np.mean([ code in r for code, r in zip(codes, rejected) ]))
+
+
+def finetune(model, X, y, X_neg, y_neg, epochs=5, batch_size=64, lr=1e-4, beta=1.0, seed=0):
+    """
+    X: float32 [n][n_chars][N][N] of passed captchas, y: int64 [n][n_chars]
+    X_neg: float32 [m][n_chars][N][N], y_neg: int64 [m][n_chars], one row per rejected code
+    beta: weight of the distillation loss against the input model
+
+    BatchNorm keeps its running statistics, there are too few samples to re-estimate them.
+    """
+    torch.manual_seed(seed)
+    teacher = CaptchaCNN.from_state_dict(model.state_dict())
+    teacher.eval()
+    soft = _predict(teacher, X.reshape(-1, 1, N, N)).reshape(len(X), 4, -1) if len(X) else None
+    soft_neg = _predict(teacher, X_neg.reshape(-1, 1, N, N)).reshape(len(X_neg), 4, -1) if len(X_neg) else None
+
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    model.eval()
+    model.requires_grad_(True)
+
+    n_batches = max(1, (max(len(X), len(X_neg)) + batch_size - 1) // batch_size)
+    for epoch in range(1, epochs + 1):
+        t0 = time.perf_counter()
+        total = 0.0
+        steps = 0
+        perm = torch.randperm(len(X))
+        perm_neg = torch.randperm(len(X_neg))
+        for ix in range(n_batches):
+            loss = 0.0
+
+            b = perm[ix * batch_size : (ix+1) * batch_size]
+            if len(b) > 0:
+                out = model(X[b].reshape(-1, 1, N, N)).reshape(len(b), 4, -1)
+                loss = loss + F.nll_loss(out.reshape(-1, out.shape[-1]), y[b].reshape(-1))
+                loss = loss + beta * F.kl_div(out, soft[b], reduction='batchmean', log_target=True) / 4
+
+            b = perm_neg[ix * batch_size : (ix+1) * batch_size]
+            if len(b) > 0:
+                out = model(X_neg[b].reshape(-1, 1, N, N)).reshape(len(b), 4, -1)
+                logp = _code_log_probs(out, y_neg[b]).clamp(max=-1e-6)
+                loss = loss - torch.log(-torch.expm1(logp)).mean()  # -log(1 - p(code))
+                loss = loss + beta * F.kl_div(out, soft_neg[b], reduction='batchmean', log_target=True) / 4
+
+            if not torch.is_tensor(loss): # neither passed nor failed captchas in this batch
+                continue
+
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total += loss.item()
+            steps += 1
+
+        print("epoch %2d  loss %.4f  %.1f s" % (epoch, total / max(1, steps), time.perf_counter() - t0))
+
+    model.requires_grad_(False)
+    return model
+
+
+def save_model(model, file):
+    """ replace the file atomically, a reloading recognizer never reads a partial file """
+    tmp_file = "%s.%d.tmp" % (file, os.getpid())
+    try:
+        torch.save(model.state_dict(), tmp_file)
+        os.replace(tmp_file, file)
+    finally:
+        if os.path.exists(tmp_file):
+            os.unlink(tmp_file)
+
+
+def main():
+    from ..const import CNN_MODEL_FILE, CAPTCHA_CACHE_DIR
+
+    parser = OptionParser(description='Fine-tune CaptchaCNN on the validated captchas of the captcha archive')
+    parser.add_option('-m', '--model', dest='model_file', default=CNN_MODEL_FILE, metavar="FILE")
+    parser.add_option('-o', '--output', dest='output', default=None, metavar="FILE",
+                      help='output file, default to <model>.ft.pt')
+    parser.add_option('-d', '--data', dest='folders', action='append', default=None, metavar="DIR",
+                      help='folders of captcha archives, default to the captcha cache')
+    parser.add_option('-e', '--epochs', dest='epochs', type='int', default=5)
+    parser.add_option('--lr', dest='lr', type='float', default=1e-4)
+    parser.add_option('--beta', dest='beta', type='float', default=1.0,
+                      help='weight of the distillation loss against the input model')
+    parser.add_option('--val-ratio', dest='val_ratio', type='float', default=0.2)
+    options, args = parser.parse_args()
+
+    folders = options.folders or [CAPTCHA_CACHE_DIR]
+    output = options.output or get_finetuned_file(options.model_file)
+
+    with multiprocessing.Pool() as pool:
+        segs, labels, rejected = load_validations(folders, pool)
+
+    passed = np.array([ ix for ix, label in enumerate(labels) if label is not None ], dtype=np.int64)
+    failed = np.array([ ix for ix, label in enumerate(labels) if label is None ], dtype=np.int64)
+    if len(passed) == 0:
+        raise ValueError("no passed captcha in the archives of %s" % folders)
+
+    rng = np.random.RandomState(0)
+    passed = passed[rng.permutation(len(passed))]
+    n_val = max(1, int(len(passed) * options.val_ratio))
+    val, train = passed[:n_val], passed[n_val:]
+    print("captchas: %d (passed: %d, failed: %d), holdout: %d" % (
+          len(labels), len(passed), len(failed), len(val)))
+
+    def _tensor(ixs):
+        return torch.from_numpy(segs[ixs].astype(np.float32))
+
+    X, y = _tensor(train), torch.from_numpy(_code_targets([ labels[ix] for ix in train ]))
+    X_val, y_val = _tensor(val), torch.from_numpy(_code_targets([ labels[ix] for ix in val ]))
+
+    # every rejected code of a captcha is a row, including those of the passed ones
+    neg = [ (ix, code) for ix in np.concatenate([train, failed]) for code in rejected[ix] ]
+    if len(train) == 0 and len(neg) == 0:
+        print("No captcha is left for training besides the holdout, archive more captchas "
+              "or lower --val-ratio, %s is left unchanged" % output)
+        return
+    X_neg = _tensor(np.array([ ix for ix, _ in neg ], dtype=np.int64))
+    y_neg = torch.from_numpy(_code_targets([ code for _, code in neg ]))
+    X_failed, rejected_failed = _tensor(failed), [ rejected[ix] for ix in failed ]
+
+    model = CaptchaCNN.from_state_dict(torch.load(options.model_file, map_location='cpu'))
+    model.eval()
+    acc0 = _code_accuracy(model, X_val, y_val)
+    repeat0 = _repeat_rate(model, X_failed, rejected_failed)
+
+    finetune(model, X, y, X_neg, y_neg, epochs=options.epochs, lr=options.lr, beta=options.beta)
+    acc1 = _code_accuracy(model, X_val, y_val)
+    repeat1 = _repeat_rate(model, X_failed, rejected_failed)
+
+    print("holdout code_acc: %.4f -> %.4f" % (acc0, acc1))
+    print("failed captchas recognized as a rejected code: %.4f -> %.4f" % (repeat0, repeat1))
+
+    if acc1 < acc0:
+        print("Holdout accuracy decreased, %s is left unchanged" % output)
+        return
+
+    save_model(model, output)
+    print("Save fine-tuned model to %s" % output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: npcnn.py
+# modified: 2026-10-18
+
+"""
+A pure-NumPy implementation of CaptchaCNN's inference path, it never imports torch.
+
+Activations are kept in NHWC layout, so that a 3x3 conv becomes a single GEMM between
+the im2col matrix of shape (batch*Ho*Wo, C*3*3) and the reshaped conv weights, and no
+transpose is required between layers.
+"""
+
+import pickle
+import zipfile
+from collections import OrderedDict
+import numpy as np
+from .weights import load_cached
+
+_BN_EPS = 1e-5
+
+_STORAGE_DTYPES = {
+    "FloatStorage": np.float32,
+    "DoubleStorage": np.float64,
+    "HalfStorage": np.float16,
+    "LongStorage": np.int64,
+    "IntStorage": np.int32,
+    "ShortStorage": np.int16,
+    "CharStorage": np.int8,
+    "ByteStorage": np.uint8,
+    "BoolStorage": np.bool_,
+}
+
+
+def _rebuild_tensor(storage, storage_offset, size, stride, *args):
+    itemsize = storage.itemsize
+    if len(size) == 0:
+        return storage[storage_offset].copy()
+    return np.lib.stride_tricks.as_strided(
+        storage[storage_offset:],
+        shape=tuple(size),
+        strides=tuple( s * itemsize for s in stride ),
+    ).copy()
+
+
+class _StateDictUnpickler(pickle.Unpickler):
+
+    def __init__(self, fp, zf, prefix):
+        super().__init__(fp)
+        self._zf = zf
+        self._prefix = prefix
+
+    def find_class(self, module, name):
+        if module == "torch._utils" and name == "_rebuild_tensor_v2":
+            return _rebuild_tensor
+        if module == "torch" and name in _STORAGE_DTYPES:
+            return name
+        if module == "collections" and name == "OrderedDict":
+            return OrderedDict
+        raise pickle.UnpicklingError("unsupported global %s.%s in state_dict" % (module, name))
+
+    def persistent_load(self, pid):
+        typename, storage_type, key, location, numel = pid
+        assert typename == "storage", typename
+        data = self._zf.read("%sdata/%s" % (self._prefix, key))
+        return np.frombuffer(data, dtype=_STORAGE_DTYPES[storage_type])
+
+
+def load_torch_state_dict(model_file):
+    """
+    Read a state_dict saved by `torch.save` (zip format, torch >= 1.6) into numpy arrays
+    without importing torch
+    """
+    if not zipfile.is_zipfile(model_file):
+        import torch  # legacy format, only torch itself can read it
+        sd = torch.load(model_file, map_location='cpu')
+        return OrderedDict( (k, v.numpy()) for k, v in sd.items() )
+
+    with zipfile.ZipFile(model_file) as zf:
+        pkl = [ name for name in zf.namelist() if name.endswith("data.pkl") ]
+        assert len(pkl) == 1, pkl
+        prefix = pkl[0][:-len("data.pkl")]
+        if "%sbyteorder" % prefix in zf.namelist():
+            assert zf.read("%sbyteorder" % prefix) == b"little"
+        with zf.open(pkl[0]) as fp:
+            return _StateDictUnpickler(fp, zf, prefix).load()
+
+
+def convert_state_dict(sd):
+    """
+    Convert a CaptchaCNN state_dict into inference-ready arrays, bn1..bn6 are folded into
+    the convs, conv weights are reshaped for GEMM and fc1 is permuted for NHWC flatten
+    """
+    def _bn_scale(name):
+        scale = sd[name + ".weight"] / np.sqrt(sd[name + ".running_var"] + _BN_EPS)
+        shift = sd[name + ".bias"] - sd[name + ".running_mean"] * scale
+        return scale, shift
+
+    weights = OrderedDict()
+
+    scale, shift = _bn_scale("bn0")
+    weights["bn0.scale"] = scale
+    weights["bn0.shift"] = shift
+
+    for ix in range(1, 7):
+        W = sd["conv%d.weight" % ix]
+        b = sd["conv%d.bias" % ix]
+        scale, shift = _bn_scale("bn%d" % ix)
+        W = W * scale.reshape(-1, 1, 1, 1)
+        b = b * scale + shift
+        O, C, kh, kw = W.shape
+        weights["conv%d.weight" % ix] = W.transpose(1, 2, 3, 0).reshape(C * kh * kw, O) # (C*kh*kw, O)
+        weights["conv%d.bias" % ix] = b
+
+    W = sd["fc1.weight"]  # (512, C*H*W)
+    C = sd["conv6.weight"].shape[0]
+    HW = W.shape[1] // C
+    hw = int(round(HW ** 0.5))
+    weights["fc1.weight"] = W.reshape(-1, C, hw, hw).transpose(0, 2, 3, 1).reshape(W.shape[0], -1).T
+    weights["fc1.bias"] = sd["fc1.bias"]
+
+    for ix in (2, 3):
+        weights["fc%d.weight" % ix] = sd["fc%d.weight" % ix].T
+        weights["fc%d.bias" % ix] = sd["fc%d.bias" % ix]
+
+    return OrderedDict( (k, np.ascontiguousarray(v, dtype=np.float32)) for k, v in weights.items() )
+
+
+def load_weights(model_file, cache_file=None):
+    """
+    Load inference-ready weights, the result of the first conversion is cached to the flat
+    file `cache_file` (default: <model>.numpy.bin) and memory-mapped as long as it's newer
+    than the model
+    """
+    def _convert(model_file):
+        return convert_state_dict(load_torch_state_dict(model_file))
+
+    return load_cached(model_file, "numpy", _convert, flat_file=cache_file)
+
+
+def relu(x):
+    return np.maximum(x, 0, out=x)
+
+def conv2d(x, W, b):
+    """ 3x3 valid conv with stride 1, x: (B, H, W, C) -> (B, H-2, W-2, O) """
+    B, H, W_, C = x.shape
+    k = 3
+    Ho, Wo = H - k + 1, W_ - k + 1
+    sB, sH, sW, sC = x.strides
+    cols = np.lib.stride_tricks.as_strided(
+        x,
+        shape=(B, Ho, Wo, C, k, k),
+        strides=(sB, sH, sW, sC, sH, sW),
+    ).reshape(B * Ho * Wo, C * k * k)
+    y = cols @ W
+    y += b
+    return y.reshape(B, Ho, Wo, -1)
+
+def avg_pool2d(x, k=2):
+    B, H, W, C = x.shape
+    Ho, Wo = H // k, W // k
+    x = x[:, :Ho*k, :Wo*k, :].reshape(B, Ho, k, Wo, k, C)
+    return x.mean(axis=(2, 4), dtype=np.float32)
+
+def linear(x, W, b):
+    y = x @ W
+    y += b
+    return y
+
+def log_softmax(x):
+    x = x - x.max(axis=1, keepdims=True)
+    x -= np.log(np.exp(x).sum(axis=1, keepdims=True))
+    return x
+
+
+class NumpyCaptchaCNN(object):
+
+    def __init__(self, weights):
+        self._w = weights
+
+    def forward(self, x):
+        """ x: (batch, 1, 52, 52) float32 -> (batch, 29) log-probs """
+        w = self._w
+        x = np.ascontiguousarray(x, dtype=np.float32).transpose(0, 2, 3, 1) # NHWC
+        x = x * w["bn0.scale"] + w["bn0.shift"]
+        x = relu(x)
+        x = relu(conv2d(x, w["conv1.weight"], w["conv1.bias"]))   # batch*50*50*16
+        x = relu(conv2d(x, w["conv2.weight"], w["conv2.bias"]))   # batch*48*48*32
+        x = avg_pool2d(x)                                         # batch*24*24*32
+        x = relu(conv2d(x, w["conv3.weight"], w["conv3.bias"]))   # batch*22*22*64
+        x = relu(conv2d(x, w["conv4.weight"], w["conv4.bias"]))   # batch*20*20*128
+        x = avg_pool2d(x)                                         # batch*10*10*128
+        x = relu(conv2d(x, w["conv5.weight"], w["conv5.bias"]))   # batch*8*8*256
+        x = avg_pool2d(x)                                         # batch*4*4*256
+        x = relu(conv2d(x, w["conv6.weight"], w["conv6.bias"]))   # batch*2*2*512
+        x = x.reshape(x.shape[0], -1)                             # batch*2048
+        x = relu(linear(x, w["fc1.weight"], w["fc1.bias"]))       # batch*512
+        x = relu(linear(x, w["fc2.weight"], w["fc2.bias"]))       # batch*128
+        x = linear(x, w["fc3.weight"], w["fc3.bias"])             # batch*29
+        return log_softmax(x)
+
+    __call__ = forward
@@ -1,13 +1,57 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 # filename: processor.py
-# modified: 2019-09-08
+# modified: 2026-10-18
 
+import threading
 import cv2
 import numpy as np
 from io import BytesIO
 from PIL import Image
 
+_FRAMES = (3, 7, 11, 15)
+
+_KERNEL_RECT_2x1 = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 1))
+_KERNEL_RECT_1x2 = cv2.getStructuringElement(cv2.MORPH_RECT, (1, 2))
+_KERNEL_CROSS_3x3 = cv2.getStructuringElement(cv2.MORPH_CROSS, (3, 3))
+_KERNEL_CROSS_11x11 = cv2.getStructuringElement(cv2.MORPH_CROSS, (11, 11))
+
+_local = threading.local()  # frame buffer of each thread
+
+
+def _get_frame_buffer(h, w):
+    buf = getattr(_local, "frames", None)
+    if buf is None or buf.shape != (len(_FRAMES), h, w):
+        buf = _local.frames = np.empty((len(_FRAMES), h, w), dtype=np.uint8)
+    return buf
+
+def _palette_to_gray(im):
+    palette = np.zeros(256 * 3, dtype=np.uint8)
+    P = im.getpalette()
+    palette[:len(P)] = P
+    return cv2.cvtColor(palette.reshape(256, 1, 3), cv2.COLOR_RGB2GRAY).reshape(256)
+
+def _decode_frames(im):
+    """
+    Decode the selected frames into the reused grayscale buffer of this thread. Palette
+    frames are converted by looking up a grayscale palette, which gives the same result
+    as converting every pixel to RGB and then to gray.
+    """
+    w, h = im.size
+    buf = _get_frame_buffer(h, w)
+
+    for k, ix in enumerate(_FRAMES):
+        im.seek(ix)
+        if im.mode == 'P':
+            im.load()
+            np.take(_palette_to_gray(im), np.asarray(im), out=buf[k])
+        elif im.mode == 'RGB':
+            cv2.cvtColor(np.asarray(im), cv2.COLOR_RGB2GRAY, dst=buf[k])
+        else:
+            cv2.cvtColor(np.asarray(im.convert('RGB')), cv2.COLOR_RGB2GRAY, dst=buf[k])
+
+    return buf
+
 
 def extract_c0(M0, M_merge):
     _, M_mask = cv2.threshold(M_merge, 0, 0xff, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
@@ -16,12 +60,10 @@ def extract_c0(M0, M_merge):
     M_darken[M_mask == 0x00] >>= 1
 
     _, M_threshold = cv2.threshold(M_darken, 0, 0xff, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
-    kernel1 = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 1))
-    M_close1 = cv2.morphologyEx(M_threshold, cv2.MORPH_CLOSE, kernel1, iterations=1)
+    M_close1 = cv2.morphologyEx(M_threshold, cv2.MORPH_CLOSE, _KERNEL_RECT_2x1, iterations=1)
     M_blur1 = cv2.medianBlur(M_close1, 3)
 
-    kernel2 = cv2.getStructuringElement(cv2.MORPH_RECT, (1, 2))
-    M_close2 = cv2.morphologyEx(M_threshold, cv2.MORPH_CLOSE, kernel2, iterations=1)
+    M_close2 = cv2.morphologyEx(M_threshold, cv2.MORPH_CLOSE, _KERNEL_RECT_1x2, iterations=1)
     M_blur2 = cv2.medianBlur(M_close2, 3)
 
     if np.sum(M_blur1[:, :40]) <= np.sum(M_blur2[:, :40]):
@@ -35,8 +77,7 @@ def extract_c123(M0, M0_last):
     M_subtract = cv2.subtract(M0_last, M0)
 
     _, M_threshold = cv2.threshold(M_subtract, 0, 0xff, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
-    kernel = cv2.getStructuringElement(cv2.MORPH_CROSS, (3, 3))
-    M_opened = cv2.morphologyEx(M_threshold, cv2.MORPH_OPEN, kernel, iterations=1)
+    M_opened = cv2.morphologyEx(M_threshold, cv2.MORPH_OPEN, _KERNEL_CROSS_3x3, iterations=1)
 
     Mt = cv2.medianBlur(M_opened, 3)
     return Mt
@@ -49,22 +90,15 @@ def crop(Mt, first):
     assert Mt.shape[0] == captcha_size
 
     M_blur = cv2.medianBlur(Mt, 5)
-    kernel = cv2.getStructuringElement(cv2.MORPH_CROSS, (11, 11))
-    M_opened = cv2.morphologyEx(M_blur, cv2.MORPH_OPEN, kernel, iterations=3)
+    M_opened = cv2.morphologyEx(M_blur, cv2.MORPH_OPEN, _KERNEL_CROSS_11x11, iterations=3)
 
     w = 50 if first else Mt.shape[1]
 
     S0 = (0xff - M_opened).sum(axis=0).cumsum()
     k = char_width
 
-    max_sum = -1
-    max_pos = -1
-
-    for i in range(k, w):
-        s = S0[i] - S0[i - k]
-        if s > max_sum:
-            max_sum = s
-            max_pos = i
+    # the first position of the maximum window sum over S0[i] - S0[i - k], k <= i < w
+    max_pos = k + int(np.argmax(S0[k:w] - S0[:w-k]))
 
     w = max_pos - k - (captcha_size - k) // 2
 
@@ -88,22 +122,18 @@ def split_captcha(im_data):
     assert im.format == "GIF", im.format
     assert im.n_frames == 16, im.n_frames
 
-    N = 52
     w, h = im.size
 
-    M0_list = []
+    M0_list = _decode_frames(im)
+    M_merge = M0_list.min(axis=0)
+
+    im.close()
+    fp.close()
+
     M0_last = None
     M_mask = np.zeros((h, w), dtype=np.uint8)
-    M_merge = np.full((h, w), 0xff, dtype=np.uint8)
     Xlist = []
 
-    for ix in (3, 7, 11, 15):
-        im.seek(ix)
-        M0 = np.array(im.convert('RGB'))
-        M0 = cv2.cvtColor(M0, cv2.COLOR_RGB2GRAY)
-        M0_list.append(M0)
-        M_merge = np.min([M_merge, M0], axis=0)
-
     for cix, M0 in enumerate(M0_list):
         first = (M0_last is None)
 
@@ -122,7 +152,4 @@ def split_captcha(im_data):
 
         Xlist.append(Mt)
 
-    im.close()
-    fp.close()
-
     return Xlist
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: quantize.py
+# modified: 2026-10-18
+
+"""
+Post-training static int8 quantization of CaptchaCNN, calibrated on locally saved
+captchas. The quantized model is saved as TorchScript next to the fp32 model, e.g.
+`model/cnn.20210311.1.int8.pt`, and loaded by the `torch-int8` backend.
+
+    $ python3 -m autoelective.captcha.quantize [-m MODEL] [-d DIR ...] [-o OUTPUT]
+
+By default it calibrates on CAPTCHA_CACHE_DIR and test/data, then prints a report that
+compares char/code accuracy, per-captcha latency and model size against the fp32 model.
+"""
+
+import os
+import time
+from optparse import OptionParser
+import numpy as np
+import torch
+from .cnn import QuantizableCaptchaCNN
+from .processor import split_captcha
+from .dataset import load_gifs
+
+
+def get_int8_file(model_file):
+    if model_file.endswith(".int8.pt"):
+        return model_file
+    return os.path.splitext(model_file)[0] + ".int8.pt"
+
+def build_segments(samples):
+    N = 52
+    return np.array([ split_captcha(im_data) for _, im_data in samples ], dtype=np.float32).reshape(-1, 1, N, N)
+
+def quantize_model(model_file, X, engine=None, batch_size=256):
+    """
+    X: float32 segments of shape (batch, 1, 52, 52) used for calibration
+    """
+    from torch.quantization import get_default_qconfig, prepare, convert
+
+    engine = engine or torch.backends.quantized.engine
+    torch.backends.quantized.engine = engine
+
+    model = QuantizableCaptchaCNN.from_state_dict(torch.load(model_file, map_location='cpu'))
+    model.eval()
+    model.fold_batchnorm()
+    model.fuse_modules()
+    model.qconfig = get_default_qconfig(engine)
+    model.bn0.qconfig = None  # runs in float before the QuantStub
+
+    prepare(model, inplace=True)
+    with torch.no_grad():
+        for ix in range(0, len(X), batch_size):
+            model(torch.from_numpy(X[ix : ix+batch_size]))
+    convert(model, inplace=True)
+
+    return model
+
+def save_int8(model, file):
+    N = 52
+    with torch.no_grad():
+        traced = torch.jit.trace(model, torch.zeros((4, 1, N, N), dtype=torch.float32))
+    extra = {"engine": torch.backends.quantized.engine}
+    torch.jit.save(traced, file, _extra_files=extra)
+
+def load_int8(file):
+    extra = {"engine": ""}
+    model = torch.jit.load(file, map_location='cpu', _extra_files=extra)
+    engine = extra["engine"]
+    if isinstance(engine, bytes):
+        engine = engine.decode()
+    if engine:
+        torch.backends.quantized.engine = engine
+    model.eval()
+    return model
+
+
+def _evaluate(r, samples, rounds):
+    labeled = [ (label, im_data) for label, im_data in samples if label is not None ]
+    codes = [ c.code for c in r.recognize_batch([ im_data for _, im_data in samples ]) ]
+
+    chars = sum( sum( a == b for a, b in zip(label, c) ) for (label, _), c in zip(samples, codes) if label is not None )
+    hits = sum( label == c for (label, _), c in zip(samples, codes) if label is not None )
+
+    N = 52
+    X = np.zeros((4, 1, N, N), dtype=np.float32)
+    r.backend.forward(X)
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        r.backend.forward(X)
+    t_forward = (time.perf_counter() - t0) / rounds
+
+    return {
+        "codes": codes,
+        "char_acc": chars / (4 * len(labeled)) if labeled else float('nan'),
+        "code_acc": hits / len(labeled) if labeled else float('nan'),
+        "forward_ms": t_forward * 1000,
+    }
+
+def report(model_file, int8_file, samples, rounds=100):
+    from .recognizer import CaptchaRecognizer
+
+    r0 = CaptchaRecognizer(model_file, backend="torch", optimize=True)
+    r1 = CaptchaRecognizer(int8_file, backend="torch-int8", optimize=True)
+    res0 = _evaluate(r0, samples, rounds)
+    res1 = _evaluate(r1, samples, rounds)
+    agree = np.mean([ a == b for a, b in zip(res0["codes"], res1["codes"]) ])
+    n_labeled = sum( label is not None for label, _ in samples )
+
+    print("samples: %d (labeled: %d)" % (len(samples), n_labeled))
+    print("%-6s  %8s  %8s  %12s  %10s" % ("model", "char_acc", "code_acc", "captcha_ms", "size_kb"))
+    for name, res, file in [ ("fp32", res0, model_file), ("int8", res1, int8_file) ]:
+        print("%-6s  %8.4f  %8.4f  %12.3f  %10.1f" % (
+              name, res["char_acc"], res["code_acc"], res["forward_ms"], os.path.getsize(file) / 1024))
+    print("int8/fp32 code agreement: %.4f" % agree)
+
+
+def main():
+    from ..const import CNN_MODEL_FILE, CAPTCHA_CACHE_DIR, TEST_DATA_DIR
+
+    parser = OptionParser(description='Int8 post-training quantization of CaptchaCNN')
+    parser.add_option('-m', '--model', dest='model_file', default=CNN_MODEL_FILE, metavar="FILE")
+    parser.add_option('-o', '--output', dest='int8_file', default=None, metavar="FILE",
+                      help='output file, default to <model>.int8.pt')
+    parser.add_option('-d', '--data', dest='folders', action='append', default=None, metavar="DIR",
+                      help='folders of calibration GIFs, default to the captcha cache and test/data')
+    parser.add_option('-e', '--engine', dest='engine', default=None,
+                      help='quantized engine, e.g. fbgemm, qnnpack')
+    options, args = parser.parse_args()
+
+    folders = options.folders or [CAPTCHA_CACHE_DIR, TEST_DATA_DIR]
+    int8_file = options.int8_file or get_int8_file(options.model_file)
+
+    samples = load_gifs(*folders)
+    if len(samples) == 0:
+        raise ValueError("no calibration GIFs in %s" % folders)
+    print("Calibrate on %d captchas from %s" % (len(samples), folders))
+
+    model = quantize_model(options.model_file, build_segments(samples), options.engine)
+    save_int8(model, int8_file)
+    print("Save int8 model to %s" % int8_file)
+    print("")
+
+    report(options.model_file, int8_file, samples)
+
+if __name__ == '__main__':
+    main()
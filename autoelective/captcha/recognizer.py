@@ -1,30 +1,86 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 # filename: recognizer.py
-# modified: 2020-02-16
+# modified: 2026-10-18
 
 import os
 import time
+import heapq
+import threading
 import numpy as np
 import cv2
-import torch
 from .processor import split_captcha
-from .cnn import CaptchaCNN
+from .backend import get_backend_class, get_finetuned_file, CAPTCHA_LABELS
 
 
 class Captcha(object):
 
-    __slots__ = ['_code','_im_data','_im_segs']
+    __slots__ = ['_code','_im_data','_im_segs','_log_probs']
 
-    def __init__(self, code, im_data, im_segs):
+    def __init__(self, code, im_data, im_segs, log_probs=None):
         self._code = code
         self._im_data = im_data
         self._im_segs = im_segs
+        self._log_probs = log_probs  # float32 [n_chars][n_labels]
 
     @property
     def code(self):
         return self._code
 
+    @property
+    def im_data(self):
+        return self._im_data
+
+    @property
+    def char_confidences(self):
+        """ probability of each recognized char """
+        if self._log_probs is None:
+            return None
+        return tuple( float(p) for p in np.exp(self._log_probs.max(axis=1)) )
+
+    @property
+    def confidence(self):
+        """ joint probability of the whole code, chars are assumed independent """
+        if self._log_probs is None:
+            return None
+        return float(np.exp(self._log_probs.max(axis=1).sum()))
+
+    def candidates(self, n):
+        """
+        N-best codes ranked by joint probability -> [(code, prob)], the first one is `code`.
+        Positions are independent, so the list is enumerated best-first over the ranks
+        of each position.
+        """
+        if self._log_probs is None:
+            return [(self._code, None)]
+
+        labels = CAPTCHA_LABELS
+        L = self._log_probs
+        order = np.argsort(-L, axis=1)                      # label indices of each position, best first
+        scores = np.take_along_axis(L, order, axis=1)       # sorted log-probs
+        n_chars, n_labels = L.shape
+
+        def _score(ranks):
+            return float(sum( scores[ix, k] for ix, k in enumerate(ranks) ))
+
+        start = (0,) * n_chars
+        heap = [(-_score(start), start)]
+        seen = {start}
+        results = []
+
+        while heap and len(results) < n:
+            neg_score, ranks = heapq.heappop(heap)
+            code = ''.join( labels[order[ix, k]] for ix, k in enumerate(ranks) )
+            results.append((code, float(np.exp(-neg_score))))
+            for ix in range(n_chars):
+                if ranks[ix] + 1 < n_labels:
+                    nxt = ranks[:ix] + (ranks[ix] + 1,) + ranks[ix+1:]
+                    if nxt not in seen:
+                        seen.add(nxt)
+                        heapq.heappush(heap, (-_score(nxt), nxt))
+
+        return results
+
     def __repr__(self):
         return '%s(%r)' % (
             self.__class__.__name__,
@@ -48,21 +104,135 @@ class Captcha(object):
 
 class CaptchaRecognizer(object):
 
-    def __init__(self, model_file):
-        self._model = CaptchaCNN()
-        self._model.load_state_dict(torch.load(model_file, map_location='cpu'))
-        self._model.eval()
+    def __init__(self, model_file, backend="torch", optimize=False, num_threads=0):
+        """
+        backend         name of the inference backend, see `backend.BACKENDS`
+        optimize        fold BatchNorm into convs, drop autograd state and run a warm-up pass,
+                        so that the first captcha in the elective loop isn't the slowest one
+        num_threads     intra-op threads used by torch, 0 means torch's default
+        """
+        self._model_file = model_file
+        self._backend_name = backend
+        self._optimize = optimize
+        self._num_threads = num_threads
+        self._backend = self._create_backend(model_file)
+        self._lock = threading.Lock() # backends such as cv2.dnn.Net aren't thread-safe
+        self._watcher = None
+        self.reloads = 0
+
+    @property
+    def backend(self):
+        return self._backend
+
+    @property
+    def model_file(self):
+        return self._model_file
+
+    def _create_backend(self, model_file):
+        clz = get_backend_class(self._backend_name)
+        backend = clz(model_file, optimize=self._optimize, num_threads=self._num_threads)
+        if self._optimize:
+            self._warmup(backend)
+        return backend
+
+    def _warmup(self, backend):
+        N = 52
+        X = np.zeros((4, 1, N, N), dtype=np.float32)
+        backend.forward(X)
+
+    def reload(self, model_file=None):
+        """
+        Load the weights again, e.g. after `python3 -m autoelective.captcha.finetune`
+        replaced the model file, or from another model file. The new backend is built and
+        warmed up aside, so recognition is only blocked by the swap itself. If loading
+        fails, the current backend is kept and the error is raised.
+        """
+        model_file = model_file or self._model_file
+        backend = self._create_backend(model_file)
+        with self._lock:
+            self._backend = backend
+            self._model_file = model_file
+        self.reloads += 1
+
+    def watch(self, interval, callback=None):
+        """
+        Poll the mtime of the model file every `interval` seconds in a daemon thread and
+        reload it once it changes. The `.ft.pt` file of the model is polled as well, the
+        recognizer switches to it once it's written by the first fine-tuning. `callback(error)`
+        is called after every reload attempt, `error` is None on success.
+        """
+        if self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._run_watcher, args=(interval, callback),
+                                         name="captcha-reloader", daemon=True)
+        self._watcher.start()
+
+    def _get_mtime(self):
+        try:
+            return os.path.getmtime(self._backend.source_file)
+        except OSError:
+            return None  # being replaced right now
+
+    def _get_finetuned_mtime(self):
+        """ -> mtime of the `.ft.pt` file of the model, None if it doesn't exist or it's in use """
+        file = get_finetuned_file(self._model_file)
+        if file == self._model_file:
+            return None
+        try:
+            return os.path.getmtime(file)
+        except OSError:
+            return None
+
+    def _run_watcher(self, interval, callback):
+        mtime = self._get_mtime()
+        ft_mtime = self._get_finetuned_mtime() # an existing one is used once it's written again
+        while True:
+            time.sleep(interval)
+            model_file = None
+            current = self._get_finetuned_mtime()
+            if current is not None and current != ft_mtime:
+                ft_mtime = current
+                model_file = get_finetuned_file(self._model_file)
+            else:
+                current = self._get_mtime()
+                if current is None or current == mtime:
+                    continue
+                mtime = current
+            error = None
+            try:
+                self.reload(model_file)
+                mtime = self._get_mtime()
+            except Exception as e:
+                error = e
+            if callback is not None:
+                callback(error)
 
     def recognize(self, im_data):
-        assert isinstance(im_data, bytes)
+        return self.recognize_batch([im_data])[0]
+
+    def recognize_batch(self, im_data_list):
+        """
+        Recognize several captchas with a single forward pass, the segments of all
+        images are stacked into one batch*4 tensor
+        """
+        assert all( isinstance(im_data, bytes) for im_data in im_data_list )
+
+        if len(im_data_list) == 0:
+            return []
 
         N = 52
-        labels = self._model.CAPTCHA_LABELS
+        labels = self._backend.labels
 
-        im_segs = split_captcha(im_data)
-        Xlist = np.array(im_segs, dtype=np.float32).reshape(-1, 1, N, N)
-        ylist = self._model(torch.from_numpy(Xlist))
+        im_segs_list = [ split_captcha(im_data) for im_data in im_data_list ]
+        n_segs = len(im_segs_list[0])
 
-        code = ''.join( labels[ix] for ix in torch.argmax(ylist, dim=1) )
+        Xlist = np.array(im_segs_list, dtype=np.float32).reshape(-1, 1, N, N)
+        with self._lock:
+            ylist = self._backend.forward(Xlist)
+        ylist = ylist.reshape(len(im_data_list), n_segs, -1)
+        ixs = np.argmax(ylist, axis=2).tolist()
 
-        return Captcha(code, im_data, im_segs)
+        return [
+            Captcha(''.join( labels[ix] for ix in row ), im_data, im_segs, y)
+            for row, im_data, im_segs, y in zip(ixs, im_data_list, im_segs_list, ylist)
+        ]
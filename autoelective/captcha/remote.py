@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: remote.py
+# modified: 2026-10-18
+
+"""
+Client of the captcha recognition daemon in `server.py`, a drop-in replacement of
+CaptchaRecognizer for the elective loop.
+"""
+
+import time
+import socket
+import struct
+import threading
+from requests.compat import json
+from .server import (send_frame, recv_frame, encode_request, decode_captchas, ProtocolError,
+                     OP_STATS, STATUS_OK)
+
+
+class RemoteCaptchaRecognizer(object):
+
+    def __init__(self, socket_file, fallback=None, timeout=5.0, retry_interval=30.0):
+        """
+        fallback        callable that returns an in-process recognizer, it's called at the
+                        first time the daemon is unavailable, so that the model isn't loaded
+                        in this process as long as the daemon works
+        timeout         socket timeout of a request
+        retry_interval  seconds to use the fallback before connecting to the daemon again
+        """
+        self._socket_file = socket_file
+        self._fallback_factory = fallback
+        self._fallback = None
+        self._timeout = timeout
+        self._retry_interval = retry_interval
+        self._retry_at = 0.0
+        self._sock = None
+        self._lock = threading.Lock()
+        self.last_error = None
+        self.last_queue_ms = None
+        self.counters = { "remote": 0, "fallback": 0 }
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self._timeout)
+        try:
+            sock.connect(self._socket_file)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _request(self, payload):
+        with self._lock:
+            if self._sock is None:
+                self._sock = self._connect()
+            try:
+                send_frame(self._sock, payload)
+                return recv_frame(self._sock)
+            except Exception:
+                self._close()  # the stream may be out of sync
+                raise
+
+    def _get_fallback(self):
+        if self._fallback is None:
+            if self._fallback_factory is None:
+                raise self.last_error
+            self._fallback = self._fallback_factory()
+        return self._fallback
+
+    @property
+    def is_available(self):
+        return time.time() >= self._retry_at
+
+    def recognize(self, im_data):
+        return self.recognize_batch([im_data])[0]
+
+    def recognize_batch(self, im_data_list):
+        assert all( isinstance(im_data, bytes) for im_data in im_data_list )
+
+        if len(im_data_list) == 0:
+            return []
+
+        if self.is_available:
+            try:
+                payload = self._request(encode_request(im_data_list))
+                captchas, self.last_queue_ms = decode_captchas(payload, im_data_list)
+            except OSError as e:  # including ConnectionError, the daemon is unavailable
+                self.last_error = e
+                self._retry_at = time.time() + self._retry_interval
+            except (ProtocolError, struct.error, ValueError) as e:
+                # the daemon works but failed on these images, or its reply is malformed
+                self.last_error = e
+                if not isinstance(e, ProtocolError):
+                    self.close()  # the stream may be out of sync
+                raise
+            else:
+                self.counters["remote"] += 1
+                return captchas
+
+        self.counters["fallback"] += 1
+        return self._get_fallback().recognize_batch(im_data_list)
+
+    def stats(self):
+        """ stats of the daemon """
+        payload = self._request(bytes([OP_STATS]))
+        if payload[0] != STATUS_OK:
+            raise ProtocolError(payload[1:].decode('utf-8', 'replace'))
+        return json.loads(payload[1:].decode('utf-8'))
+
+    def close(self):
+        with self._lock:
+            self._close()
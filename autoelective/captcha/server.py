@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: server.py
+# modified: 2026-10-18
+
+"""
+A local captcha recognition daemon, several elective processes share one loaded model
+through a Unix socket instead of loading it once per process.
+
+    $ python3 -m autoelective.captcha.server [-s SOCKET] [-b BACKEND] [-O] [-w WINDOW_MS]
+
+Requests that arrive within the batching window are recognized in a single forward pass.
+Clients are `remote.RemoteCaptchaRecognizer`.
+
+Every frame on the socket is a 4-byte big-endian length followed by the payload.
+
+    request     op:u8  n:u32  ( len:u32  gif )*n                    op = OP_RECOGNIZE
+                op:u8                                               op = OP_STATS
+    response    STATUS_OK  queue_ms:f32  n_chars:u16  n_labels:u16  N:u16  n:u32
+                           ( code  log_probs:f32[n_chars][n_labels]  segs:u8[n_chars][N][N] )*n
+                STATUS_OK  json                                     (OP_STATS)
+                STATUS_ERROR  message
+"""
+
+import os
+import stat
+import time
+import socket
+import struct
+import threading
+from queue import Queue, Empty
+from collections import deque
+from optparse import OptionParser
+import numpy as np
+from requests.compat import json
+from .recognizer import Captcha
+
+OP_RECOGNIZE = 1
+OP_STATS = 2
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+DEFAULT_SOCKET_FILE = "/tmp/autoelective-captcha.sock"
+
+_LENGTH = struct.Struct('>I')
+_HEADER = struct.Struct('>fHHHI')
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("connection closed by peer")
+        buf += chunk
+    return bytes(buf)
+
+def send_frame(sock, payload):
+    sock.sendall(_LENGTH.pack(len(payload)) + payload)
+
+def recv_frame(sock):
+    n, = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+    return _recv_exact(sock, n)
+
+
+def encode_request(im_data_list):
+    parts = [ bytes([OP_RECOGNIZE]), _LENGTH.pack(len(im_data_list)) ]
+    for im_data in im_data_list:
+        parts.append(_LENGTH.pack(len(im_data)))
+        parts.append(im_data)
+    return b''.join(parts)
+
+def decode_request(payload):
+    n, = _LENGTH.unpack_from(payload, 1)
+    offset = 1 + _LENGTH.size
+    im_data_list = []
+    for _ in range(n):
+        size, = _LENGTH.unpack_from(payload, offset)
+        offset += _LENGTH.size
+        im_data_list.append(payload[offset : offset+size])
+        offset += size
+    if offset != len(payload):
+        raise ProtocolError("malformed recognize request")
+    return im_data_list
+
+def encode_captchas(captchas, queue_ms):
+    y = np.array([ c._log_probs for c in captchas ], dtype='<f4')
+    segs = np.array([ c._im_segs for c in captchas ], dtype=np.uint8)
+    n, n_chars, n_labels = y.shape
+    N = segs.shape[-1]
+    parts = [ bytes([STATUS_OK]), _HEADER.pack(queue_ms, n_chars, n_labels, N, n) ]
+    for c, yi, si in zip(captchas, y, segs):
+        parts.append(c.code.encode('ascii'))
+        parts.append(yi.tobytes())
+        parts.append(si.tobytes())
+    return b''.join(parts)
+
+def decode_captchas(payload, im_data_list):
+    """ -> ([Captcha], queue_ms) """
+    if payload[0] != STATUS_OK:
+        raise ProtocolError(payload[1:].decode('utf-8', 'replace'))
+    queue_ms, n_chars, n_labels, N, n = _HEADER.unpack_from(payload, 1)
+    if n != len(im_data_list):
+        raise ProtocolError("expect %d captchas, got %d" % (len(im_data_list), n))
+    size_y = n_chars * n_labels * 4
+    size_segs = n_chars * N * N
+    offset = 1 + _HEADER.size
+    captchas = []
+    for im_data in im_data_list:
+        code = payload[offset : offset+n_chars].decode('ascii')
+        offset += n_chars
+        y = np.frombuffer(payload, dtype='<f4', count=n_chars*n_labels, offset=offset).reshape(n_chars, n_labels)
+        offset += size_y
+        segs = np.frombuffer(payload, dtype=np.uint8, count=size_segs, offset=offset).reshape(n_chars, N, N)
+        offset += size_segs
+        captchas.append(Captcha(code, im_data, list(segs), y.astype(np.float32)))
+    return captchas, queue_ms
+
+def encode_error(msg):
+    return bytes([STATUS_ERROR]) + msg.encode('utf-8')
+
+
+class _Job(object):
+
+    __slots__ = ['im_data_list','enqueued_at','response','event']
+
+    def __init__(self, im_data_list):
+        self.im_data_list = im_data_list
+        self.enqueued_at = time.perf_counter()
+        self.response = None
+        self.event = threading.Event()
+
+
+class CaptchaServer(object):
+
+    def __init__(self, recognizer, socket_file=DEFAULT_SOCKET_FILE, batch_window=0.005, max_batch=64):
+        """
+        batch_window    seconds to wait for more requests after the first one of a batch
+        max_batch       max number of captchas in one forward pass
+        """
+        self._recognizer = recognizer
+        self._socket_file = socket_file
+        self._batch_window = batch_window
+        self._max_batch = max_batch
+        self._jobs = Queue()
+        self._sock = None
+
+        self._stats_lock = threading.Lock()
+        self._counters = { "connections": 0, "requests": 0, "captchas": 0, "batches": 0, "errors": 0 }
+        self._queue_ms = deque(maxlen=1000)
+        self._recognize_ms = deque(maxlen=1000)
+
+    def stats(self):
+        def _summary(ts):
+            if len(ts) == 0:
+                return None
+            ts = np.array(ts)
+            return { "p50": float(np.percentile(ts, 50)), "p95": float(np.percentile(ts, 95)), "max": float(ts.max()) }
+
+        with self._stats_lock:
+            res = dict(self._counters)
+            res["mean_batch_size"] = res["captchas"] / res["batches"] if res["batches"] else 0.0
+            res["queue_ms"] = _summary(self._queue_ms)
+            res["recognize_ms"] = _summary(self._recognize_ms)
+        return res
+
+    def _recognize_jobs(self, jobs):
+        t0 = time.perf_counter()
+        im_data_list = [ im_data for job in jobs for im_data in job.im_data_list ]
+        captchas = self._recognizer.recognize_batch(im_data_list)
+        t1 = time.perf_counter()
+
+        with self._stats_lock:
+            self._counters["batches"] += 1
+            self._counters["captchas"] += len(im_data_list)
+            self._recognize_ms.append((t1 - t0) * 1000)
+
+        offset = 0
+        for job in jobs:
+            n = len(job.im_data_list)
+            queue_ms = (t0 - job.enqueued_at) * 1000
+            with self._stats_lock:
+                self._queue_ms.append(queue_ms)
+            job.response = encode_captchas(captchas[offset : offset+n], queue_ms)
+            offset += n
+
+    def _run_batcher(self):
+        while True:
+            jobs = [ self._jobs.get() ]
+            n = len(jobs[0].im_data_list)
+            deadline = time.perf_counter() + self._batch_window
+
+            while n < self._max_batch:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    job = self._jobs.get(timeout=timeout)
+                except Empty:
+                    break
+                jobs.append(job)
+                n += len(job.im_data_list)
+
+            try:
+                self._recognize_jobs(jobs)
+            except Exception:
+                # retry them one by one, so that a broken GIF only fails its own request
+                for job in jobs:
+                    try:
+                        self._recognize_jobs([job])
+                    except Exception as e:
+                        with self._stats_lock:
+                            self._counters["errors"] += 1
+                        job.response = encode_error(repr(e))
+
+            for job in jobs:
+                job.event.set()
+
+    def _handle(self, conn):
+        with conn:
+            while True:
+                try:
+                    payload = recv_frame(conn)
+                except (ConnectionError, OSError, struct.error):
+                    return
+
+                op = payload[0] if len(payload) > 0 else None
+
+                if op == OP_RECOGNIZE:
+                    try:
+                        job = _Job(decode_request(payload))
+                    except (ProtocolError, struct.error) as e:
+                        send_frame(conn, encode_error(repr(e)))
+                        continue
+                    with self._stats_lock:
+                        self._counters["requests"] += 1
+                    self._jobs.put(job)
+                    job.event.wait()
+                    response = job.response
+
+                elif op == OP_STATS:
+                    response = bytes([STATUS_OK]) + json.dumps(self.stats()).encode('utf-8')
+
+                else:
+                    response = encode_error("unknown op %r" % op)
+
+                try:
+                    send_frame(conn, response)
+                except OSError:
+                    return
+
+    def _bind(self):
+        path = self._socket_file
+        if os.path.exists(path):
+            if not stat.S_ISSOCK(os.stat(path).st_mode):
+                raise FileExistsError("%s exists and is not a socket" % path)
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+            except OSError:
+                os.unlink(path)  # left by a dead server
+            else:
+                raise OSError("another captcha server is listening on %s" % path)
+            finally:
+                probe.close()
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(path)
+        os.chmod(path, 0o600)
+        sock.listen(64)
+        return sock
+
+    def serve_forever(self):
+        self._sock = self._bind()
+        threading.Thread(target=self._run_batcher, name="batcher", daemon=True).start()
+        try:
+            while True:
+                conn, _ = self._sock.accept()
+                with self._stats_lock:
+                    self._counters["connections"] += 1
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        finally:
+            self.close()
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+            if os.path.exists(self._socket_file):
+                os.unlink(self._socket_file)
+
+
+def _report_loop(server, interval):
+    while True:
+        time.sleep(interval)
+        print("[%s] %s" % (time.strftime("%H:%M:%S"), json.dumps(server.stats())))
+
+
+def main():
+    from ..const import CNN_MODEL_FILE
+    from .recognizer import CaptchaRecognizer
+
+    parser = OptionParser(description='Captcha recognition daemon shared by elective processes')
+    parser.add_option('-m', '--model', dest='model_file', default=CNN_MODEL_FILE, metavar="FILE")
+    parser.add_option('-s', '--socket', dest='socket_file', default=DEFAULT_SOCKET_FILE, metavar="FILE")
+    parser.add_option('-b', '--backend', dest='backend', default='torch')
+    parser.add_option('-O', '--optimize', dest='optimize', action='store_true', default=False)
+    parser.add_option('-t', '--threads', dest='num_threads', type='int', default=0)
+    parser.add_option('-w', '--window', dest='window_ms', type='float', default=5.0,
+                      help='batching window in ms')
+    parser.add_option('--max-batch', dest='max_batch', type='int', default=64)
+    parser.add_option('--report-interval', dest='report_interval', type='float', default=60.0,
+                      help='seconds between two stats reports, 0 to disable')
+    parser.add_option('--reload-interval', dest='reload_interval', type='float', default=0.0,
+                      help='seconds between two checks of the model file, reload it once updated, 0 to disable')
+    options, args = parser.parse_args()
+
+    recognizer = CaptchaRecognizer(options.model_file, backend=options.backend,
+                                   optimize=options.optimize, num_threads=options.num_threads)
+    server = CaptchaServer(recognizer, options.socket_file, options.window_ms / 1000, options.max_batch)
+
+    if options.reload_interval > 0:
+        def _on_reloaded(error):
+            print("[%s] %s" % (time.strftime("%H:%M:%S"),
+                  "Model is reloaded" if error is None else "Unable to reload model: %r" % error))
+        recognizer.watch(options.reload_interval, _on_reloaded)
+
+    if options.report_interval > 0:
+        threading.Thread(target=_report_loop, args=(server, options.report_interval), daemon=True).start()
+
+    print("Captcha server (backend: %s) is listening on %s" % (options.backend, options.socket_file))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
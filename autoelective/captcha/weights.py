@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: weights.py
+# modified: 2026-10-18
+
+"""
+A flat weight file that is memory-mapped at startup instead of being unpickled.
+
+    magic:8  header_size:u32le  header:json  padding  ( array  padding )*
+
+Every array starts at a 64-byte aligned offset, so it's used in place through the mmap,
+processes on the same host share its pages through the page cache. The files are
+converted once from `model/cnn.*.pt` and cached next to it, e.g.
+
+    model/cnn.20210311.1.torch.bin      state_dict of CaptchaCNN, for the torch backend
+    model/cnn.20210311.1.numpy.bin      inference-ready weights of the numpy backend
+
+They are converted again as soon as the model file is newer. Convert them in advance by
+
+    $ python3 -m autoelective.captcha.weights [-m MODEL]
+"""
+
+import os
+import mmap
+import struct
+from collections import OrderedDict
+from optparse import OptionParser
+import numpy as np
+from requests.compat import json
+
+MAGIC = b"AEWEIGHT"
+VERSION = 1
+ALIGNMENT = 64
+
+_HEADER_SIZE = struct.Struct('<I')
+
+
+def _align(n):
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def get_flat_file(model_file, tag):
+    return "%s.%s.bin" % (os.path.splitext(model_file)[0], tag)
+
+def is_fresh(flat_file, model_file):
+    return os.path.exists(flat_file) and os.path.getmtime(flat_file) >= os.path.getmtime(model_file)
+
+
+def save_flat(arrays, file):
+    """
+    arrays: { name: ndarray }, it's written to a temp file first and then renamed, so that
+    processes starting at the same time never map a partially written file
+    """
+    arrays = OrderedDict( (k, np.ascontiguousarray(v)) for k, v in arrays.items() )
+
+    entries = []
+    offset = 0
+    for name, arr in arrays.items():
+        entries.append({
+            "name": name,
+            "dtype": arr.dtype.newbyteorder('<').str,
+            "shape": list(arr.shape),
+            "offset": offset,   # relative to the data section
+            "nbytes": arr.nbytes,
+        })
+        offset = _align(offset + arr.nbytes)
+
+    header = json.dumps({ "version": VERSION, "arrays": entries }).encode('utf-8')
+    data_start = _align(len(MAGIC) + _HEADER_SIZE.size + len(header))
+
+    tmp_file = "%s.%d.tmp" % (file, os.getpid())
+    try:
+        with open(tmp_file, 'wb') as fp:
+            fp.write(MAGIC)
+            fp.write(_HEADER_SIZE.pack(len(header)))
+            fp.write(header)
+            for entry, arr in zip(entries, arrays.values()):
+                fp.seek(data_start + entry["offset"])
+                fp.write(arr.astype(entry["dtype"], copy=False).tobytes())
+            fp.truncate(data_start + offset)
+        os.replace(tmp_file, file)
+    finally:
+        if os.path.exists(tmp_file):
+            os.unlink(tmp_file)
+
+
+def load_flat(file, writable=False):
+    """
+    Map the file and return { name: ndarray } backed by the mapping. With `writable`, the
+    mapping is copy-on-write, pages are still shared until they are written in place.
+    """
+    with open(file, 'rb') as fp:
+        if fp.read(len(MAGIC)) != MAGIC:
+            raise ValueError("%s is not a flat weight file" % file)
+        size, = _HEADER_SIZE.unpack(fp.read(_HEADER_SIZE.size))
+        header = json.loads(fp.read(size).decode('utf-8'))
+        if header["version"] != VERSION:
+            raise ValueError("unsupported flat weight file version %r" % header["version"])
+        data_start = _align(len(MAGIC) + _HEADER_SIZE.size + size)
+        buf = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_COPY if writable else mmap.ACCESS_READ)
+
+    arrays = OrderedDict()
+    for entry in header["arrays"]:
+        dtype = np.dtype(entry["dtype"])
+        shape = tuple(entry["shape"])
+        count = entry["nbytes"] // dtype.itemsize
+        arr = np.frombuffer(buf, dtype=dtype, count=count, offset=data_start + entry["offset"])
+        arrays[entry["name"]] = arr.reshape(shape)
+    return arrays
+
+
+def load_cached(model_file, tag, convert, writable=False, flat_file=None):
+    """
+    Map the flat file of `model_file`, create it by `convert(model_file)` first if it's
+    missing or older than the model
+    """
+    if flat_file is None:
+        flat_file = get_flat_file(model_file, tag)
+
+    if is_fresh(flat_file, model_file):
+        return load_flat(flat_file, writable)
+
+    arrays = convert(model_file)
+    try:
+        save_flat(arrays, flat_file)
+    except OSError:
+        return arrays  # read-only model folder, convert it again next time
+    return load_flat(flat_file, writable)
+
+
+def load_state_dict(model_file, writable=False):
+    """ state_dict of CaptchaCNN as numpy arrays, without importing torch """
+    from .npcnn import load_torch_state_dict
+    return load_cached(model_file, "torch", load_torch_state_dict, writable)
+
+
+def main():
+    from ..const import CNN_MODEL_FILE
+    from .npcnn import load_weights
+
+    parser = OptionParser(description='Convert CaptchaCNN into memory-mapped flat weight files')
+    parser.add_option('-m', '--model', dest='model_file', default=CNN_MODEL_FILE, metavar="FILE")
+    options, args = parser.parse_args()
+
+    for tag, load in [ ("torch", load_state_dict), ("numpy", load_weights) ]:
+        flat_file = get_flat_file(options.model_file, tag)
+        if os.path.exists(flat_file):
+            os.unlink(flat_file)
+        load(options.model_file)
+        print("Convert %s to %s" % (options.model_file, flat_file))
+
+if __name__ == '__main__':
+    main()
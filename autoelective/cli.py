@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 # filename: cli.py
-# modified: 2020-02-20
+# modified: 2026-10-18
 
 from optparse import OptionParser
 from threading import Thread
@@ -26,6 +26,16 @@ def create_default_parser():
         help='custom config file encoded with utf8',
     )
 
+    parser.add_option(
+        '-e',
+        '--engine',
+        dest='engine',
+        type='choice',
+        choices=['thread', 'asyncio'],
+        default='thread',
+        help='engine of the elective loop, "thread" (default) or "asyncio"',
+    )
+
     ## boolean (flag) options
 
     parser.add_option(
@@ -44,23 +54,37 @@ def setup_default_environ(options, args, environ):
 
     environ.config_ini = options.config_ini
     environ.with_monitor = options.with_monitor
+    environ.engine = options.engine
 
 
 def create_default_threads(options, args, environ):
 
     # import here to ensure the singleton `config` will be init later than parse_args()
-    from autoelective.loop import run_iaaa_loop, run_elective_loop
     from autoelective.monitor import run_monitor
 
     tList = []
 
-    t = Thread(target=run_iaaa_loop, name="IAAA")
-    environ.iaaa_loop_thread = t
-    tList.append(t)
+    if options.engine == 'asyncio':
+
+        from autoelective.aloop import run_async_loop
+
+        # logins are done by the same event loop
+        t = Thread(target=run_async_loop, name="Elective")
+        environ.iaaa_loop_thread = t
+        environ.elective_loop_thread = t
+        tList.append(t)
 
-    t = Thread(target=run_elective_loop, name="Elective")
-    environ.elective_loop_thread = t
-    tList.append(t)
+    else:
+
+        from autoelective.loop import run_iaaa_loop, run_elective_loop
+
+        t = Thread(target=run_iaaa_loop, name="IAAA")
+        environ.iaaa_loop_thread = t
+        tList.append(t)
+
+        t = Thread(target=run_elective_loop, name="Elective")
+        environ.elective_loop_thread = t
+        tList.append(t)
 
     if options.with_monitor:
         t = Thread(target=run_monitor, name="Monitor")
@@ -1,16 +1,22 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 # filename: client.py
-# modified: 2019-09-09
+# modified: 2026-10-18
 
-from requests.models import Request
-from requests.sessions import Session
+from urllib.parse import urlencode, urlsplit
+from requests.models import Request, PreparedRequest
+from requests.sessions import Session, merge_setting, merge_hooks
+from requests.structures import CaseInsensitiveDict
 from requests.cookies import extract_cookies_to_jar
+from requests.utils import get_netrc_auth
+from .adapter import InstrumentedHTTPAdapter
+from .histogram import HTTPStats
 
 class BaseClient(object):
 
     default_headers = {}
     default_client_timeout = 10
+    enable_templates = True
 
     def __init__(self, *args, **kwargs):
         if self.__class__ is __class__:
@@ -18,43 +24,132 @@ class BaseClient(object):
         self._timeout = kwargs.get("timeout", self.__class__.default_client_timeout)
         self._session = Session()
         self._session.headers.update(self.__class__.default_headers)
+        self._templates = {}    # { (template, headers): (url, PreparedRequest) }
+        self._settings = {}     # { (scheme, netloc): send kwargs from the environment }
+        self._html_encodings = {} # { endpoint: encoding }
+        self._http_stats = kwargs.get("http_stats")
+        if self._http_stats is None:
+            self._http_stats = HTTPStats()
+        resolver = kwargs.get("resolver")  # Resolver shared by the clients, or None
+        for prefix in ("https://", "http://"):
+            self._session.mount(prefix, InstrumentedHTTPAdapter(self._http_stats, resolver=resolver))
+        self._adaptive_timeout = kwargs.get("adaptive_timeout")  # AdaptiveTimeout or None
 
     @property
     def user_agent(self):
         return self._session.headers.get('User-Agent')
 
-    def _request(self, method, url,
-            params=None, data=None, headers=None, cookies=None, files=None,
-            auth=None, timeout=None, allow_redirects=True, proxies=None,
-            hooks=None, stream=None, verify=None, cert=None, json=None):
+    @property
+    def connections(self):
+        """ connections opened by the session so far, each of them is a TCP (and TLS) handshake """
+        n = 0
+        for adapter in self._session.adapters.values():
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    n += pool.num_connections
+        return n
 
-        # Extended from requests/sessions.py  for '_client' kwargs
+    @property
+    def http_stats(self):
+        """ HTTPStats of the requests sent by the session, see `adapter.py` """
+        return self._http_stats
 
-        req = Request(
+    def _get_settings(self, url):
+        """
+        merge_environment_settings() reads the proxy variables and .netrc of the environment
+        on every call, they are resolved only once per host in a client's life
+        """
+        key = urlsplit(url)[:2]
+        settings = self._settings.get(key)
+        if settings is None:
+            settings = self._session.merge_environment_settings(url, {}, None, None, None)
+            self._settings[key] = settings
+        return settings
+
+    def _get_timeout(self, url):
+        if self._adaptive_timeout is None:
+            return self._timeout
+        return self._adaptive_timeout.get(self._http_stats, url, self._timeout)
+
+    def _prepare_template(self, method, url, headers, hooks):
+        """ the same as Session.prepare_request(), without params, body and cookies """
+        session = self._session
+        auth = session.auth
+        if session.trust_env and not auth:
+            auth = get_netrc_auth(url)
+        prep = PreparedRequest()
+        prep.prepare(
             method=method.upper(),
             url=url,
-            headers=headers,
-            files=files,
-            data=data or {},
-            json=json,
-            params=params or {},
+            headers=merge_setting(headers, session.headers, dict_class=CaseInsensitiveDict),
             auth=auth,
-            cookies=cookies,
-            hooks=hooks,
+            hooks=merge_hooks(hooks, session.hooks),
         )
-        prep = self._session.prepare_request(req)
-        prep._client = self  # hold the reference to client
+        return prep
 
+    def _prepare_from_template(self, template, method, url, params, data, headers, hooks):
+        """
+        Copy the prepared request of the template and patch only the parts that change
+        between calls, i.e. the query string, the form body and the session cookies.
+        A template name stands for one endpoint, so the method and the hooks are fixed.
+        """
+        key = (template, tuple(headers.items()) if headers else ())
+        entry = self._templates.get(key)
+        if entry is None:
+            entry = (url, self._prepare_template(method, url, headers, hooks))
+            self._templates[key] = entry
+        base_url, base = entry
+
+        prep = base.copy()
+        if url != base_url:
+            prep.prepare_url(url, params)
+        elif params:
+            prep.url = "%s?%s" % (base_url, urlencode(params, doseq=True))
+        if data:
+            prep.prepare_body(data, None)
+        prep.prepare_cookies(self._session.cookies)
+        return prep
 
-        proxies = proxies or {}
+    def _request(self, method, url,
+            params=None, data=None, headers=None, cookies=None, files=None,
+            auth=None, timeout=None, allow_redirects=True, proxies=None,
+            hooks=None, stream=None, verify=None, cert=None, json=None,
+            template=None):
 
-        settings = self._session.merge_environment_settings(
-            prep.url, proxies, stream, verify, cert
-        )
+        # Extended from requests/sessions.py  for '_client' kwargs
+
+        if ( template is not None and self.__class__.enable_templates
+                and cookies is None and files is None and auth is None and json is None ):
+            prep = self._prepare_from_template(template, method, url, params, data, headers, hooks)
+        else:
+            req = Request(
+                method=method.upper(),
+                url=url,
+                headers=headers,
+                files=files,
+                data=data or {},
+                json=json,
+                params=params or {},
+                auth=auth,
+                cookies=cookies,
+                hooks=hooks,
+            )
+            prep = self._session.prepare_request(req)
+
+        prep._client = self  # hold the reference to client
+
+        if proxies or stream is not None or verify is not None or cert is not None:
+            settings = self._session.merge_environment_settings(
+                prep.url, proxies or {}, stream, verify, cert
+            )
+        else:
+            settings = self._get_settings(prep.url)
 
         # Send the request.
         send_kwargs = {
-            'timeout': timeout or self._timeout, # set default timeout
+            'timeout': timeout or self._get_timeout(prep.url), # set default timeout
             'allow_redirects': allow_redirects,
         }
         send_kwargs.update(settings)
@@ -68,8 +163,28 @@ class BaseClient(object):
     def _post(self, url, data=None, json=None, **kwargs):
         return self._request('POST', url, data=data, json=json, **kwargs)
 
+    def warm(self, url, max_idle):
+        """
+        Check the kept-alive connections to the host of url before they are used, reopen
+        them if they are dropped or have been idle for max_idle s, see `adapter.py`
+        -> (opened, closed) connections
+        """
+        prep = PreparedRequest()
+        prep.prepare(method="GET", url=url)
+        settings = self._get_settings(url)
+        return self._session.get_adapter(url).warm(prep, max_idle, settings["verify"],
+                                                   settings["proxies"], settings["cert"])
+
+    def get_html_encoding(self, endpoint):
+        """ -> encoding detected from a known page of the endpoint, None if there is none yet """
+        return self._html_encodings.get(endpoint)
+
+    def set_html_encoding(self, endpoint, encoding):
+        self._html_encodings[endpoint] = encoding
+
     def set_user_agent(self, user_agent):
         self._session.headers["User-Agent"] = user_agent
+        self._templates.clear()  # session headers are merged into the templates
 
     def persist_cookies(self, r):
         """
@@ -1,10 +1,11 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 # filename: config.py
-# modified: 2019-09-10
+# modified: 2026-10-18
 
 import os
 import re
+from ipaddress import ip_address
 from configparser import RawConfigParser, DuplicateSectionError
 from collections import OrderedDict
 from .environ import Environ
@@ -31,17 +32,17 @@ class BaseConfig(object):
         self._config = RawConfigParser()
         self._config.read(file, encoding="utf-8-sig")
 
-    def get(self, section, key):
-        return self._config.get(section, key)
+    def get(self, section, key, *args, **kwargs):
+        return self._config.get(section, key, *args, **kwargs)
 
-    def getint(self, section, key):
-        return self._config.getint(section, key)
+    def getint(self, section, key, *args, **kwargs):
+        return self._config.getint(section, key, *args, **kwargs)
 
-    def getfloat(self, section, key):
-        return self._config.getfloat(section, key)
+    def getfloat(self, section, key, *args, **kwargs):
+        return self._config.getfloat(section, key, *args, **kwargs)
 
-    def getboolean(self, section, key):
-        return self._config.getboolean(section, key)
+    def getboolean(self, section, key, *args, **kwargs):
+        return self._config.getboolean(section, key, *args, **kwargs)
 
     def getdict(self, section, options):
         assert isinstance(options, (list, tuple, set))
@@ -117,6 +118,10 @@ class AutoElectiveConfig(BaseConfig, metaclass=Singleton):
     def iaaa_client_timeout(self):
         return self.getfloat("client", "iaaa_client_timeout")
 
+    @property
+    def iaaa_client_reuse(self):
+        return self.getboolean("client", "iaaa_client_reuse", fallback=True)
+
     @property
     def elective_client_timeout(self):
         return self.getfloat("client", "elective_client_timeout")
@@ -129,6 +134,67 @@ class AutoElectiveConfig(BaseConfig, metaclass=Singleton):
     def elective_client_max_life(self):
         return self.getint("client", "elective_client_max_life")
 
+    @property
+    def adaptive_timeout(self):
+        return self.getboolean("client", "adaptive_timeout", fallback=False)
+
+    @property
+    def adaptive_timeout_percentile(self):
+        return self.getfloat("client", "adaptive_timeout_percentile", fallback=99.0)
+
+    @property
+    def adaptive_timeout_factor(self):
+        return self.getfloat("client", "adaptive_timeout_factor", fallback=2.0)
+
+    @property
+    def adaptive_timeout_min(self):
+        return self.getfloat("client", "adaptive_timeout_min", fallback=1.0)
+
+    @property
+    def dns_cache_ttl(self):
+        return self.getfloat("client", "dns_cache_ttl", fallback=60.0)
+
+    @property
+    def dns_pins(self):
+        """ { host: [ip] } from 'host=ip, host=ip, ...' """
+        pins = OrderedDict()
+        v = self.get("client", "dns_pins", fallback="").strip()
+        if v == "":
+            return pins
+        for item in _reCommaSep.split(v):
+            host, _, ip = item.partition("=")
+            host, ip = host.strip().lower(), ip.strip()
+            try:
+                ip_address(ip)
+            except ValueError:
+                raise UserInputException("Invalid dns pin %r in [client], it should be like 'host=ip'" % item)
+            pins.setdefault(host, []).append(ip)
+        return pins
+
+    @property
+    def happy_eyeballs_delay(self):
+        return self.getfloat("client", "happy_eyeballs_delay", fallback=0.25)
+
+    @property
+    def connection_warmup(self):
+        return self.getboolean("client", "connection_warmup", fallback=True)
+
+    @property
+    def connection_max_idle(self):
+        return self.getfloat("client", "connection_max_idle", fallback=15.0)
+
+    @property
+    def refresh_hedge(self):
+        return self.getboolean("client", "refresh_hedge", fallback=False)
+
+    @property
+    def refresh_hedge_percentile(self):
+        return self.getfloat("client", "refresh_hedge_percentile", fallback=90.0)
+
+    @property
+    def refresh_hedge_budget(self):
+        return self.getint("client", "refresh_hedge_budget", fallback=10)
+
     @property
     def login_loop_interval(self):
         return self.getfloat("client", "login_loop_interval")
@@ -145,6 +211,60 @@ class AutoElectiveConfig(BaseConfig, metaclass=Singleton):
     def is_debug_dump_request(self):
         return self.getboolean("client", "debug_dump_request")
 
+    # [captcha]
+
+    @property
+    def captcha_model(self):
+        return self.get("captcha", "model", fallback="").strip()
+
+    @property
+    def captcha_backend(self):
+        return self.get("captcha", "backend", fallback="torch").lower()
+
+    @property
+    def captcha_optimize(self):
+        return self.getboolean("captcha", "optimize", fallback=True)
+
+    @property
+    def captcha_num_threads(self):
+        return self.getint("captcha", "num_threads", fallback=0)
+
+    @property
+    def captcha_confidence_threshold(self):
+        return self.getfloat("captcha", "confidence_threshold", fallback=0.0)
+
+    @property
+    def captcha_max_low_confidence_skips(self):
+        return self.getint("captcha", "max_low_confidence_skips", fallback=3)
+
+    @property
+    def captcha_nbest_retries(self):
+        return self.getint("captcha", "nbest_retries", fallback=0)
+
+    @property
+    def captcha_prefetch(self):
+        return self.getboolean("captcha", "prefetch", fallback=False)
+
+    @property
+    def captcha_prefetch_max_age(self):
+        return self.getfloat("captcha", "prefetch_max_age", fallback=30.0)
+
+    @property
+    def captcha_server_socket(self):
+        return self.get("captcha", "server_socket", fallback="").strip()
+
+    @property
+    def captcha_archive_max_size(self):
+        return self.getint("captcha", "archive_max_size", fallback=64)
+
+    @property
+    def captcha_archive_passed(self):
+        return self.getboolean("captcha", "archive_passed", fallback=True)
+
+    @property
+    def captcha_reload_interval(self):
+        return self.getfloat("captcha", "reload_interval", fallback=0.0)
+
     # [monitor]
 
     @property
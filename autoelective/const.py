@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 # filename: const.py
-# modified: 2019-09-11
+# modified: 2026-10-18
 
 import os
 from ._internal import mkdir, absp, read_list
@@ -13,10 +13,12 @@ ERROR_LOG_DIR           = absp("../log/error")
 REQUEST_LOG_DIR         = absp("../log/request/")
 WEB_LOG_DIR             = absp("../log/web/")
 
+MODEL_DIR               = absp("../model/")
 CNN_MODEL_FILE          = absp("../model/cnn.20210311.1.pt")
 USER_AGENTS_TXT_GZ      = absp("../user_agents.txt.gz")
 USER_AGENTS_USER_TXT    = absp("../user_agents.user.txt")
 DEFAULT_CONFIG_INI      = absp("../config.ini")
+TEST_DATA_DIR           = absp("../test/data/")
 
 mkdir(CACHE_DIR)
 mkdir(CAPTCHA_CACHE_DIR)
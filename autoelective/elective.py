@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 # filename: elective.py
-# modified: 2019-09-10
+# modified: 2026-10-18
 
 import time
 import string
@@ -154,6 +154,7 @@ class ElectiveClient(BaseClient):
                 },
             headers=headers,
             hooks=_hooks_check_title,
+            template="SupplyCancel",
             **kwargs,
         )
         return r
@@ -172,6 +173,7 @@ class ElectiveClient(BaseClient):
             },
             headers=headers,
             hooks=_hooks_check_title,
+            template="supplement",
             **kwargs,
         )
         return r
@@ -186,6 +188,7 @@ class ElectiveClient(BaseClient):
             },
             headers=headers,
             hooks=_hooks_check_status_code,
+            template="DrawServlet",
             **kwargs,
         )
         return r
@@ -205,6 +208,7 @@ class ElectiveClient(BaseClient):
             },
             headers=headers,
             hooks=_hooks_check_status_code,
+            template="Validate",
             **kwargs,
         )
         return r
@@ -224,6 +228,7 @@ class ElectiveClient(BaseClient):
             url="%s://%s%s" % (ElectiveURL.Scheme, ElectiveURL.Host, href),
             headers=headers,
             hooks=_hooks_check_tips,
+            template="ElectSupplement",
             **kwargs,
         )
         return r
@@ -1,10 +1,11 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 # filename: environ.py
-# modified: 2020-02-16
+# modified: 2026-10-18
 
 from .utils import Singleton
-from collections import defaultdict
+from .histogram import HTTPStats, LatencyHistogram
+from collections import defaultdict, deque
 import numpy as np
 
 class Environ(object, metaclass=Singleton):
@@ -12,9 +13,19 @@ class Environ(object, metaclass=Singleton):
     def __init__(self):
         self.config_ini = None
         self.with_monitor = None
+        self.engine = None
         self.iaaa_loop = 0
         self.elective_loop = 0
         self.errors = defaultdict(lambda: 0)
+        self.captcha_results = defaultdict(lambda: defaultdict(lambda: 0)) # {confidence bucket: {result: count}}
+        self.captcha_counters = defaultdict(lambda: 0) # fetches, recognitions, validations, nbest_passed, elections, prefetch_*
+        self.login_counters = defaultdict(lambda: 0) # logins, iaaa_handshakes, elective_handshakes
+        self.login_times = deque(maxlen=100) # [(time to IAAA token, time to login)] of the latest logins, in s
+        self.http_stats = defaultdict(HTTPStats) # {client name: HTTPStats}, see adapter.py
+        self.hedge_counters = defaultdict(lambda: 0) # see hedge.py
+        self.warm_counters = defaultdict(lambda: 0) # see warmer.py
+        self.dns_counters = defaultdict(lambda: 0) # see resolver.py
+        self.hedge_saved = LatencyHistogram() # how much earlier the winning hedges returned
         self.iaaa_loop_thread = None
         self.elective_loop_thread = None
         self.monitor_thread = None
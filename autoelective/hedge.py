@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: hedge.py
+# modified: 2026-10-18
+
+"""
+Hedged refresh of the supplement page across the pooled ElectiveClients.
+
+An opened slot is detected only when a refresh returns, so a refresh stuck in the tail of
+the latency distribution delays everything after it. With hedging, if the refresh on one
+client hasn't returned within a percentile of its observed latency, the same page is
+requested on another idle logged-in client. The first parsed page wins and the round goes
+on with its client, the other request is left to finish in the background. The race is run
+by the elective loops (`loop.py` / `aloop.py`), this module decides when to hedge and keeps
+the statistics in `environ.hedge_counters` and `environ.hedge_saved`:
+
+    refreshes           refreshes made while hedging is enabled
+    delayed             refreshes which didn't return within the percentile
+    hedges              hedged requests sent
+    hedge_wins          hedged requests which returned a page first
+    primary_wins        hedged refreshes won by the original request anyway
+    failed              hedged refreshes whose requests both failed
+    budget_exhausted    delayed refreshes not hedged for the per-minute budget
+    no_idle_client      delayed refreshes not hedged for lack of an idle client
+    loser_errors        requests which lost the race and then failed
+
+`hedge_saved` records how much earlier a winning hedge returned than the original request,
+when the latter returns at all.
+"""
+
+import time
+import threading
+from collections import deque
+from .environ import Environ
+
+environ = Environ()
+
+
+class RefreshHedger(object):
+
+    MIN_SAMPLES = 20
+
+    def __init__(self, endpoint, percentile=90, budget=10):
+        """
+        endpoint        of the refreshed page in HTTPStats
+        percentile      of the refresh latency of a client to wait for before hedging
+        budget          max hedges per minute
+        """
+        self._endpoint = endpoint
+        self._percentile = percentile
+        self._budget = budget
+        self._times = deque() # time of the hedges within the latest minute
+        self._lock = threading.Lock()
+
+    def get_delay(self, elective):
+        """
+        -> seconds to wait for the refresh on this client before hedging it,
+           None if there are too few samples to tell
+        """
+        stats = elective.http_stats.get(self._endpoint)
+        if stats is None:
+            return None
+        h = stats.histograms["total"]
+        if h.count < self.__class__.MIN_SAMPLES:
+            return None
+        return h.percentile(self._percentile)
+
+    def acquire(self):
+        """
+        -> True if a hedge can be sent within the budget
+        """
+        now = time.time()
+        with self._lock:
+            while len(self._times) > 0 and now - self._times[0] > 60:
+                self._times.popleft()
+            if len(self._times) >= self._budget:
+                environ.hedge_counters["budget_exhausted"] += 1
+                return False
+            self._times.append(now)
+        environ.hedge_counters["hedges"] += 1
+        return True
+
+    def record_result(self, hedge_won):
+        if hedge_won:
+            environ.hedge_counters["hedge_wins"] += 1
+        else:
+            environ.hedge_counters["primary_wins"] += 1
+
+    def record_saved(self, saved):
+        """ saved: how much earlier the winning hedge returned, in s """
+        environ.hedge_saved.add(saved)
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: histogram.py
+# modified: 2026-10-18
+
+"""
+Fixed-size latency histograms of the HTTP requests, recorded per client and per endpoint
+by the adapter of `adapter.py`.
+
+A histogram counts durations in log-spaced buckets, 8 per power of 2 from 10 us to about
+168 s, so a percentile read from it is within 9% of the true value. All histograms share
+the same buckets, so the histograms of several clients are merged by adding their counts.
+"""
+
+import math
+from urllib.parse import urlsplit
+
+_MIN_LATENCY = 1e-5
+_BUCKETS_PER_OCTAVE = 8
+_N_BUCKETS = _BUCKETS_PER_OCTAVE * 24
+
+
+def get_endpoint(url):
+    """ -> the last segment of the URL path, as the key of an endpoint in HTTPStats """
+    return urlsplit(url).path.rsplit('/', 1)[-1] or '/'
+
+
+class LatencyHistogram(object):
+
+    __slots__ = ("_counts", "_count", "_sum", "_max")
+
+    def __init__(self):
+        self._counts = [0] * _N_BUCKETS
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def mean(self):
+        if self._count == 0:
+            return float('nan')
+        return self._sum / self._count
+
+    @property
+    def max(self):
+        return self._max
+
+    @staticmethod
+    def _get_bucket(value):
+        if value <= _MIN_LATENCY:
+            return 0
+        return min(int(math.log2(value / _MIN_LATENCY) * _BUCKETS_PER_OCTAVE), _N_BUCKETS - 1)
+
+    @staticmethod
+    def _get_upper_bound(bucket):
+        return _MIN_LATENCY * 2 ** ((bucket + 1) / _BUCKETS_PER_OCTAVE)
+
+    def add(self, value):
+        """ value: duration in s """
+        self._counts[self._get_bucket(value)] += 1
+        self._count += 1
+        self._sum += value
+        if value > self._max:
+            self._max = value
+
+    def merge(self, other):
+        counts = self._counts
+        for ix, n in enumerate(other._counts):
+            if n > 0:
+                counts[ix] += n
+        self._count += other._count
+        self._sum += other._sum
+        self._max = max(self._max, other._max)
+        return self
+
+    def percentile(self, q):
+        """
+        q: in [0, 100], -> upper bound of the bucket where the q-th percentile falls, in s
+        """
+        if self._count == 0:
+            return float('nan')
+        rank = max(1, math.ceil(self._count * q / 100))
+        n = 0
+        for ix, c in enumerate(self._counts):
+            n += c
+            if n >= rank:
+                return min(self._get_upper_bound(ix), self._max)
+        return self._max
+
+    def summary(self):
+        """ -> { count, mean_ms, p50_ms, p90_ms, p99_ms, max_ms } """
+        if self._count == 0:
+            return { "count": 0 }
+        return {
+            "count": self._count,
+            "mean_ms": round(self.mean * 1000, 3),
+            "p50_ms": round(self.percentile(50) * 1000, 3),
+            "p90_ms": round(self.percentile(90) * 1000, 3),
+            "p99_ms": round(self.percentile(99) * 1000, 3),
+            "max_ms": round(self._max * 1000, 3),
+        }
+
+
+class EndpointStats(object):
+
+    PHASES = ("dns", "connect", "tls", "ttfb", "body", "total")
+    COUNTERS = ("requests", "errors", "timeouts", "new_connections", "reused_connections", "bytes_received")
+
+    def __init__(self):
+        self.histograms = { phase: LatencyHistogram() for phase in self.__class__.PHASES }
+        self.counters = dict.fromkeys(self.__class__.COUNTERS, 0)
+        self.timeout = None  # (connect, read) of the latest request
+
+    def merge(self, other):
+        for phase, h in other.histograms.items():
+            self.histograms[phase].merge(h)
+        for key, n in other.counters.items():
+            self.counters[key] += n
+        if self.timeout is None:
+            self.timeout = other.timeout
+        elif other.timeout is not None: # the longer ones of the merged clients
+            self.timeout = tuple( max(t1, t2) for t1, t2 in zip(self.timeout, other.timeout) )
+        return self
+
+    def summary(self):
+        d = dict(self.counters)
+        if self.timeout is not None:
+            d["timeout"] = { "connect": self.timeout[0], "read": self.timeout[1] }
+        d["latency"] = { phase: h.summary() for phase, h in self.histograms.items() if h.count > 0 }
+        return d
+
+
+class HTTPStats(object):
+    """
+    { endpoint: EndpointStats } of a client, an endpoint is the last segment of the URL path,
+    e.g. `supplement.jsp`, `DrawServlet`, `validate.do`
+    """
+
+    def __init__(self):
+        self._endpoints = {}
+        self._handshakes = LatencyHistogram()  # TCP + TLS handshakes of all endpoints
+
+    @property
+    def handshakes(self):
+        return self._handshakes
+
+    def get(self, endpoint):
+        """ -> EndpointStats or None """
+        return self._endpoints.get(endpoint)
+
+    def _get_or_create(self, endpoint):
+        stats = self._endpoints.get(endpoint)
+        if stats is None:
+            stats = self._endpoints.setdefault(endpoint, EndpointStats())
+        return stats
+
+    def add(self, endpoint, connect, ttfb, body, total, nbytes):
+        """
+        connect: (dns, connect, tls) in s if a new connection is opened for the request, else None
+        ttfb: from the request sent to the response headers received, excluding `connect`
+        body: time to read the response body
+        """
+        stats = self._get_or_create(endpoint)
+        histograms = stats.histograms
+        counters = stats.counters
+
+        if connect is None:
+            counters["reused_connections"] += 1
+        else:
+            counters["new_connections"] += 1
+            t_dns, t_connect, t_tls = connect
+            histograms["dns"].add(t_dns)
+            histograms["connect"].add(t_connect)
+            if t_tls > 0:
+                histograms["tls"].add(t_tls)
+            self._handshakes.add(t_connect + t_tls)
+
+        histograms["ttfb"].add(ttfb)
+        histograms["body"].add(body)
+        histograms["total"].add(total)
+        counters["requests"] += 1
+        counters["bytes_received"] += nbytes
+
+    def add_error(self, endpoint):
+        self._get_or_create(endpoint).counters["errors"] += 1
+
+    def add_timeout(self, endpoint, is_connect, elapsed):
+        """
+        A timed-out request counts as an error, and its elapsed time is recorded as a sample
+        of the phase which timed out, it's a lower bound of the actual latency
+        """
+        stats = self._get_or_create(endpoint)
+        stats.counters["errors"] += 1
+        stats.counters["timeouts"] += 1
+        if is_connect:
+            stats.histograms["connect"].add(elapsed)
+            self._handshakes.add(elapsed)
+        else:
+            stats.histograms["ttfb"].add(elapsed)
+
+    def set_timeout(self, endpoint, timeout):
+        """ timeout: (connect, read) or a float for both """
+        if not isinstance(timeout, tuple):
+            timeout = (timeout, timeout)
+        self._get_or_create(endpoint).timeout = timeout
+
+    def merge(self, other):
+        for endpoint, stats in list(other._endpoints.items()):
+            self._get_or_create(endpoint).merge(stats)
+        self._handshakes.merge(other._handshakes)
+        return self
+
+    def summary(self):
+        return { endpoint: stats.summary() for endpoint, stats in sorted(list(self._endpoints.items())) }
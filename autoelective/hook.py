@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 # filename: hook.py
-# modified: 2019-09-11
+# modified: 2026-10-18
 
 import os
 import re
@@ -9,7 +9,7 @@ import time
 from urllib.parse import quote, urlparse
 from .logger import ConsoleLogger
 from .config import AutoElectiveConfig
-from .parser import get_tree_from_response, get_title, get_errInfo, get_tips
+from .parser import get_tree_from_response, remember_response_encoding, get_title, get_errInfo, get_tips
 from .utils import pickle_gzip_dump
 from .const import REQUEST_LOG_DIR
 from .exceptions import *
@@ -126,6 +126,8 @@ def check_elective_title(r, **kwargs):
             r.request._client.persist_cookies(r)
         raise e
 
+    remember_response_encoding(r)  # a known elective page
+
 
 def check_elective_tips(r, **kwargs):
     assert hasattr(r, "_tree")
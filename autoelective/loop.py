@@ -1,12 +1,13 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 # filename: loop.py
-# modified: 2019-09-11
+# modified: 2026-10-18
 
 import os
 import time
 import random
-from queue import Queue
+from queue import Queue, Empty
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from collections import deque
 from itertools import combinations
 from requests.compat import json
@@ -18,11 +19,19 @@ from .config import AutoElectiveConfig
 from .logger import ConsoleLogger, FileLogger
 from .course import Course
 from .captcha import CaptchaRecognizer
+from .captcha.remote import RemoteCaptchaRecognizer
+from .captcha.archive import CaptchaArchive
+from .prefetch import CaptchaPrefetcher
 from .parser import get_tables, get_courses, get_courses_with_detail, get_sida
 from .hook import _dump_request
 from .iaaa import IAAAClient
 from .elective import ElectiveClient
-from .const import CAPTCHA_CACHE_DIR, USER_AGENT_LIST, WEB_LOG_DIR, CNN_MODEL_FILE
+from .timeout import AdaptiveTimeout
+from .hedge import RefreshHedger
+from .warmer import ConnectionWarmer
+from .resolver import Resolver
+from .histogram import get_endpoint
+from .const import ElectiveURL, CAPTCHA_CACHE_DIR, USER_AGENT_LIST, WEB_LOG_DIR, CNN_MODEL_FILE, MODEL_DIR
 from .exceptions import *
 from ._internal import mkdir
 
@@ -39,11 +48,37 @@ refresh_interval = config.refresh_interval
 refresh_random_deviation = config.refresh_random_deviation
 supply_cancel_page = config.supply_cancel_page
 iaaa_client_timeout = config.iaaa_client_timeout
+iaaa_client_reuse = config.iaaa_client_reuse
 elective_client_timeout = config.elective_client_timeout
 login_loop_interval = config.login_loop_interval
 elective_client_pool_size = config.elective_client_pool_size
 elective_client_max_life = config.elective_client_max_life
+adaptive_timeout = config.adaptive_timeout
+adaptive_timeout_percentile = config.adaptive_timeout_percentile
+adaptive_timeout_factor = config.adaptive_timeout_factor
+adaptive_timeout_min = config.adaptive_timeout_min
+dns_cache_ttl = config.dns_cache_ttl
+dns_pins = config.dns_pins
+happy_eyeballs_delay = config.happy_eyeballs_delay
+connection_warmup = config.connection_warmup
+connection_max_idle = config.connection_max_idle
+refresh_hedge = config.refresh_hedge
+refresh_hedge_percentile = config.refresh_hedge_percentile
+refresh_hedge_budget = config.refresh_hedge_budget
 is_print_mutex_rules = config.is_print_mutex_rules
+captcha_model = config.captcha_model
+captcha_backend = config.captcha_backend
+captcha_optimize = config.captcha_optimize
+captcha_num_threads = config.captcha_num_threads
+captcha_confidence_threshold = config.captcha_confidence_threshold
+captcha_max_low_confidence_skips = config.captcha_max_low_confidence_skips
+captcha_nbest_retries = config.captcha_nbest_retries
+captcha_prefetch = config.captcha_prefetch
+captcha_prefetch_max_age = config.captcha_prefetch_max_age
+captcha_server_socket = config.captcha_server_socket
+captcha_archive_max_size = config.captcha_archive_max_size
+captcha_archive_passed = config.captcha_archive_passed
+captcha_reload_interval = config.captcha_reload_interval
 
 config.check_identify(identity)
 config.check_supply_cancel_page(supply_cancel_page)
@@ -51,11 +86,47 @@ config.check_supply_cancel_page(supply_cancel_page)
 _USER_WEB_LOG_DIR = os.path.join(WEB_LOG_DIR, config.get_user_subpath())
 mkdir(_USER_WEB_LOG_DIR)
 
-recognizer = CaptchaRecognizer(CNN_MODEL_FILE)
+# each user has its own archive, since the elective loops of several users may run at the same time
+_USER_CAPTCHA_CACHE_DIR = os.path.join(CAPTCHA_CACHE_DIR, config.get_user_subpath())
+
+_model_file = os.path.join(MODEL_DIR, captcha_model) if captcha_model else CNN_MODEL_FILE
+
+def _create_recognizer():
+    return CaptchaRecognizer(_model_file, backend=captcha_backend, optimize=captcha_optimize,
+                             num_threads=captcha_num_threads)
+
+if captcha_server_socket:
+    recognizer = RemoteCaptchaRecognizer(captcha_server_socket, fallback=_create_recognizer,
+                                         timeout=elective_client_timeout)
+else:
+    recognizer = _create_recognizer()
+def _on_model_reloaded(error):
+    if error is None:
+        environ.captcha_counters["reloads"] += 1
+        cout.info("Captcha model %s is reloaded" % recognizer.model_file)
+    else:
+        ferr.error(error)
+        cout.warning("Unable to reload captcha model %s, keep the old one" % recognizer.model_file)
+
+if captcha_reload_interval > 0 and isinstance(recognizer, CaptchaRecognizer):
+    recognizer.watch(captcha_reload_interval, _on_model_reloaded)
+
+archive = CaptchaArchive(_USER_CAPTCHA_CACHE_DIR, max_size=captcha_archive_max_size * 1024 * 1024)
+prefetcher = CaptchaPrefetcher(recognizer, captcha_prefetch_max_age) if captcha_prefetch else None
 
 electivePool = Queue(maxsize=elective_client_pool_size)
 reloginPool = Queue(maxsize=elective_client_pool_size)
 
+resolver = Resolver(dns_cache_ttl, dns_pins, happy_eyeballs_delay)
+warmer = ConnectionWarmer(ElectiveURL.HomePage, connection_max_idle) if connection_warmup else None
+
+if refresh_hedge:
+    _refresh_url = ElectiveURL.SupplyCancel if supply_cancel_page == 1 else ElectiveURL.Supplement
+    hedger = RefreshHedger(get_endpoint(_refresh_url), refresh_hedge_percentile, refresh_hedge_budget)
+    _hedgeExecutor = ThreadPoolExecutor(max_workers=elective_client_pool_size, thread_name_prefix="hedge")
+else:
+    hedger = None
+
 goals = environ.goals  # let N = len(goals);
 ignored = environ.ignored
 mutexes = np.zeros(0, dtype=np.uint8) # uint8 [N][N];
@@ -63,6 +134,7 @@ delays = np.zeros(0, dtype=np.int) # int [N];
 
 killedElective = ElectiveClient(-1)
 NO_DELAY = -1
+CAPTCHA_CONFIDENCE_BUCKETS = (0.5, 0.8, 0.9, 0.95, 0.99)
 
 
 class _ElectiveNeedsLogin(Exception):
@@ -72,6 +144,45 @@ class _ElectiveExpired(Exception):
     pass
 
 
+def _create_adaptive_timeout():
+    if not adaptive_timeout:
+        return None
+    return AdaptiveTimeout(adaptive_timeout_percentile, adaptive_timeout_factor, adaptive_timeout_min)
+
+def _warm_clients(clients):
+    """ open the connections of the clients at startup, at the same time """
+    if warmer is None or len(clients) == 0:
+        return
+    with ThreadPoolExecutor(max_workers=len(clients), thread_name_prefix="warm") as executor:
+        list(executor.map(warmer.warm, clients))
+
+def _get_warm_delay(t):
+    """
+    -> seconds to sleep before warming a client to be used in t s, so that a reopened
+       connection is still fresh when it's used
+    """
+    return max(0.0, t - warmer.max_idle / 2)
+
+def _sleep_and_warm(t, elective):
+    """ sleep t s before a round with this client, and warm its connections meanwhile """
+    if warmer is None or elective is None or not elective.has_logined:
+        time.sleep(t)
+        return
+    t0 = time.time()
+    time.sleep(_get_warm_delay(t))
+    warmer.warm(elective, max(0.0, t - (time.time() - t0)))
+    time.sleep(max(0.0, t - (time.time() - t0)))
+
+def _take_next_client():
+    """
+    -> the client of the next round, taken out of the pool so that it isn't lent to a hedge
+       while it's warmed, None if the pool is empty
+    """
+    try:
+        return electivePool.get_nowait()
+    except Empty:
+        return None
+
 def _get_refresh_interval():
     if refresh_random_deviation <= 0:
         return refresh_interval
@@ -87,6 +198,30 @@ def _add_error(e):
     key = "[%s] %s" % (e.code, name) if hasattr(clz, "code") else name
     environ.errors[key] += 1
 
+def _parse_validation(r):
+    environ.captcha_counters["validations"] += 1
+    try:
+        return r.json()["valid"]  # 可能会返回一个错误网页
+    except Exception as e:
+        ferr.error(e)
+        raise OperationFailedError(msg="Unable to validate captcha")
+
+def _validate_code(elective, code):
+    r = elective.get_Validate(username, code)
+    return _parse_validation(r)
+
+def _add_captcha_result(captcha, result):
+    confidence = captcha.confidence
+    lower = 0.0
+    for upper in CAPTCHA_CONFIDENCE_BUCKETS:
+        if confidence < upper:
+            break
+        lower = upper
+    else:
+        upper = 1.0
+    key = "%.2f-%.2f" % (lower, upper)
+    environ.captcha_results[key][result] += 1
+
 def _format_timestamp(timestamp):
     if timestamp == -1:
         return str(timestamp)
@@ -98,128 +233,93 @@ def _dump_respose_content(content, filename):
         fp.write(content)
 
 
-def run_iaaa_loop():
-
-    elective = None
-
-    while True:
-
-        if elective is None:
-            elective = reloginPool.get()
-            if elective is killedElective:
-                cout.info("Quit IAAA loop")
-                return
-
-        environ.iaaa_loop += 1
-        user_agent = random.choice(USER_AGENT_LIST)
-
-        cout.info("Try to login IAAA (client: %s)" % elective.id)
-        cout.info("User-Agent: %s" % user_agent)
-
-        try:
-
-            iaaa = IAAAClient(timeout=iaaa_client_timeout) # not reusable
-            iaaa.set_user_agent(user_agent)
-
-            # request elective's home page to get cookies
-            r = iaaa.oauth_home()
-
-            r = iaaa.oauth_login(username, password)
-
-            try:
-                token = r.json()["token"]
-            except Exception as e:
-                ferr.error(e)
-                raise OperationFailedError(msg="Unable to parse IAAA token. response body: %s" % r.content)
-
-            elective.clear_cookies()
-            elective.set_user_agent(user_agent)
-
-            r = elective.sso_login(token)
-
-            if is_dual_degree:
-                sida = get_sida(r)
-                sttp = identity
-                referer = r.url
-                r = elective.sso_login_dual_degree(sida, sttp, referer)
-
-            if elective_client_max_life == -1:
-                elective.set_expired_time(-1)
-            else:
-                elective.set_expired_time(int(time.time()) + elective_client_max_life)
-
-            cout.info("Login success (client: %s, expired_time: %s)" % (
-                      elective.id, _format_timestamp(elective.expired_time)))
-            cout.info("")
-
-            electivePool.put_nowait(elective)
-            elective = None
-
-        except (ServerError, StatusCodeError) as e:
-            ferr.error(e)
-            cout.warning("ServerError/StatusCodeError encountered")
-            _add_error(e)
-
-        except OperationFailedError as e:
-            ferr.error(e)
-            cout.warning("OperationFailedError encountered")
-            _add_error(e)
-
-        except RequestException as e:
-            ferr.error(e)
-            cout.warning("RequestException encountered")
-            _add_error(e)
-
-        except IAAAIncorrectPasswordError as e:
-            cout.error(e)
-            _add_error(e)
-            raise e
-
-        except IAAAForbiddenError as e:
-            ferr.error(e)
-            _add_error(e)
-            raise e
-
-        except IAAAException as e:
-            ferr.error(e)
-            cout.warning("IAAAException encountered")
-            _add_error(e)
-
-        except CaughtCheatingError as e:
-            ferr.critical(e) # 严重错误
-            _add_error(e)
-            raise e
-
-        except ElectiveException as e:
-            ferr.error(e)
-            cout.warning("ElectiveException encountered")
-            _add_error(e)
-
-        except json.JSONDecodeError as e:
-            ferr.error(e)
-            cout.warning("JSONDecodeError encountered")
-            _add_error(e)
-
-        except KeyboardInterrupt as e:
-            raise e
 
-        except Exception as e:
-            ferr.exception(e)
-            _add_error(e)
-            raise e
+def _parse_token(r):
+    try:
+        return r.json()["token"]
+    except Exception as e:
+        ferr.error(e)
+        raise OperationFailedError(msg="Unable to parse IAAA token. response body: %s" % r.content)
 
-        finally:
-            t = login_loop_interval
-            cout.info("")
-            cout.info("IAAA login loop sleep %s s" % t)
-            cout.info("")
-            time.sleep(t)
+def _on_login_success(elective, t_token, t_login, iaaa_handshakes, elective_handshakes):
+    if elective_client_max_life == -1:
+        elective.set_expired_time(-1)
+    else:
+        elective.set_expired_time(int(time.time()) + elective_client_max_life)
 
+    environ.login_counters["logins"] += 1
+    environ.login_counters["iaaa_handshakes"] += iaaa_handshakes
+    environ.login_counters["elective_handshakes"] += elective_handshakes
+    environ.login_times.append((t_token, t_login))
 
-def run_elective_loop():
+    cout.info("Login success (client: %s, expired_time: %s)" % (
+              elective.id, _format_timestamp(elective.expired_time)))
+    cout.info("Time to token: %d ms, time to login: %d ms, handshakes: %d (IAAA) + %d (elective)" % (
+              t_token * 1000, t_login * 1000, iaaa_handshakes, elective_handshakes))
+    cout.info("")
 
-    elective = None
-    noWait = False
+def _handle_iaaa_error(e):
+    """
+    Count and log an error raised during login, the fatal ones are raised again
+    """
+    try:
+        raise e
+
+    except (ServerError, StatusCodeError) as e:
+        ferr.error(e)
+        cout.warning("ServerError/StatusCodeError encountered")
+        _add_error(e)
+
+    except OperationFailedError as e:
+        ferr.error(e)
+        cout.warning("OperationFailedError encountered")
+        _add_error(e)
+
+    except RequestException as e:
+        ferr.error(e)
+        cout.warning("RequestException encountered")
+        _add_error(e)
+
+    except IAAAIncorrectPasswordError as e:
+        cout.error(e)
+        _add_error(e)
+        raise e
+
+    except IAAAForbiddenError as e:
+        ferr.error(e)
+        _add_error(e)
+        raise e
+
+    except IAAAException as e:
+        ferr.error(e)
+        cout.warning("IAAAException encountered")
+        _add_error(e)
+
+    except CaughtCheatingError as e:
+        ferr.critical(e) # 严重错误
+        _add_error(e)
+        raise e
+
+    except ElectiveException as e:
+        ferr.error(e)
+        cout.warning("ElectiveException encountered")
+        _add_error(e)
+
+    except json.JSONDecodeError as e:
+        ferr.error(e)
+        cout.warning("JSONDecodeError encountered")
+        _add_error(e)
+
+    except Exception as e:
+        ferr.exception(e)
+        _add_error(e)
+        raise e
+
+
+def _load_rules():
+    """
+    Load courses, mutex rules and delay rules into `goals`, `mutexes` and `delays`
+    """
 
     ## load courses
 
@@ -259,14 +359,7 @@ def run_elective_loop():
         ix = cid_cix[cid]
         delays[ix] = d.threshold
 
-    ## setup elective pool
-
-    for ix in range(1, elective_client_pool_size + 1):
-        client = ElectiveClient(id=ix, timeout=elective_client_timeout)
-        client.set_user_agent(random.choice(USER_AGENT_LIST))
-        electivePool.put_nowait(client)
-
-    ## print header
+def _print_header():
 
     header = "# PKU Auto-Elective Tool v%s (%s) #" % (__version__, __date__)
     line = "#" + "-" * (len(header) - 2) + "#"
@@ -291,72 +384,619 @@ def run_elective_loop():
     cout.info("refresh_random_deviation: %s" % refresh_random_deviation)
     cout.info("supply_cancel_page: %s" % supply_cancel_page)
     cout.info("iaaa_client_timeout: %s" % iaaa_client_timeout)
+    cout.info("iaaa_client_reuse: %s" % iaaa_client_reuse)
     cout.info("elective_client_timeout: %s" % elective_client_timeout)
     cout.info("login_loop_interval: %s" % login_loop_interval)
     cout.info("elective_client_pool_size: %s" % elective_client_pool_size)
     cout.info("elective_client_max_life: %s" % elective_client_max_life)
+    cout.info("adaptive_timeout: %s" % adaptive_timeout)
+    cout.info("adaptive_timeout_percentile: %s" % adaptive_timeout_percentile)
+    cout.info("adaptive_timeout_factor: %s" % adaptive_timeout_factor)
+    cout.info("adaptive_timeout_min: %s" % adaptive_timeout_min)
+    cout.info("dns_cache_ttl: %s" % dns_cache_ttl)
+    cout.info("dns_pins: %s" % ", ".join( "%s=%s" % (host, ip) for host, ips in dns_pins.items() for ip in ips ))
+    cout.info("happy_eyeballs_delay: %s" % happy_eyeballs_delay)
+    cout.info("connection_warmup: %s" % connection_warmup)
+    cout.info("connection_max_idle: %s" % connection_max_idle)
+    cout.info("refresh_hedge: %s" % refresh_hedge)
+    cout.info("refresh_hedge_percentile: %s" % refresh_hedge_percentile)
+    cout.info("refresh_hedge_budget: %s" % refresh_hedge_budget)
     cout.info("is_print_mutex_rules: %s" % is_print_mutex_rules)
+    cout.info("captcha_model: %s" % _model_file)
+    cout.info("captcha_backend: %s" % captcha_backend)
+    cout.info("captcha_optimize: %s" % captcha_optimize)
+    cout.info("captcha_num_threads: %s" % captcha_num_threads)
+    cout.info("captcha_confidence_threshold: %s" % captcha_confidence_threshold)
+    cout.info("captcha_max_low_confidence_skips: %s" % captcha_max_low_confidence_skips)
+    cout.info("captcha_nbest_retries: %s" % captcha_nbest_retries)
+    cout.info("captcha_prefetch: %s" % captcha_prefetch)
+    cout.info("captcha_prefetch_max_age: %s" % captcha_prefetch_max_age)
+    cout.info("captcha_server_socket: %s" % captcha_server_socket)
+    cout.info("captcha_archive_max_size: %s" % captcha_archive_max_size)
+    cout.info("captcha_archive_passed: %s" % captcha_archive_passed)
+    cout.info("captcha_reload_interval: %s" % captcha_reload_interval)
+    cout.info("engine: %s" % (environ.engine or "thread"))
     cout.info(line)
     cout.info("")
 
-    while True:
+def _print_tasks():
+    """
+    Print current tasks, ignored tasks and rules, return the current tasks
+    """
+    line = "-" * 30
 
-        noWait = False
+    ## print current plans
 
-        if elective is None:
-            elective = electivePool.get()
+    current = [ c for c in goals if c not in ignored ]
+    if len(current) > 0:
+        cout.info("> Current tasks")
+        cout.info(line)
+        for ix, course in enumerate(current):
+            cout.info("%02d. %s" % (ix + 1, course))
+        cout.info(line)
+        cout.info("")
 
-        environ.elective_loop += 1
+    ## print ignored course
 
+    if len(ignored) > 0:
+        cout.info("> Ignored tasks")
+        cout.info(line)
+        for ix, (course, reason) in enumerate(ignored.items()):
+            cout.info("%02d. %s  %s" % (ix + 1, course, reason))
+        cout.info(line)
         cout.info("")
-        cout.info("======== Loop %d ========" % environ.elective_loop)
+
+    ## print mutex rules
+
+    if np.any(mutexes):
+        cout.info("> Mutex rules")
+        cout.info(line)
+        ixs = [ (ix1, ix2) for ix1, ix2 in np.argwhere( mutexes == 1 ) if ix1 < ix2 ]
+        if is_print_mutex_rules:
+            for ix, (ix1, ix2) in enumerate(ixs):
+                cout.info("%02d. %s --x-- %s" % (ix + 1, goals[ix1], goals[ix2]))
+        else:
+            cout.info("%d mutex rules" % len(ixs))
+        cout.info(line)
         cout.info("")
 
-        ## print current plans
+    ## print delay rules
 
-        current = [ c for c in goals if c not in ignored ]
-        if len(current) > 0:
-            cout.info("> Current tasks")
-            cout.info(line)
-            for ix, course in enumerate(current):
-                cout.info("%02d. %s" % (ix + 1, course))
-            cout.info(line)
-            cout.info("")
+    if np.any( delays != NO_DELAY ):
+        cout.info("> Delay rules")
+        cout.info(line)
+        ds = [ (cix, threshold) for cix, threshold in enumerate(delays) if threshold != NO_DELAY ]
+        for ix, (cix, threshold) in enumerate(ds):
+            cout.info("%02d. %s --- %d" % (ix + 1, goals[cix], threshold))
+        cout.info(line)
+        cout.info("")
 
-        ## print ignored course
+    return current
 
-        if len(ignored) > 0:
-            cout.info("> Ignored tasks")
-            cout.info(line)
-            for ix, (course, reason) in enumerate(ignored.items()):
-                cout.info("%02d. %s  %s" % (ix + 1, course, reason))
-            cout.info(line)
-            cout.info("")
+def _print_client(elective, qsize):
+    cout.info("> Current client: %s (qsize: %s)" % (elective.id, qsize))
+    cout.info("> Client expired time: %s" % _format_timestamp(elective.expired_time))
+    cout.info("User-Agent: %s" % elective.user_agent)
+    cout.info("")
 
-        ## print mutex rules
+def _parse_courses(r):
+    """
+    -> (elected, plans) of a SupplyCancel / supplement page, IndexError is raised for an empty page
+    """
+    tables = get_tables(r._tree)
+    elected = get_courses(tables[1])
+    plans = get_courses_with_detail(tables[0])
+    return elected, plans
+
+def _dump_empty_page(r):
+    filename = "elective.get_SupplyCancel_%d.html" % int(time.time() * 1000)
+    _dump_respose_content(r.content, filename)
+    cout.info("Page dump to %s" % filename)
+
+def _get_page(elective):
+    """
+    -> (page_r, elected, plans)
+    """
+    if supply_cancel_page == 1:
+
+        cout.info("Get SupplyCancel page %s" % supply_cancel_page)
+
+        r = elective.get_SupplyCancel(username)
+        try:
+            elected, plans = _parse_courses(r)
+        except IndexError as e:
+            _dump_empty_page(r)
+            raise UnexceptedHTMLFormat
+        return r, elected, plans
+
+    else:
+        #
+        # 刷新非第一页的课程，第一次请求会遇到返回空页面的情况
+        #
+        # 模拟方法：
+        # 1.先登录辅双，打开补退选第二页
+        # 2.再在同一浏览器登录主修
+        # 3.刷新辅双的补退选第二页可以看到
+        #
+        # -----------------------------------------------
+        #
+        # 引入 retry 逻辑以防止以为某些特殊原因无限重试
+        # 正常情况下一次就能成功，但是为了应对某些偶发错误，这里设为最多尝试 3 次
+        #
+        retry = 3
+        while True:
+            if retry == 0:
+                raise OperationFailedError(msg="unable to get normal Supplement page %s" % supply_cancel_page)
+
+            cout.info("Get Supplement page %s" % supply_cancel_page)
+            r = elective.get_supplement(username, page=supply_cancel_page) # 双学位第二页
+            try:
+                elected, plans = _parse_courses(r)
+            except IndexError as e:
+                cout.warning("IndexError encountered")
+                cout.info("Get SupplyCancel first to prevent empty table returned")
+                _ = elective.get_SupplyCancel(username) # 遇到空页面时请求一次补退选主页，之后就可以不断刷新
+            else:
+                return r, elected, plans
+            finally:
+                retry -= 1
+
+def _take_idle_client():
+    """
+    -> a logged-in client from the pool to hedge on, None if there is none
+    """
+    for _ in range(electivePool.qsize()):
+        try:
+            client = electivePool.get_nowait()
+        except Empty:
+            return None
+        if client.has_logined and not client.is_expired:
+            return client
+        electivePool.put_nowait(client)
+    return None
+
+def _put_back_hedge_client(client, error):
+    """
+    Put back a client whose hedged request is done, to the relogin pool if its error
+    needs it. A fatal error isn't raised again here, the round goes on with the other client.
+    """
+    relogin = False
+    if error is not None:
+        try:
+            relogin = _handle_elective_error(error, client)
+        except Exception:
+            pass  # already logged
+    if relogin:
+        reloginPool.put_nowait(client)
+    else:
+        electivePool.put_nowait(client)
 
-        if np.any(mutexes):
-            cout.info("> Mutex rules")
-            cout.info(line)
-            ixs = [ (ix1, ix2) for ix1, ix2 in np.argwhere( mutexes == 1 ) if ix1 < ix2 ]
-            if is_print_mutex_rules:
-                for ix, (ix1, ix2) in enumerate(ixs):
-                    cout.info("%02d. %s --x-- %s" % (ix + 1, goals[ix1], goals[ix2]))
+def _get_page_hedged(elective):
+    """
+    -> (elective, page_r, elected, plans), where elective is the client whose page wins,
+       the other client is put back to the pool, or the relogin pool, once its request is done
+    """
+    environ.hedge_counters["refreshes"] += 1
+
+    delay = hedger.get_delay(elective)
+    if delay is None:
+        return (elective,) + _get_page(elective)
+
+    primary = _hedgeExecutor.submit(_get_page, elective)
+    if len(wait([primary], timeout=delay).done) > 0:
+        return (elective,) + primary.result()
+
+    environ.hedge_counters["delayed"] += 1
+
+    other = _take_idle_client()
+    if other is None:
+        environ.hedge_counters["no_idle_client"] += 1
+        return (elective,) + primary.result()
+
+    if not hedger.acquire():
+        electivePool.put_nowait(other)
+        return (elective,) + primary.result()
+
+    cout.info("Refresh takes longer than %d ms, hedge it on client: %s" % (delay * 1000, other.id))
+
+    hedge = _hedgeExecutor.submit(_get_page, other)
+    clients = { primary: elective, hedge: other }
+    winner = None
+    pending = { primary, hedge }
+
+    while winner is None and len(pending) > 0:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in (primary, hedge):
+            if future in done and future.exception() is None:
+                winner = future
+                break
+
+    if winner is None:
+        environ.hedge_counters["failed"] += 1
+        _put_back_hedge_client(other, hedge.exception())
+        return (elective,) + primary.result()  # raise the error of the original client
+
+    t_won = time.time()
+    loser = hedge if winner is primary else primary
+    hedger.record_result(winner is hedge)
+    cout.info("Page of client: %s wins" % clients[winner].id)
+
+    def _on_loser_done(future):
+        if future.exception() is not None:
+            environ.hedge_counters["loser_errors"] += 1
+        elif winner is hedge:
+            hedger.record_saved(time.time() - t_won)
+        _put_back_hedge_client(clients[loser], future.exception())
+
+    loser.add_done_callback(_on_loser_done)
+
+    return (clients[winner],) + winner.result()
+
+def _get_tasks(elected, plans):
+    """
+    -> deque([ (ix, course) ]) of available goals, the elected ones are ignored here
+    """
+    cout.info("Get available courses")
+
+    tasks = [] # [(ix, course)]
+    for ix, c in enumerate(goals):
+        if c in ignored:
+            continue
+        elif c in elected:
+            cout.info("%s is elected, ignored" % c)
+            _ignore_course(c, "Elected")
+            for (mix, ) in np.argwhere( mutexes[ix,:] == 1 ):
+                mc = goals[mix]
+                if mc in ignored:
+                    continue
+                cout.info("%s is simultaneously ignored by mutex rules" % mc)
+                _ignore_course(mc, "Mutex rules")
+        else:
+            for c0 in plans: # c0 has detail
+                if c0 == c:
+                    if c0.is_available():
+                        delay = delays[ix]
+                        if delay != NO_DELAY and c0.remaining_quota > delay:
+                            cout.info("%s hasn't reached the delay threshold %d, skip" % (c0, delay))
+                        else:
+                            tasks.append((ix, c0))
+                            cout.info("%s is AVAILABLE now !" % c0)
+                    break
             else:
-                cout.info("%d mutex rules" % len(ixs))
-            cout.info(line)
-            cout.info("")
+                raise UserInputException("%s is not in your course plan, please check your config." % c)
+
+    return deque([ (ix, c) for ix, c in tasks if c not in ignored ]) # filter again and change to deque
+
+def _is_mutex(ix, course, elected):
+    """
+    Dynamically filter course by mutex rules, see Issue #25
+    """
+    for (mix, ) in np.argwhere( mutexes[ix,:] == 1 ):
+        mc = goals[mix]
+        if mc in elected: # ignore course in advanced
+            cout.info("%s --x-- %s" % (course, mc))
+            cout.info("%s is ignored by mutex rules in advance" % course)
+            _ignore_course(course, "Mutex rules")
+            return True
+    return False
+
+def _check_validation(captcha, ix, code, res):
+    """
+    Count the validation result of the ix-th candidate code of the captcha,
+    -> True if it's passed, False if it's failed, None if the result is unknown
+    """
+    if res == "2":
+        cout.info("Validation passed")
+        if ix == 0:
+            _add_captcha_result(captcha, "passed")
+        else:
+            environ.captcha_counters["nbest_passed"] += 1
+        if captcha_archive_passed:
+            archive.submit(captcha, valid=True, code=code)
+        return True
+    elif res == "0":
+        cout.info("Validation failed")
+        if ix == 0:
+            _add_captcha_result(captcha, "failed")
+        archive.submit(captcha, code=code) # written by a background thread
+        cout.info("Archive %s (%s) to %s" % (captcha, code, _USER_CAPTCHA_CACHE_DIR))
+        return False
+    else:
+        cout.warning("Unknown validation result: %s" % res)
+        return None
+
+def _handle_election_error(e, course, elected, page_r):
+    """
+    Handle the outcome of `get_ElectSupplement`, which is always raised as an exception
+    """
+    try:
+        raise e
+
+    except ElectionRepeatedError as e:
+        ferr.error(e)
+        cout.warning("ElectionRepeatedError encountered")
+        _ignore_course(course, "Repeated")
+        _add_error(e)
+
+    except TimeConflictError as e:
+        ferr.error(e)
+        cout.warning("TimeConflictError encountered")
+        _ignore_course(course, "Time conflict")
+        _add_error(e)
+
+    except ExamTimeConflictError as e:
+        ferr.error(e)
+        cout.warning("ExamTimeConflictError encountered")
+        _ignore_course(course, "Exam time conflict")
+        _add_error(e)
+
+    except ElectionPermissionError as e:
+        ferr.error(e)
+        cout.warning("ElectionPermissionError encountered")
+        _ignore_course(course, "Permission required")
+        _add_error(e)
+
+    except CreditsLimitedError as e:
+        ferr.error(e)
+        cout.warning("CreditsLimitedError encountered")
+        _ignore_course(course, "Credits limited")
+        _add_error(e)
+
+    except MutexCourseError as e:
+        ferr.error(e)
+        cout.warning("MutexCourseError encountered")
+        _ignore_course(course, "Mutual exclusive")
+        _add_error(e)
+
+    except MultiEnglishCourseError as e:
+        ferr.error(e)
+        cout.warning("MultiEnglishCourseError encountered")
+        _ignore_course(course, "Multi English course")
+        _add_error(e)
+
+    except MultiPECourseError as e:
+        ferr.error(e)
+        cout.warning("MultiPECourseError encountered")
+        _ignore_course(course, "Multi PE course")
+        _add_error(e)
+
+    except ElectionFailedError as e:
+        ferr.error(e)
+        cout.warning("ElectionFailedError encountered") # 具体原因不明，且不能马上重试
+        _add_error(e)
+
+    except QuotaLimitedError as e:
+        ferr.error(e)
+        # 选课网可能会发回异常数据，本身名额 180/180 的课会发 180/0，这个时候选课会得到这个错误
+        if course.used_quota == 0:
+            cout.warning("Abnormal status of %s, a bug of 'elective.pku.edu.cn' found" % course)
+        else:
+            ferr.critical("Unexcepted behaviour") # 没有理由运行到这里
+            _add_error(e)
+
+    except ElectionSuccess as e:
+        # 不从此处加入 ignored，而是在下回合根据教学网返回的实际选课结果来决定是否忽略
+        cout.info("%s is ELECTED !" % course)
+        environ.captcha_counters["elections"] += 1
+
+        # --------------------------------------------------------------------------
+        # Issue #25
+        # --------------------------------------------------------------------------
+        # 但是动态地更新 elected，如果同一回合内有多门课可以被选，并且根据 mutex rules，
+        # 低优先级的课和刚选上的高优先级课冲突，那么轮到低优先级的课提交选课请求的时候，
+        # 根据这个动态更新的 elected 它将会被提前地忽略（而不是留到下一循环回合的开始时才被忽略）
+        # --------------------------------------------------------------------------
+        r = e.response  # get response from error ... a bit ugly
+        tables = get_tables(r._tree)
+        # use clear() + extend() instead of op `=` to ensure `id(elected)` doesn't change
+        elected.clear()
+        elected.extend(get_courses(tables[1]))
+
+    except RuntimeError as e:
+        ferr.critical(e)
+        ferr.critical("RuntimeError with Course(name=%r, class_no=%d, school=%r, status=%s, href=%r)" % (
+                        course.name, course.class_no, course.school, course.status, course.href))
+        # use this private function of 'hook.py' to dump the response from `get_SupplyCancel` or `get_supplement`
+        file = _dump_request(page_r)
+        ferr.critical("Dump response from 'get_SupplyCancel / get_supplement' to %s" % file)
+        raise e
+
+    except Exception as e:
+        raise e  # don't increase error count here
+
+def _handle_elective_error(e, elective):
+    """
+    Count and log an error raised in an elective round, the fatal ones are raised again.
+    -> True if the client needs to login again
+    """
+    try:
+        raise e
+
+    except UserInputException as e:
+        cout.error(e)
+        _add_error(e)
+        raise e
+
+    except (ServerError, StatusCodeError) as e:
+        ferr.error(e)
+        cout.warning("ServerError/StatusCodeError encountered")
+        _add_error(e)
+
+    except OperationFailedError as e:
+        ferr.error(e)
+        cout.warning("OperationFailedError encountered")
+        _add_error(e)
+
+    except UnexceptedHTMLFormat as e:
+        ferr.error(e)
+        cout.warning("UnexceptedHTMLFormat encountered")
+        _add_error(e)
+
+    except RequestException as e:
+        ferr.error(e)
+        cout.warning("RequestException encountered")
+        _add_error(e)
+
+    except IAAAException as e:
+        ferr.error(e)
+        cout.warning("IAAAException encountered")
+        _add_error(e)
+
+    except _ElectiveNeedsLogin as e:
+        cout.info("client: %s needs Login" % elective.id)
+        return True
+
+    except _ElectiveExpired as e:
+        cout.info("client: %s expired" % elective.id)
+        return True
+
+    except (SessionExpiredError, InvalidTokenError, NoAuthInfoError, SharedSessionError) as e:
+        ferr.error(e)
+        _add_error(e)
+        cout.info("client: %s needs relogin" % elective.id)
+        return True
+
+    except CaughtCheatingError as e:
+        ferr.critical(e) # critical error !
+        _add_error(e)
+        raise e
+
+    except SystemException as e:
+        ferr.error(e)
+        cout.warning("SystemException encountered")
+        _add_error(e)
+
+    except TipsException as e:
+        ferr.error(e)
+        cout.warning("TipsException encountered")
+        _add_error(e)
+
+    except OperationTimeoutError as e:
+        ferr.error(e)
+        cout.warning("OperationTimeoutError encountered")
+        _add_error(e)
+
+    except json.JSONDecodeError as e:
+        ferr.error(e)
+        cout.warning("JSONDecodeError encountered")
+        _add_error(e)
+
+    except Exception as e:
+        ferr.exception(e)
+        _add_error(e)
+        raise e
+
+    return False
+
+
+def run_iaaa_loop():
+
+    elective = None
+    iaaa = None
+
+    while True:
 
-        ## print delay rules
+        if elective is None:
+            elective = reloginPool.get()
+            if elective is killedElective:
+                cout.info("Quit IAAA loop")
+                return
 
-        if np.any( delays != NO_DELAY ):
-            cout.info("> Delay rules")
-            cout.info(line)
-            ds = [ (cix, threshold) for cix, threshold in enumerate(delays) if threshold != NO_DELAY ]
-            for ix, (cix, threshold) in enumerate(ds):
-                cout.info("%02d. %s --- %d" % (ix + 1, goals[cix], threshold))
-            cout.info(line)
+        environ.iaaa_loop += 1
+        user_agent = random.choice(USER_AGENT_LIST)
+
+        cout.info("Try to login IAAA (client: %s)" % elective.id)
+        cout.info("User-Agent: %s" % user_agent)
+
+        try:
+
+            if iaaa is None or not iaaa_client_reuse:
+                iaaa = IAAAClient(timeout=iaaa_client_timeout, http_stats=environ.http_stats["iaaa"],
+                                  adaptive_timeout=_create_adaptive_timeout(), resolver=resolver)
+            else:
+                iaaa.clear_cookies() # start a new login, but keep the connections to IAAA
+            iaaa.set_user_agent(user_agent)
+
+            t0 = time.time()
+            iaaa_connections = iaaa.connections
+            elective_connections = elective.connections
+
+            # request elective's home page to get cookies
+            r = iaaa.oauth_home()
+
+            r = iaaa.oauth_login(username, password)
+            token = _parse_token(r)
+
+            t_token = time.time() - t0
+
+            if prefetcher is not None:
+                prefetcher.discard(elective) # captcha of the old session is useless
+            elective.clear_cookies()
+            elective.set_user_agent(user_agent)
+
+            r = elective.sso_login(token)
+
+            if is_dual_degree:
+                sida = get_sida(r)
+                sttp = identity
+                referer = r.url
+                r = elective.sso_login_dual_degree(sida, sttp, referer)
+
+            _on_login_success(elective, t_token, time.time() - t0,
+                              max(0, iaaa.connections - iaaa_connections),
+                              max(0, elective.connections - elective_connections))
+
+            electivePool.put_nowait(elective)
+            elective = None
+
+        except Exception as e:
+            _handle_iaaa_error(e)
+
+        finally:
+            t = login_loop_interval
+            cout.info("")
+            cout.info("IAAA login loop sleep %s s" % t)
             cout.info("")
+            time.sleep(t)
+
+
+def run_elective_loop():
+
+    elective = None
+    noWait = False
+
+    _load_rules()
+
+    ## setup elective pool
+
+    clients = []
+    for ix in range(1, elective_client_pool_size + 1):
+        client = ElectiveClient(id=ix, timeout=elective_client_timeout,
+                                http_stats=environ.http_stats["elective:%d" % ix],
+                                adaptive_timeout=_create_adaptive_timeout(), resolver=resolver)
+        client.set_user_agent(random.choice(USER_AGENT_LIST))
+        clients.append(client)
+
+    _print_header()
+    _warm_clients(clients)
+
+    for client in clients:
+        electivePool.put_nowait(client)
+
+    while True:
+
+        noWait = False
+
+        if elective is None:
+            elective = electivePool.get()
+
+        environ.elective_loop += 1
+
+        cout.info("")
+        cout.info("======== Loop %d ========" % environ.elective_loop)
+        cout.info("")
+
+        current = _print_tasks()
 
         if len(current) == 0:
             cout.info("No tasks")
@@ -364,12 +1004,7 @@ def run_elective_loop():
             reloginPool.put_nowait(killedElective) # kill signal
             return
 
-        ## print client info
-
-        cout.info("> Current client: %s (qsize: %s)" % (elective.id, electivePool.qsize() + 1))
-        cout.info("> Client expired time: %s" % _format_timestamp(elective.expired_time))
-        cout.info("User-Agent: %s" % elective.user_agent)
-        cout.info("")
+        _print_client(elective, electivePool.qsize() + 1)
 
         try:
 
@@ -385,91 +1020,23 @@ def run_elective_loop():
                     cout.exception(e)
                 raise _ElectiveExpired   # quit this loop
 
-            ## check supply/cancel page
-
-            page_r = None
+            ## prefetch a captcha while refreshing the page
 
-            if supply_cancel_page == 1:
+            if prefetcher is not None:
+                prefetcher.submit(elective)
 
-                cout.info("Get SupplyCancel page %s" % supply_cancel_page)
+            ## check supply/cancel page
 
-                r = page_r = elective.get_SupplyCancel(username)
-                tables = get_tables(r._tree)
-                try:
-                    elected = get_courses(tables[1])
-                    plans = get_courses_with_detail(tables[0])
-                except IndexError as e:
-                    filename = "elective.get_SupplyCancel_%d.html" % int(time.time() * 1000)
-                    _dump_respose_content(r.content, filename)
-                    cout.info("Page dump to %s" % filename)
-                    raise UnexceptedHTMLFormat
+            page_r = None
 
+            if hedger is not None:
+                elective, page_r, elected, plans = _get_page_hedged(elective)
             else:
-                #
-                # 刷新非第一页的课程，第一次请求会遇到返回空页面的情况
-                #
-                # 模拟方法：
-                # 1.先登录辅双，打开补退选第二页
-                # 2.再在同一浏览器登录主修
-                # 3.刷新辅双的补退选第二页可以看到
-                #
-                # -----------------------------------------------
-                #
-                # 引入 retry 逻辑以防止以为某些特殊原因无限重试
-                # 正常情况下一次就能成功，但是为了应对某些偶发错误，这里设为最多尝试 3 次
-                #
-                retry = 3
-                while True:
-                    if retry == 0:
-                        raise OperationFailedError(msg="unable to get normal Supplement page %s" % supply_cancel_page)
-
-                    cout.info("Get Supplement page %s" % supply_cancel_page)
-                    r = page_r = elective.get_supplement(username, page=supply_cancel_page) # 双学位第二页
-                    tables = get_tables(r._tree)
-                    try:
-                        elected = get_courses(tables[1])
-                        plans = get_courses_with_detail(tables[0])
-                    except IndexError as e:
-                        cout.warning("IndexError encountered")
-                        cout.info("Get SupplyCancel first to prevent empty table returned")
-                        _ = elective.get_SupplyCancel(username) # 遇到空页面时请求一次补退选主页，之后就可以不断刷新
-                    else:
-                        break
-                    finally:
-                        retry -= 1
+                page_r, elected, plans = _get_page(elective)
 
             ## check available courses
 
-            cout.info("Get available courses")
-
-            tasks = [] # [(ix, course)]
-            for ix, c in enumerate(goals):
-                if c in ignored:
-                    continue
-                elif c in elected:
-                    cout.info("%s is elected, ignored" % c)
-                    _ignore_course(c, "Elected")
-                    for (mix, ) in np.argwhere( mutexes[ix,:] == 1 ):
-                        mc = goals[mix]
-                        if mc in ignored:
-                            continue
-                        cout.info("%s is simultaneously ignored by mutex rules" % mc)
-                        _ignore_course(mc, "Mutex rules")
-                else:
-                    for c0 in plans: # c0 has detail
-                        if c0 == c:
-                            if c0.is_available():
-                                delay = delays[ix]
-                                if delay != NO_DELAY and c0.remaining_quota > delay:
-                                    cout.info("%s hasn't reached the delay threshold %d, skip" % (c0, delay))
-                                else:
-                                    tasks.append((ix, c0))
-                                    cout.info("%s is AVAILABLE now !" % c0)
-                            break
-                    else:
-                        raise UserInputException("%s is not in your course plan, please check your config." % c)
-
-            tasks = deque([ (ix, c) for ix, c in tasks if c not in ignored ]) # filter again and change to deque
+            tasks = _get_tasks(elected, plans)
 
             ## elect available courses
 
@@ -483,230 +1050,65 @@ def run_elective_loop():
 
                 ix, course = tasks.popleft()
 
-                is_mutex = False
-
-                # dynamically filter course by mutex rules
-                for (mix, ) in np.argwhere( mutexes[ix,:] == 1 ):
-                    mc = goals[mix]
-                    if mc in elected: # ignore course in advanced
-                        is_mutex = True
-                        cout.info("%s --x-- %s" % (course, mc))
-                        cout.info("%s is ignored by mutex rules in advance" % course)
-                        _ignore_course(course, "Mutex rules")
-                        break
-
-                if is_mutex:
+                if _is_mutex(ix, course, elected):
                     continue
 
                 cout.info("Try to elect %s" % course)
 
                 ## validate captcha first
 
-                while True:
-
-                    cout.info("Fetch a captcha")
-                    r = elective.get_DrawServlet()
+                skips = 0
+                passed = False
+                captcha = prefetcher.take(elective) if prefetcher is not None else None
 
-                    captcha = recognizer.recognize(r.content)
-                    cout.info("Recognition result: %s" % captcha.code)
+                while not passed:
 
-                    r = elective.get_Validate(username, captcha.code)
-                    try:
-                        res = r.json()["valid"]  # 可能会返回一个错误网页
-                    except Exception as e:
-                        ferr.error(e)
-                        raise OperationFailedError(msg="Unable to validate captcha")
+                    if captcha is None:
+                        cout.info("Fetch a captcha")
+                        r = elective.get_DrawServlet()
+                        environ.captcha_counters["fetches"] += 1
 
-                    if res == "2":
-                        cout.info("Validation passed")
-                        break
-                    elif res == "0":
-                        cout.info("Validation failed")
-                        captcha.save(CAPTCHA_CACHE_DIR)
-                        cout.info("Save %s to %s" % (captcha, CAPTCHA_CACHE_DIR))
-                        cout.info("Try again")
+                        captcha = recognizer.recognize(r.content)
+                        environ.captcha_counters["recognitions"] += 1
                     else:
-                        cout.warning("Unknown validation result: %s" % res)
-
-                ## try to elect
-
-                try:
+                        cout.info("Use the prefetched captcha")
 
-                    r = elective.get_ElectSupplement(course.href)
+                    cout.info("Recognition result: %s (confidence: %.4f)" % (captcha.code, captcha.confidence))
 
-                except ElectionRepeatedError as e:
-                    ferr.error(e)
-                    cout.warning("ElectionRepeatedError encountered")
-                    _ignore_course(course, "Repeated")
-                    _add_error(e)
-
-                except TimeConflictError as e:
-                    ferr.error(e)
-                    cout.warning("TimeConflictError encountered")
-                    _ignore_course(course, "Time conflict")
-                    _add_error(e)
-
-                except ExamTimeConflictError as e:
-                    ferr.error(e)
-                    cout.warning("ExamTimeConflictError encountered")
-                    _ignore_course(course, "Exam time conflict")
-                    _add_error(e)
-
-                except ElectionPermissionError as e:
-                    ferr.error(e)
-                    cout.warning("ElectionPermissionError encountered")
-                    _ignore_course(course, "Permission required")
-                    _add_error(e)
-
-                except CreditsLimitedError as e:
-                    ferr.error(e)
-                    cout.warning("CreditsLimitedError encountered")
-                    _ignore_course(course, "Credits limited")
-                    _add_error(e)
-
-                except MutexCourseError as e:
-                    ferr.error(e)
-                    cout.warning("MutexCourseError encountered")
-                    _ignore_course(course, "Mutual exclusive")
-                    _add_error(e)
-
-                except MultiEnglishCourseError as e:
-                    ferr.error(e)
-                    cout.warning("MultiEnglishCourseError encountered")
-                    _ignore_course(course, "Multi English course")
-                    _add_error(e)
-
-                except MultiPECourseError as e:
-                    ferr.error(e)
-                    cout.warning("MultiPECourseError encountered")
-                    _ignore_course(course, "Multi PE course")
-                    _add_error(e)
-
-                except ElectionFailedError as e:
-                    ferr.error(e)
-                    cout.warning("ElectionFailedError encountered") # 具体原因不明，且不能马上重试
-                    _add_error(e)
-
-                except QuotaLimitedError as e:
-                    ferr.error(e)
-                    # 选课网可能会发回异常数据，本身名额 180/180 的课会发 180/0，这个时候选课会得到这个错误
-                    if course.used_quota == 0:
-                        cout.warning("Abnormal status of %s, a bug of 'elective.pku.edu.cn' found" % course)
-                    else:
-                        ferr.critical("Unexcepted behaviour") # 没有理由运行到这里
-                        _add_error(e)
-
-                except ElectionSuccess as e:
-                    # 不从此处加入 ignored，而是在下回合根据教学网返回的实际选课结果来决定是否忽略
-                    cout.info("%s is ELECTED !" % course)
-
-                    # --------------------------------------------------------------------------
-                    # Issue #25
-                    # --------------------------------------------------------------------------
-                    # 但是动态地更新 elected，如果同一回合内有多门课可以被选，并且根据 mutex rules，
-                    # 低优先级的课和刚选上的高优先级课冲突，那么轮到低优先级的课提交选课请求的时候，
-                    # 根据这个动态更新的 elected 它将会被提前地忽略（而不是留到下一循环回合的开始时才被忽略）
-                    # --------------------------------------------------------------------------
-                    r = e.response  # get response from error ... a bit ugly
-                    tables = get_tables(r._tree)
-                    # use clear() + extend() instead of op `=` to ensure `id(elected)` doesn't change
-                    elected.clear()
-                    elected.extend(get_courses(tables[1]))
-
-                except RuntimeError as e:
-                    ferr.critical(e)
-                    ferr.critical("RuntimeError with Course(name=%r, class_no=%d, school=%r, status=%s, href=%r)" % (
-                                    course.name, course.class_no, course.school, course.status, course.href))
-                    # use this private function of 'hook.py' to dump the response from `get_SupplyCancel` or `get_supplement`
-                    file = _dump_request(page_r)
-                    ferr.critical("Dump response from 'get_SupplyCancel / get_supplement' to %s" % file)
-                    raise e
+                    if captcha.confidence < captcha_confidence_threshold and skips < captcha_max_low_confidence_skips:
+                        cout.info("Low confidence, fetch another captcha")
+                        _add_captcha_result(captcha, "skipped")
+                        skips += 1
+                        captcha = None
+                        continue
 
-                except Exception as e:
-                    raise e  # don't increase error count here
+                    # the recognized code first, then the next-best codes of the same image
+                    for cix, (code, prob) in enumerate(captcha.candidates(1 + captcha_nbest_retries)):
 
-        except UserInputException as e:
-            cout.error(e)
-            _add_error(e)
-            raise e
+                        if cix > 0:
+                            cout.info("Try next-best code: %s (probability: %.4f)" % (code, prob))
 
-        except (ServerError, StatusCodeError) as e:
-            ferr.error(e)
-            cout.warning("ServerError/StatusCodeError encountered")
-            _add_error(e)
-
-        except OperationFailedError as e:
-            ferr.error(e)
-            cout.warning("OperationFailedError encountered")
-            _add_error(e)
-
-        except UnexceptedHTMLFormat as e:
-            ferr.error(e)
-            cout.warning("UnexceptedHTMLFormat encountered")
-            _add_error(e)
-
-        except RequestException as e:
-            ferr.error(e)
-            cout.warning("RequestException encountered")
-            _add_error(e)
-
-        except IAAAException as e:
-            ferr.error(e)
-            cout.warning("IAAAException encountered")
-            _add_error(e)
-
-        except _ElectiveNeedsLogin as e:
-            cout.info("client: %s needs Login" % elective.id)
-            reloginPool.put_nowait(elective)
-            elective = None
-            noWait = True
-
-        except _ElectiveExpired as e:
-            cout.info("client: %s expired" % elective.id)
-            reloginPool.put_nowait(elective)
-            elective = None
-            noWait = True
-
-        except (SessionExpiredError, InvalidTokenError, NoAuthInfoError, SharedSessionError) as e:
-            ferr.error(e)
-            _add_error(e)
-            cout.info("client: %s needs relogin" % elective.id)
-            reloginPool.put_nowait(elective)
-            elective = None
-            noWait = True
-
-        except CaughtCheatingError as e:
-            ferr.critical(e) # critical error !
-            _add_error(e)
-            raise e
-
-        except SystemException as e:
-            ferr.error(e)
-            cout.warning("SystemException encountered")
-            _add_error(e)
-
-        except TipsException as e:
-            ferr.error(e)
-            cout.warning("TipsException encountered")
-            _add_error(e)
+                        res = _check_validation(captcha, cix, code, _validate_code(elective, code))
+                        if res is not False: # passed or unknown
+                            passed = res is True
+                            break
 
-        except OperationTimeoutError as e:
-            ferr.error(e)
-            cout.warning("OperationTimeoutError encountered")
-            _add_error(e)
+                    if not passed:
+                        cout.info("Try again")
+                        captcha = None
 
-        except json.JSONDecodeError as e:
-            ferr.error(e)
-            cout.warning("JSONDecodeError encountered")
-            _add_error(e)
+                ## try to elect
 
-        except KeyboardInterrupt as e:
-            raise e
+                try:
+                    r = elective.get_ElectSupplement(course.href)
+                except Exception as e:
+                    _handle_election_error(e, course, elected, page_r)
 
         except Exception as e:
-            ferr.exception(e)
-            _add_error(e)
-            raise e
+            if _handle_elective_error(e, elective):
+                reloginPool.put_nowait(elective)
+                elective = None
+                noWait = True
 
         finally:
 
@@ -724,4 +1126,6 @@ def run_elective_loop():
                 cout.info("======== END Loop %d ========" % environ.elective_loop)
                 cout.info("Main loop sleep %s s" % t)
                 cout.info("")
-                time.sleep(t)
+                if warmer is not None:
+                    elective = _take_next_client()
+                _sleep_and_warm(t, elective)
@@ -1,13 +1,15 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 # filename: monitor.py
-# modified: 2019-09-11
+# modified: 2026-10-18
 
 import logging
 import werkzeug._internal as _werkzeug_internal
 from flask import Flask, current_app, jsonify
 from flask.logging import default_handler
 from .environ import Environ
+from .histogram import HTTPStats, get_endpoint
+from .const import ElectiveURL
 from .config import AutoElectiveConfig
 from .logger import ConsoleLogger
 
@@ -16,6 +18,8 @@ config = AutoElectiveConfig()
 cout = ConsoleLogger("monitor")
 ferr = ConsoleLogger("monitor.error")
 
+_LOGIN_ENDPOINTS = (get_endpoint(ElectiveURL.SSOLogin), get_endpoint(ElectiveURL.Logout))
+
 monitor = Flask(__name__, static_folder=None) # disable static rule
 
 monitor.config["JSON_AS_ASCII"] = False
@@ -77,6 +81,94 @@ def _stat_error():
         "errors": environ.errors,
     })
 
+@monitor.route("/stat/login", methods=["GET"])
+def _stat_login():
+    counters = environ.login_counters
+    logins = counters["logins"]
+    times = list(environ.login_times)
+
+    def _summary(values):
+        if len(values) == 0:
+            return None
+        values = sorted(values)
+        return {
+            "mean_ms": sum(values) / len(values) * 1000,
+            "p50_ms": values[len(values) // 2] * 1000,
+            "max_ms": values[-1] * 1000,
+        }
+
+    return jsonify({
+        "counters": counters,
+        "handshakes_per_login": {
+            "iaaa": counters["iaaa_handshakes"] / logins if logins > 0 else None,
+            "elective": counters["elective_handshakes"] / logins if logins > 0 else None,
+        },
+        "time_to_token": _summary([ t for t, _ in times ]),
+        "time_to_login": _summary([ t for _, t in times ]),
+    })
+
+@monitor.route("/stat/captcha", methods=["GET"])
+def _stat_captcha():
+    counters = environ.captcha_counters
+    elections = counters["elections"]
+    saved = counters["nbest_passed"] # each of them saves a DrawServlet fetch and a recognition
+    return jsonify({
+        "results": environ.captcha_results,
+        "counters": counters,
+        "validations_per_election": counters["validations"] / elections if elections > 0 else None,
+        "saved_per_election": {
+            "fetches": saved / elections if elections > 0 else None,
+            "recognitions": saved / elections if elections > 0 else None,
+        },
+    })
+
+@monitor.route("/stat/http", methods=["GET"])
+def _stat_http():
+    total = HTTPStats()
+    clients = {}
+    for name, stats in sorted(list(environ.http_stats.items())):
+        total.merge(stats)
+        clients[name] = stats.summary()
+    return jsonify({
+        "endpoints": total.summary(),
+        "clients": clients,
+        "dns": environ.dns_counters,
+    })
+
+@monitor.route("/stat/hedge", methods=["GET"])
+def _stat_hedge():
+    counters = environ.hedge_counters
+    refreshes = counters["refreshes"]
+    hedges = counters["hedges"]
+    return jsonify({
+        "counters": counters,
+        "hedge_rate": hedges / refreshes if refreshes > 0 else None,
+        "hedge_win_rate": counters["hedge_wins"] / hedges if hedges > 0 else None,
+        "saved": environ.hedge_saved.summary(),
+    })
+
+@monitor.route("/stat/warm", methods=["GET"])
+def _stat_warm():
+    total = HTTPStats()
+    for name, stats in list(environ.http_stats.items()):
+        if name.startswith("elective:"):
+            total.merge(stats)
+    requests = 0
+    handshakes = {} # { endpoint: new connections } of the requests out of login / logout
+    for endpoint, stats in total.summary().items():
+        if endpoint in _LOGIN_ENDPOINTS:
+            continue
+        requests += stats["requests"]
+        handshakes[endpoint] = stats["new_connections"]
+    n = sum(handshakes.values())
+    return jsonify({
+        "counters": environ.warm_counters,
+        "hot_path_handshakes": n,
+        "hot_path_handshakes_per_request": n / requests if requests > 0 else None,
+        "hot_path_handshakes_by_endpoint": handshakes,
+    })
+
+
 
 def run_monitor():
     monitor.run(
@@ -1,17 +1,65 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 # filename: parser.py
-# modified: 2019-09-09
+# modified: 2026-10-18
 
 import re
+import codecs
+import threading
 from lxml import etree
 from .course import Course
+from .histogram import get_endpoint
 
 _regexBzfxSida = re.compile(r'\?sida=(\S+?)&sttp=(?:bzx|bfx)')
 
+_local = threading.local()  # lxml parsers can't be shared between threads
+
+
+def _get_html_parser(encoding):
+    parsers = _local.__dict__.setdefault("parsers", {})
+    parser = parsers.get(encoding)
+    if parser is None:
+        parser = parsers[encoding] = etree.HTMLParser(encoding=encoding)
+    return parser
+
+def _normalize_encoding(encoding):
+    try:
+        name = codecs.lookup(encoding).name
+    except LookupError:
+        return None
+    if name in ("gb2312", "gbk"):
+        return "gb18030"  # detected GB2312 pages may contain chars of its supersets
+    return name
+
+def get_response_encoding(r):
+    """
+    The charset declared in Content-Type, otherwise the one detected from a known page of
+    the same endpoint in the client's session. Detection runs over the whole page, so its
+    result is kept by `remember_response_encoding` once the page is known to be the page
+    of the endpoint, not an SSO or error page served in its place.
+    """
+    if "charset" in r.headers.get("Content-Type", "").lower():
+        encoding = _normalize_encoding(r.encoding)
+        if encoding is not None:
+            return encoding
+
+    client = r.request.__dict__.get("_client")  # _client will be set by BaseClient
+    encoding = client.get_html_encoding(get_endpoint(r.url)) if client is not None else None
+    if encoding is None:
+        encoding = _normalize_encoding(r.apparent_encoding or "utf-8") or "utf-8"
+        r._detected_encoding = encoding
+    return encoding
+
+def remember_response_encoding(r):
+    """ keep the encoding detected from a known page for the next pages of its endpoint """
+    encoding = r.__dict__.get("_detected_encoding")
+    client = r.request.__dict__.get("_client")
+    if encoding is not None and client is not None:
+        client.set_html_encoding(get_endpoint(r.url), encoding)
 
 def get_tree_from_response(r):
-    return etree.HTML(r.text) # 不要用 r.content, 否则可能会以 latin-1 编码
+    # 不经过 r.text 解码，以确定的编码直接将字节交给 lxml，以免被当作 latin-1 编码
+    return etree.HTML(r.content, _get_html_parser(get_response_encoding(r)))
 
 def get_tree(content):
     return etree.HTML(content)
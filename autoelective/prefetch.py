@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: prefetch.py
+# modified: 2026-10-18
+
+"""
+Captcha prefetching for pooled ElectiveClients.
+
+A captcha is bound to the session of the client which draws it, and it remains valid
+until the client draws a new one. So while the elective loop refreshes the supplement
+page, a background thread can download and recognize a captcha for the same client,
+and the recognized code is ready when a course becomes available.
+
+A prefetched captcha is only used within `max_age`, and it's kept over the rounds which
+find nothing to elect. The interval between two rounds of a client is observed, and the
+captcha is replaced in the round before it expires, so it's still fresh in the next round
+and a course found available never waits for a new one. A client thus draws at most one
+captcha per round, and none while its captcha would outlive the next round.
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from .environ import Environ
+from .logger import ConsoleLogger
+
+environ = Environ()
+cout = ConsoleLogger("prefetch")
+
+
+class CaptchaPrefetcher(object):
+
+    def __init__(self, recognizer, max_age, max_workers=1):
+        """
+        max_age         seconds within which a prefetched captcha is still used
+        """
+        self._recognizer = recognizer
+        self._max_age = max_age
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._futures = {} # { client.id: Future }
+        self._submitted_at = {} # { client.id: time of the latest round }
+        self._lock = threading.Lock()
+
+    def _fetch(self, elective):
+        r = elective.get_DrawServlet()
+        environ.captcha_counters["fetches"] += 1
+        captcha = self._recognizer.recognize(r.content)
+        environ.captcha_counters["recognitions"] += 1
+        return (captcha, time.time())
+
+    def _is_usable(self, future, lead=0.0):
+        """ -> True if the captcha is still fresh in `lead` s """
+        if not future.done():
+            return True
+        if future.exception() is not None:
+            return False
+        _, fetched_at = future.result()
+        return time.time() - fetched_at <= self._max_age - lead
+
+    def submit(self, elective):
+        """
+        Start prefetching a captcha for this client at the start of its round, unless a
+        fresh one is in flight, or is ready and still fresh in its next round
+        """
+        now = time.time()
+        with self._lock:
+            submitted_at = self._submitted_at.get(elective.id)
+            self._submitted_at[elective.id] = now
+            lead = now - submitted_at if submitted_at is not None else 0.0 # till the next round
+            future = self._futures.get(elective.id)
+            if future is not None:
+                if self._is_usable(future, lead):
+                    return
+                if future.exception() is not None:
+                    environ.captcha_counters["prefetch_errors"] += 1
+                elif not self._is_usable(future):
+                    environ.captcha_counters["prefetch_stale"] += 1
+            self._futures[elective.id] = self._executor.submit(self._fetch, elective)
+
+    def take(self, elective):
+        """
+        Pop the prefetched captcha of this client, wait for it if it's still in flight.
+        Return None if there is nothing to use, then the caller should fetch a captcha by itself
+        """
+        with self._lock:
+            future = self._futures.pop(elective.id, None)
+
+        if future is None:
+            return None
+
+        try:
+            captcha, fetched_at = future.result()
+        except Exception as e:
+            cout.warning("Prefetch failed (client: %s): %r" % (elective.id, e))
+            environ.captcha_counters["prefetch_errors"] += 1
+            return None
+
+        age = time.time() - fetched_at
+        if age > self._max_age:
+            cout.info("Prefetched captcha is stale (%.1f s), discard it" % age)
+            environ.captcha_counters["prefetch_stale"] += 1
+            return None
+
+        environ.captcha_counters["prefetch_hits"] += 1
+        return captcha
+
+    def discard(self, elective):
+        """
+        Drop the prefetched captcha of this client before its session is renewed, a request
+        in flight is waited for, so that it can't touch the cookies of the new session
+        """
+        with self._lock:
+            future = self._futures.pop(elective.id, None)
+        if future is not None and not future.cancel():
+            wait([future])
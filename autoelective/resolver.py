@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: resolver.py
+# modified: 2026-10-18
+
+"""
+Name resolution and connection racing for the new connections of BaseClient (see
+`adapter.py`).
+
+At peak time a slow or flaky answer of the system resolver directly delays the next
+connection, so the addresses of a host are cached for `ttl` s, and the stale ones are
+used again if the resolver fails. The system resolver doesn't tell the TTL of a record,
+so a fixed one is used. The addresses of a host can also be pinned in the config, then
+it's never resolved.
+
+The connection is raced across the addresses in the way of Happy Eyeballs (RFC 8305):
+the addresses are interleaved by family, a connection attempt is started every `delay` s,
+or at once if the previous one fails, and the first established one wins, the others
+are closed. A host with an unreachable address then connects as fast as the others.
+
+The counters are kept in `environ.dns_counters`:
+
+    lookups         resolutions by the system resolver
+    cache_hits      resolutions from the cache
+    stale_hits      resolutions from the expired cache after the system resolver failed
+    pinned          resolutions from the pins
+    races           connections raced across more than one address
+    fallbacks       connections won by an address other than the first one
+"""
+
+import os
+import time
+import errno
+import socket
+import selectors
+import threading
+from .environ import Environ
+
+environ = Environ()
+
+_CONNECTING = (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY)
+
+
+def _interleave(addrs):
+    """ -> addresses alternating by family, starting with the family of the first one """
+    families = {} # { family: [addr] }
+    for addr in addrs:
+        families.setdefault(addr[0], []).append(addr)
+    queues = list(families.values())
+    res = []
+    for ix in range(max( len(q) for q in queues )):
+        for q in queues:
+            if ix < len(q):
+                res.append(q[ix])
+    return res
+
+
+class Resolver(object):
+
+    def __init__(self, ttl=60, pins=None, delay=0.25):
+        """
+        ttl             seconds to cache the addresses of a host, 0 to disable the cache
+        pins            { host: [ip] } which are never resolved
+        delay           seconds to wait for a connection attempt before starting the next one
+        """
+        self._ttl = ttl
+        self._pins = { host.lower(): list(ips) for host, ips in (pins or {}).items() }
+        self._delay = delay
+        self._cache = {} # { (host, port): (expires_at, addrs) }
+        self._lock = threading.Lock()
+
+    def resolve(self, host, port):
+        """
+        -> [ (family, type, proto, canonname, sockaddr) ] as socket.getaddrinfo(),
+           socket.gaierror is raised if the host can't be resolved
+        """
+        counters = environ.dns_counters
+        key = (host.lower(), port)
+
+        ips = self._pins.get(key[0])
+        if ips is not None:
+            counters["pinned"] += 1
+            return [ addr for ip in ips for addr in socket.getaddrinfo(
+                        ip, port, 0, socket.SOCK_STREAM, 0, socket.AI_NUMERICHOST) ]
+
+        now = time.monotonic()
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] > now:
+            counters["cache_hits"] += 1
+            return entry[1]
+
+        counters["lookups"] += 1
+        try:
+            addrs = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        except socket.gaierror:
+            if entry is None:
+                raise
+            counters["stale_hits"] += 1
+            return entry[1]
+
+        if self._ttl > 0 and len(addrs) > 0:
+            with self._lock:
+                self._cache[key] = (now + self._ttl, addrs)
+        return addrs
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def _start(self, addr, source_address, socket_options):
+        """ -> (sock, established) of a non-blocking connection attempt """
+        family, type_, proto, _, sockaddr = addr
+        sock = socket.socket(family, type_, proto)
+        try:
+            for opt in socket_options or ():
+                sock.setsockopt(*opt)
+            if source_address:
+                sock.bind(source_address)
+            sock.setblocking(False)
+            err = sock.connect_ex(sockaddr)
+            if err != 0 and err not in _CONNECTING:
+                raise OSError(err, os.strerror(err))
+        except Exception:
+            sock.close()
+            raise
+        return (sock, err == 0)
+
+    def connect(self, addrs, timeout=None, source_address=None, socket_options=None):
+        """
+        Race the connection across the addresses, see above.
+        -> the connected socket, with `timeout` set
+        """
+        addrs = _interleave(addrs)
+        if len(addrs) == 0:
+            raise OSError("getaddrinfo returns an empty list")
+        if len(addrs) > 1:
+            environ.dns_counters["races"] += 1
+
+        t0 = time.monotonic()
+        deadline = None if timeout is None else t0 + timeout
+        selector = selectors.DefaultSelector()
+        attempts = {} # { sock: index of the address }
+        winner = None
+        error = None
+        ix = 0
+        next_at = t0
+
+        try:
+            while winner is None:
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    raise socket.timeout("timed out")
+
+                if ix < len(addrs) and (now >= next_at or len(attempts) == 0):
+                    try:
+                        sock, established = self._start(addrs[ix], source_address, socket_options)
+                    except OSError as e:
+                        error = e
+                        next_at = now
+                    else:
+                        if established:
+                            winner = (sock, ix)
+                            break
+                        attempts[sock] = ix
+                        selector.register(sock, selectors.EVENT_WRITE)
+                        next_at = now + self._delay
+                    ix += 1
+                    continue
+
+                if len(attempts) == 0:
+                    raise error
+
+                wait = None if ix == len(addrs) else max(0.0, next_at - now)
+                if deadline is not None:
+                    wait = deadline - now if wait is None else min(wait, deadline - now)
+
+                for key, _ in selector.select(wait):
+                    sock = key.fileobj
+                    selector.unregister(sock)
+                    aix = attempts.pop(sock)
+                    err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    if err == 0:
+                        winner = (sock, aix)
+                        break
+                    sock.close()
+                    error = OSError(err, os.strerror(err))
+                    next_at = now # start the next one at once
+        finally:
+            for sock in attempts.keys(): # the winner is never left in it
+                sock.close()
+            selector.close()
+
+        sock, aix = winner
+        if aix > 0:
+            environ.dns_counters["fallbacks"] += 1
+        sock.setblocking(True)
+        sock.settimeout(timeout)
+        return sock
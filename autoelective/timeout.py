@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: timeout.py
+# modified: 2026-10-18
+
+"""
+Adaptive request timeouts of a client, derived from the latency it has observed (see
+`histogram.py`):
+
+    connect     factor * percentile of the TCP + TLS handshakes of the client
+    read        factor * percentile of the TTFB of the endpoint
+
+Both are bounded to [min_timeout, the configured timeout], and the configured timeout is
+used until there are enough samples. A request stuck on an overloaded server then fails
+fast and the loop moves on to the next client, instead of blocking for the whole configured
+timeout. A timed-out request is recorded with its elapsed time, so if most requests become
+slower the percentile rises and the timeouts grow back towards the configured one.
+
+`electSupplement.do` always gets the configured timeout. The server may have accepted an
+election which is still being processed, cutting it short would lose the outcome.
+"""
+
+from .histogram import get_endpoint
+
+
+class AdaptiveTimeout(object):
+
+    MIN_SAMPLES = 20            # of the TTFB of an endpoint
+    MIN_CONNECT_SAMPLES = 5     # of the handshakes, connections are kept alive so they are rare
+    REFRESH_SAMPLES = 10        # recompute a timeout after this number of new samples
+    EXEMPT_ENDPOINTS = frozenset(["electSupplement.do"])
+
+    def __init__(self, percentile=99, factor=2.0, min_timeout=1.0):
+        self._percentile = percentile
+        self._factor = factor
+        self._min_timeout = min_timeout
+        self._read = {}             # { endpoint: (samples, timeout) }
+        self._connect = (0, None)   # (samples, timeout)
+
+    def _derive(self, h, min_samples, cached):
+        """ -> (samples, timeout), the cached one is kept until enough new samples come """
+        count = h.count
+        if count < min_samples:
+            return (count, None)
+        samples, timeout = cached
+        if timeout is not None and count - samples < self.__class__.REFRESH_SAMPLES:
+            return cached
+        timeout = self._factor * h.percentile(self._percentile)
+        return (count, max(self._min_timeout, timeout))
+
+    def get(self, stats, url, max_timeout):
+        """
+        stats: HTTPStats of the client, max_timeout: the configured timeout
+        -> (connect, read) in s
+        """
+        endpoint = get_endpoint(url)
+        if endpoint in self.__class__.EXEMPT_ENDPOINTS:
+            return (max_timeout, max_timeout)
+
+        self._connect = self._derive(stats.handshakes, self.__class__.MIN_CONNECT_SAMPLES, self._connect)
+        connect = self._connect[1]
+
+        read = None
+        es = stats.get(endpoint)
+        if es is not None:
+            cached = self._read.get(endpoint, (0, None))
+            self._read[endpoint] = cached = self._derive(es.histograms["ttfb"], self.__class__.MIN_SAMPLES, cached)
+            read = cached[1]
+
+        return (
+            max_timeout if connect is None else min(connect, max_timeout),
+            max_timeout if read is None else min(read, max_timeout),
+        )
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: warmer.py
+# modified: 2026-10-18
+
+"""
+Connection warming for pooled ElectiveClients.
+
+With several clients in rotation, a client sits idle for a few refresh intervals between
+two rounds, long enough for the server or a middlebox to close its kept-alive connection.
+Its next refresh then pays a new TCP and TLS handshake, or fails on the stale connection.
+So while the elective loop sleeps, the connections of the client of the next round are
+checked, and reopened if they're dropped or would have been idle for `max_idle` by the
+time they're used. The connections of all pooled clients are also opened at startup, so
+no handshake is left on the hot path. Nothing is sent over a warmed connection.
+
+The counters are kept in `environ.warm_counters`:
+
+    warms       clients warmed
+    opened      connections opened by warming
+    closed      idle connections closed by warming, dropped or too old
+    errors      warmings failed to open a connection
+"""
+
+from .environ import Environ
+from .logger import ConsoleLogger
+
+environ = Environ()
+cout = ConsoleLogger("warmer")
+
+
+class ConnectionWarmer(object):
+
+    def __init__(self, url, max_idle):
+        """
+        url             of the host to keep the connections to
+        max_idle        seconds a connection can be idle before it's reopened
+        """
+        self._url = url
+        self._max_idle = max_idle
+
+    @property
+    def max_idle(self):
+        return self._max_idle
+
+    def warm(self, client, delay=0.0):
+        """
+        Prepare the connections of the client for a request in `delay` s
+        -> True if it's ready
+        """
+        counters = environ.warm_counters
+        try:
+            opened, closed = client.warm(self._url, self._max_idle - delay)
+        except Exception as e:
+            counters["errors"] += 1
+            cout.warning("Unable to warm the connection of client: %s" % client.id)
+            cout.exception(e)
+            return False
+
+        counters["warms"] += 1
+        counters["opened"] += opened
+        counters["closed"] += closed
+        if opened > 0:
+            cout.info("Open a connection for client: %s (%d idle closed)" % (client.id, closed))
+        return True
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# File: bench_captcha.py
+# Created Date: 2026-10-18
+# Author: Rabbit
+# --------------------------------
+# Copyright (c) 2026 Rabbit
+
+"""
+Benchmark of the captcha pipeline.
+
+Every (backend, threads) configuration runs in a fresh process, so that thread settings
+and peak RSS don't leak between runs. The single mode times each stage of one captcha
+(GIF decode, extract_c0/extract_c123, crop, tensor build, forward), the batched mode
+times `split_captcha` + tensor build + forward for the whole batch.
+
+    $ cd test/
+    $ python3 bench_captcha.py -b torch,numpy -t 1,4 -B 1,16 -o result.json
+"""
+
+import sys
+sys.path.append("../")
+
+import os
+import time
+import platform
+import resource
+import multiprocessing
+from io import BytesIO
+from optparse import OptionParser
+import numpy as np
+from PIL import Image
+from autoelective.captcha import CaptchaRecognizer
+from autoelective.captcha import processor
+from autoelective.captcha.processor import split_captcha, extract_c0, extract_c123, crop
+from autoelective.const import CNN_MODEL_FILE
+from autoelective.utils import json_dump
+from autoelective import __version__
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), './data/')
+STAGES = ('decode', 'extract_c0', 'extract_c123', 'crop', 'tensor', 'forward', 'total')
+PERCENTILES = (50, 95, 99)
+
+
+def load_samples():
+    samples = []
+    for filename in sorted(os.listdir(DATA_DIR)):
+        if filename.endswith('.gif'):
+            with open(os.path.join(DATA_DIR, filename), 'rb') as fp:
+                samples.append(fp.read())
+    return samples
+
+def get_peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 if sys.platform != 'darwin' else rss / 1024 / 1024
+
+def summarize(ts):
+    ts = np.array(ts) * 1000
+    res = { "p%d_ms" % q: float(np.percentile(ts, q)) for q in PERCENTILES }
+    res["mean_ms"] = float(ts.mean())
+    return res
+
+def run_single(backend, im_data):
+    """ one captcha, stage by stage, mirrors split_captcha() and recognize_batch() """
+    N = 52
+    t = {}
+
+    t0 = time.perf_counter()
+    im = Image.open(BytesIO(im_data))
+    frames = processor._decode_frames(im)
+    M_merge = frames.min(axis=0)
+    im.close()
+    t1 = time.perf_counter()
+    t['decode'] = t1 - t0
+
+    h, w = M_merge.shape
+    M0_last = None
+    M_mask = np.zeros((h, w), dtype=np.uint8)
+    Xlist = []
+    t['extract_c0'] = t['extract_c123'] = t['crop'] = 0.0
+
+    for M0 in frames:
+        first = (M0_last is None)
+
+        t0 = time.perf_counter()
+        if first:
+            Mt = extract_c0(M0, M_merge)
+        else:
+            Mt = extract_c123(M0, M0_last)
+        M0_last = M0
+        Mt_inv = 0xff - Mt
+        Mt = 0xff - np.bitwise_and(Mt_inv, 0xff - M_mask)
+        M_mask = np.bitwise_or(M_mask, Mt_inv)
+        t1 = time.perf_counter()
+        t['extract_c0' if first else 'extract_c123'] += t1 - t0
+
+        Xlist.append(crop(Mt, first))
+        t['crop'] += time.perf_counter() - t1
+
+    t0 = time.perf_counter()
+    X = np.array(Xlist, dtype=np.float32).reshape(-1, 1, N, N)
+    t1 = time.perf_counter()
+    t['tensor'] = t1 - t0
+
+    backend.forward(X)
+    t['forward'] = time.perf_counter() - t1
+
+    t['total'] = sum(t.values())
+    return t
+
+def run_batch(backend, batch):
+    N = 52
+    t0 = time.perf_counter()
+    X = np.array([ split_captcha(im_data) for im_data in batch ], dtype=np.float32).reshape(-1, 1, N, N)
+    backend.forward(X)
+    return time.perf_counter() - t0
+
+def run_config(model_file, backend_name, num_threads, optimize, batch_sizes, images):
+    samples = load_samples()
+
+    t0 = time.perf_counter()
+    r = CaptchaRecognizer(model_file, backend=backend_name, optimize=optimize, num_threads=num_threads)
+    t_init = time.perf_counter() - t0
+    backend = r.backend
+
+    t0 = time.perf_counter()
+    r.recognize(samples[0])
+    t_first = time.perf_counter() - t0
+
+    ## single mode
+
+    records = { stage: [] for stage in STAGES }
+    for ix in range(images):
+        t = run_single(backend, samples[ix % len(samples)])
+        for stage in STAGES:
+            records[stage].append(t[stage])
+
+    single = { stage: summarize(ts) for stage, ts in records.items() }
+    single["throughput"] = images / sum(records['total'])
+
+    ## batched mode
+
+    batched = {}
+    for batch_size in batch_sizes:
+        batch = [ samples[ix % len(samples)] for ix in range(batch_size) ]
+        rounds = max(3, images // batch_size)
+        run_batch(backend, batch) # warm up
+        ts = [ run_batch(backend, batch) for _ in range(rounds) ]
+        res = summarize(ts)
+        res["per_image"] = summarize([ t / batch_size for t in ts ])
+        res["throughput"] = batch_size * rounds / sum(ts)
+        batched[str(batch_size)] = res
+
+    return {
+        "backend": backend_name,
+        "num_threads": num_threads,
+        "optimize": optimize,
+        "init_ms": t_init * 1000,
+        "first_captcha_ms": t_first * 1000,
+        "peak_rss_mb": get_peak_rss_mb(),
+        "single": single,
+        "batched": batched,
+    }
+
+def print_result(res):
+    print("> backend=%s, num_threads=%s, optimize=%s" % (res["backend"], res["num_threads"], res["optimize"]))
+    print("init %.1f ms, first captcha %.1f ms, peak rss %.1f MB" % (
+          res["init_ms"], res["first_captcha_ms"], res["peak_rss_mb"]))
+    print("%-14s %9s %9s %9s" % ("stage", "p50_ms", "p95_ms", "p99_ms"))
+    for stage in STAGES:
+        s = res["single"][stage]
+        print("%-14s %9.3f %9.3f %9.3f" % (stage, s["p50_ms"], s["p95_ms"], s["p99_ms"]))
+    print("single throughput: %.1f img/s" % res["single"]["throughput"])
+    print("%-10s %9s %9s %9s %14s %12s" % ("batch", "p50_ms", "p95_ms", "p99_ms", "img_p50_ms", "img/s"))
+    for batch_size, b in res["batched"].items():
+        print("%-10s %9.3f %9.3f %9.3f %14.3f %12.1f" % (
+              batch_size, b["p50_ms"], b["p95_ms"], b["p99_ms"], b["per_image"]["p50_ms"], b["throughput"]))
+    print("")
+
+def _split_ints(s):
+    return [ int(x) for x in s.split(',') if x.strip() ]
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-m', '--model', dest='model_file', default=CNN_MODEL_FILE)
+    parser.add_option('-b', '--backends', dest='backends', default='torch',
+                      help='comma separated backends, e.g. torch,numpy,opencv')
+    parser.add_option('-t', '--threads', dest='threads', default='0',
+                      help='comma separated intra-op thread counts, 0 means default')
+    parser.add_option('-B', '--batch-sizes', dest='batch_sizes', default='1,4,16,64')
+    parser.add_option('-n', '--images', dest='images', type='int', default=200,
+                      help='number of images for each mode')
+    parser.add_option('-O', '--optimize', dest='optimize', action='store_true', default=False,
+                      help='load the model in inference-optimized mode')
+    parser.add_option('-o', '--output', dest='output', default=None, metavar="FILE",
+                      help='write results to a JSON file')
+    options, args = parser.parse_args()
+
+    backends = [ b.strip() for b in options.backends.split(',') if b.strip() ]
+    batch_sizes = _split_ints(options.batch_sizes)
+
+    ctx = multiprocessing.get_context('spawn')
+    runs = []
+    for backend in backends:
+        for num_threads in _split_ints(options.threads):
+            with ctx.Pool(1) as pool:
+                res = pool.apply(run_config, (options.model_file, backend, num_threads,
+                                              options.optimize, batch_sizes, options.images))
+            print_result(res)
+            runs.append(res)
+
+    if options.output is not None:
+        json_dump({
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S%z"),
+                "version": __version__,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "model": os.path.basename(options.model_file),
+                "images": options.images,
+            },
+            "runs": runs,
+        }, options.output, indent=4)
+        print("Results are written to %s" % options.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# File: bench_client.py
+# Created Date: 2026-10-18
+# Author: Rabbit
+# --------------------------------
+# Copyright (c) 2026 Rabbit
+
+"""
+Client-side overhead per request of the hot ElectiveClient endpoints, building every
+request from scratch (`BaseClient.enable_templates = False`) vs patching the prepared
+templates. Requests go to a local HTTP stand-in running in another process, so the CPU
+time of this process is spent by the client only.
+
+    $ cd test/
+    $ python3 bench_client.py [-n 2000]
+"""
+
+import sys
+sys.path.append("../")
+
+import time
+import multiprocessing
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+from optparse import OptionParser
+import numpy as np
+
+_PAGE = '<html><head><title>补退选</title></head><body></body></html>'.encode('utf-8')
+_GIF = b'GIF89a' + b'\x00' * 2048
+_JSON = b'{"valid": "2"}'
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self):
+        path = urlparse(self.path).path
+        if path.endswith('DrawServlet'):
+            body, ctype = _GIF, 'image/gif'
+        elif path.endswith('validate.do'):
+            body, ctype = _JSON, 'application/json'
+        else:
+            body, ctype = _PAGE, 'text/html; charset=utf-8'
+        self.send_response(200)
+        self.send_header('Content-Type', ctype)
+        self.send_header('Content-Length', str(len(body)))
+        self._headers_buffer.append(b"\r\n" + body)  # a single write, no delayed ACK
+        self.flush_headers()
+
+    do_GET = _reply
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self._reply()
+
+def _serve(queue):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StandInHandler)
+    queue.put(server.server_address[1])
+    server.serve_forever()
+
+def _point_to(port):
+    from autoelective.const import ElectiveURL
+    base = 'http://127.0.0.1:%d' % port
+    for key, value in list(vars(ElectiveURL).items()):
+        if isinstance(value, str) and value.startswith('http'):
+            setattr(ElectiveURL, key, base + urlparse(value).path)
+    ElectiveURL.Scheme = 'http'
+    ElectiveURL.Host = '127.0.0.1:%d' % port
+
+
+def bench(client, fn, rounds):
+    for _ in range(20):
+        fn(client)
+    latency = np.zeros(rounds)
+    c0 = time.process_time()
+    for ix in range(rounds):
+        t0 = time.perf_counter()
+        fn(client)
+        latency[ix] = time.perf_counter() - t0
+    cpu = time.process_time() - c0
+    return latency * 1000, cpu / rounds * 1e6
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-n', '--rounds', dest='rounds', type='int', default=2000)
+    options, args = parser.parse_args()
+
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    server = ctx.Process(target=_serve, args=(queue,), daemon=True)
+    server.start()
+    _point_to(queue.get())
+
+    from autoelective.client import BaseClient
+    from autoelective.elective import ElectiveClient
+
+    href = "/elective2008/edu/pku/stu/elective/controller/supplement/electSupplement.do?index=1&seq=abc"
+    endpoints = [
+        ("SupplyCancel", lambda c: c.get_SupplyCancel("1800012345")),
+        ("supplement", lambda c: c.get_supplement("1800012345", page=2)),
+        ("DrawServlet", lambda c: c.get_DrawServlet()),
+        ("Validate", lambda c: c.get_Validate("1800012345", "ab3d")),
+        ("ElectSupplement", lambda c: c.get_ElectSupplement(href)),
+    ]
+
+    print("%-16s %-9s %8s %8s %8s %12s" % ("endpoint", "templates", "p50_ms", "p99_ms", "mean_ms", "cpu_us/req"))
+    for name, fn in endpoints:
+        for enable in (False, True):
+            BaseClient.enable_templates = enable
+            client = ElectiveClient(0)
+            client.set_user_agent("Mozilla/5.0")
+            latency, cpu = bench(client, fn, options.rounds)
+            print("%-16s %-9s %8.3f %8.3f %8.3f %12.1f" % (
+                  name, "on" if enable else "off", np.percentile(latency, 50), np.percentile(latency, 99),
+                  latency.mean(), cpu))
+
+    server.terminate()
+
+if __name__ == "__main__":
+    main()
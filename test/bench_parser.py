@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# File: bench_parser.py
+# Created Date: 2026-10-18
+# Author: Rabbit
+# --------------------------------
+# Copyright (c) 2026 Rabbit
+
+"""
+Per-page parse time of the recorded responses (dumped with `debug_dump_request = true`),
+`etree.HTML(r.text)` vs `parser.get_tree_from_response(r)`, with the charset declared in
+Content-Type as recorded and without it, where requests has to detect the encoding.
+
+    $ cd test/
+    $ python3 bench_parser.py [-d log/request/<user>] [-n 50]
+"""
+
+import sys
+sys.path.append("../")
+
+import os
+import time
+import glob
+from optparse import OptionParser
+import numpy as np
+from lxml import etree
+from autoelective.const import REQUEST_LOG_DIR
+from autoelective.client import BaseClient
+from autoelective.parser import get_tree_from_response, remember_response_encoding, get_title
+from autoelective.utils import pickle_gzip_load
+
+
+class _Client(BaseClient):
+    pass
+
+
+def load_pages(folders):
+    pages = []
+    for folder in folders:
+        for file in sorted(glob.glob(os.path.join(folder, "**", "*.gz"), recursive=True)):
+            r = pickle_gzip_load(file)
+            if "html" in r.headers.get("Content-Type", "") and len(r.content) > 0:
+                pages.append(r)
+    return pages
+
+def undeclare(r):
+    r.headers["Content-Type"] = "text/html"
+    r.encoding = None
+
+def parse_old(r):
+    return etree.HTML(r.text)  # detects the encoding on every access if it's unknown
+
+def parse_new(r):
+    tree = get_tree_from_response(r)
+    remember_response_encoding(r)  # as check_elective_title does for a known page
+    return tree
+
+def bench(pages, fn, rounds):
+    for r in pages:
+        fn(r)
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for r in pages:
+            fn(r)
+    return (time.perf_counter() - t0) / rounds / len(pages) * 1000
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-d', '--dir', dest='folders', action='append', default=None,
+                      help='folders of dumped requests, default to log/request/')
+    parser.add_option('-n', '--rounds', dest='rounds', type='int', default=50)
+    options, args = parser.parse_args()
+
+    pages = load_pages(options.folders or [REQUEST_LOG_DIR])
+    if len(pages) == 0:
+        print("No recorded HTML page, run with `debug_dump_request = true` first")
+        return
+
+    sizes = [ len(r.content) for r in pages ]
+    print("pages: %d, mean size: %.1f KB" % (len(pages), np.mean(sizes) / 1024))
+    print("%-10s %10s %10s %10s %8s" % ("charset", "old_ms", "new_ms", "saved_ms", "same"))
+
+    for declared in (True, False):
+        client = _Client()  # a fresh session, the encoding is detected once
+        for r in pages:
+            r.request._client = client
+            if not declared:
+                undeclare(r)
+
+        same = all( get_title(parse_new(r)) == get_title(etree.HTML(r.content.decode(r.apparent_encoding)))
+                    for r in pages )
+        t_old = bench(pages, parse_old, options.rounds)
+        t_new = bench(pages, parse_new, options.rounds)
+        print("%-10s %10.3f %10.3f %10.3f %8s" % (
+              "declared" if declared else "detected", t_old, t_new, t_old - t_new, same))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# File: bench_startup.py
+# Created Date: 2026-10-18
+# Author: Rabbit
+# --------------------------------
+# Copyright (c) 2026 Rabbit
+
+"""
+Recognizer construction time and per-process RSS, loading the model from the .pt file
+(unpickle and copy) vs mapping the flat weight files. Every case runs in a fresh process,
+`cold` evicts the model files from the page cache first, `warm` runs right after.
+
+    $ cd test/
+    $ python3 bench_startup.py [-m MODEL] [-b torch,numpy] [-n 3]
+"""
+
+import sys
+sys.path.append("../")
+
+import os
+import time
+import multiprocessing
+from optparse import OptionParser
+from autoelective.const import CNN_MODEL_FILE
+from autoelective.captcha.weights import get_flat_file, load_state_dict
+from autoelective.captcha.npcnn import load_weights
+
+
+def read_rss_kb():
+    res = {}
+    with open("/proc/self/status") as fp:
+        for line in fp:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "RssAnon", "RssFile"):
+                res[key] = int(value.split()[0])
+    return res
+
+def evict(files):
+    for file in files:
+        if not os.path.exists(file):
+            continue
+        with open(file, 'rb') as fp:
+            os.posix_fadvise(fp.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+def construct(model_file, backend, source):
+    if backend == "torch":
+        import torch  # import cost is excluded
+    from autoelective.captcha.backend import get_backend_class
+
+    rss0 = read_rss_kb()
+    t0 = time.perf_counter()
+
+    if source == "flat":
+        model = get_backend_class(backend)(model_file, optimize=True)
+    elif backend == "torch":
+        from autoelective.captcha.cnn import CaptchaCNN
+        model = CaptchaCNN()
+        model.load_state_dict(torch.load(model_file, map_location='cpu'))
+        model.eval()
+        model.fold_batchnorm()
+    else:
+        from autoelective.captcha.npcnn import NumpyCaptchaCNN, convert_state_dict, load_torch_state_dict
+        model = NumpyCaptchaCNN(convert_state_dict(load_torch_state_dict(model_file)))
+
+    t1 = time.perf_counter()
+    rss1 = read_rss_kb()
+
+    return {
+        "construct_ms": (t1 - t0) * 1000,
+        "rss_delta_mb": (rss1["VmRSS"] - rss0["VmRSS"]) / 1024,
+        "anon_delta_mb": (rss1.get("RssAnon", 0) - rss0.get("RssAnon", 0)) / 1024,
+        "file_delta_mb": (rss1.get("RssFile", 0) - rss0.get("RssFile", 0)) / 1024,
+    }
+
+def run(model_file, backend, source, cold):
+    files = [ model_file, get_flat_file(model_file, "torch"), get_flat_file(model_file, "numpy") ]
+    if cold:
+        evict(files)
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(1) as pool:
+        return pool.apply(construct, (model_file, backend, source))
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-m', '--model', dest='model_file', default=CNN_MODEL_FILE)
+    parser.add_option('-b', '--backends', dest='backends', default='torch,numpy')
+    parser.add_option('-n', '--rounds', dest='rounds', type='int', default=3)
+    options, args = parser.parse_args()
+
+    load_state_dict(options.model_file)  # convert the flat files in advance
+    load_weights(options.model_file)
+
+    print("%-8s %-6s %-6s %14s %14s %14s %14s" % (
+          "backend", "source", "cache", "construct_ms", "rss_delta_mb", "anon_delta_mb", "file_delta_mb"))
+
+    for backend in options.backends.split(','):
+        for source in ("pt", "flat"):
+            for cold in (True, False):
+                res = [ run(options.model_file, backend, source, cold) for _ in range(options.rounds) ]
+                mean = lambda key: sum( r[key] for r in res ) / len(res)
+                print("%-8s %-6s %-6s %14.1f %14.1f %14.1f %14.1f" % (
+                      backend, source, "cold" if cold else "warm", mean("construct_ms"),
+                      mean("rss_delta_mb"), mean("anon_delta_mb"), mean("file_delta_mb")))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# File: test_backend.py
+# Created Date: 2026-10-18
+# Author: Rabbit
+# --------------------------------
+# Copyright (c) 2026 Rabbit
+
+import sys
+sys.path.append("../")
+
+import os
+import numpy as np
+from autoelective.captcha import CaptchaRecognizer
+from autoelective.captcha.processor import split_captcha
+from autoelective.const import CNN_MODEL_FILE
+
+CODES = ['er47', 'rskh', 'uesg', 'skwc', 'mmfk']
+BACKENDS = ['numpy', 'opencv']
+
+
+def load_captcha(code):
+    filepath = os.path.join(os.path.dirname(__file__), './data/%s.gif' % code)
+    with open(filepath, 'rb') as fp:
+        return fp.read()
+
+def check_parity(r0, r, samples):
+    X = np.array([ split_captcha(im_data) for im_data in samples ], dtype=np.float32).reshape(-1, 1, 52, 52)
+    y0 = r0.backend.forward(X)
+    y = r.backend.forward(X)
+    diff = np.abs(y0 - y).max()
+    codes0 = [ c.code for c in r0.recognize_batch(samples) ]
+    codes = [ c.code for c in r.recognize_batch(samples) ]
+    print("max_abs_diff: %.3g" % diff)
+    for code, c0, c in zip(CODES, codes0, codes):
+        print(code, c0, c, c0 == c)
+    assert diff < 1e-3
+    assert codes0 == codes
+
+def main():
+    model_file = sys.argv[1] if len(sys.argv) > 1 else CNN_MODEL_FILE
+    samples = [ load_captcha(code) for code in CODES ]
+    r0 = CaptchaRecognizer(model_file, backend="torch")
+    for backend in BACKENDS:
+        print("> torch vs %s" % backend)
+        r = CaptchaRecognizer(model_file, backend=backend)
+        check_parity(r0, r, samples)
+        print("")
+
+if __name__ == "__main__":
+    main()
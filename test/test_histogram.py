@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# File: test_histogram.py
+# Created Date: 2026-10-18
+# Author: Rabbit
+# --------------------------------
+# Copyright (c) 2026 Rabbit
+
+import sys
+sys.path.append("../")
+
+import numpy as np
+from autoelective.histogram import LatencyHistogram, HTTPStats
+from autoelective.timeout import AdaptiveTimeout
+
+
+def make_histogram(values):
+    h = LatencyHistogram()
+    for v in values:
+        h.add(v)
+    return h
+
+def test_percentile():
+    rng = np.random.RandomState(0)
+    values = rng.lognormal(np.log(0.05), 1.0, 10000)
+    h = make_histogram(values)
+    for q in (50, 90, 99):
+        exact = np.percentile(values, q)
+        approx = h.percentile(q)
+        print("p%d: %.3f ms vs %.3f ms" % (q, exact * 1000, approx * 1000))
+        assert abs(approx - exact) / exact < 0.1
+    assert h.count == len(values)
+    assert h.max == values.max()
+
+def test_merge():
+    rng = np.random.RandomState(1)
+    a, b = rng.exponential(0.02, 500), rng.exponential(0.2, 300)
+    h = make_histogram(a).merge(make_histogram(b))
+    h0 = make_histogram(np.concatenate([a, b]))
+    assert h.summary() == h0.summary()
+
+    s1, s2 = HTTPStats(), HTTPStats()
+    s1.add("DrawServlet", (0.001, 0.002, 0.01), 0.02, 0.001, 0.034, 1024)
+    s2.add("DrawServlet", None, 0.03, 0.001, 0.031, 1024)
+    s2.add_error("validate.do")
+    total = HTTPStats().merge(s1).merge(s2).summary()
+    assert total["DrawServlet"]["requests"] == 2
+    assert total["DrawServlet"]["new_connections"] == 1
+    assert total["DrawServlet"]["reused_connections"] == 1
+    assert total["DrawServlet"]["latency"]["tls"]["count"] == 1
+    assert total["validate.do"]["errors"] == 1
+
+def test_adaptive_timeout():
+    url = "https://elective.pku.edu.cn/elective2008/edu/pku/stu/elective/controller/supplement/SupplyCancel.do"
+    stats = HTTPStats()
+    timeout = AdaptiveTimeout(percentile=99, factor=2.0, min_timeout=0.05)
+    assert timeout.get(stats, url, 10) == (10, 10)  # no sample yet
+
+    for _ in range(AdaptiveTimeout.MIN_SAMPLES):
+        stats.add("SupplyCancel.do", (0.001, 0.01, 0.02), 0.2, 0.001, 0.25, 1024)
+    connect, read = timeout.get(stats, url, 10)
+    print("connect: %.3f s, read: %.3f s" % (connect, read))
+    assert 0.06 <= connect < 0.07 and 0.4 <= read < 0.45
+    assert timeout.get(stats, url, 0.3) == (connect, 0.3)  # bounded by the configured one
+
+    # requests timed out at the adaptive timeout pull it back up
+    for _ in range(AdaptiveTimeout.REFRESH_SAMPLES):
+        stats.add_timeout("SupplyCancel.do", False, read)
+    assert timeout.get(stats, url, 10)[1] > read
+
+def main():
+    test_percentile()
+    test_merge()
+    test_adaptive_timeout()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# File: test_resolver.py
+# Created Date: 2026-10-18
+# Author: Rabbit
+# --------------------------------
+# Copyright (c) 2026 Rabbit
+
+import sys
+sys.path.append("../")
+
+import time
+import socket
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from requests import Session
+from autoelective.environ import Environ
+from autoelective.resolver import Resolver
+from autoelective.adapter import InstrumentedHTTPAdapter
+from autoelective.histogram import HTTPStats
+
+environ = Environ()
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = self.server.server_address[0].encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(host, port=0):
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def get_addrs(hosts, port):
+    return [ socket.getaddrinfo(host, port, socket.AF_INET, socket.SOCK_STREAM)[0] for host in hosts ]
+
+def make_blackhole(host):
+    """ -> (port, sockets to close), a connection to it hangs since its backlog is full """
+    listener = socket.socket()
+    listener.bind((host, 0))
+    listener.listen(0)
+    port = listener.getsockname()[1]
+    socks = [listener]
+    for _ in range(8):
+        s = socket.socket()
+        s.setblocking(False)
+        s.connect_ex((host, port))
+        socks.append(s)
+    time.sleep(0.1)
+    return port, socks
+
+def test_cache_and_pins():
+    resolver = Resolver(ttl=0.2, pins={ "Elective.Test": ["127.0.0.2", "127.0.0.3"] })
+
+    addrs = resolver.resolve("elective.test", 443)
+    assert [ addr[4][0] for addr in addrs ] == ["127.0.0.2", "127.0.0.3"]
+
+    n = environ.dns_counters["lookups"]
+    resolver.resolve("localhost", 80)
+    resolver.resolve("localhost", 80)
+    assert environ.dns_counters["lookups"] == n + 1
+    time.sleep(0.25)
+    resolver.resolve("localhost", 80)
+    assert environ.dns_counters["lookups"] == n + 2
+
+def test_race():
+    server = start_server("127.0.0.3")
+    port = server.server_address[1]
+    resolver = Resolver(delay=0.1)
+
+    # a refused address is skipped at once, nothing listens on 127.0.0.2
+    t0 = time.time()
+    sock = resolver.connect(get_addrs(["127.0.0.2", "127.0.0.3"], port), timeout=2)
+    assert sock.getpeername() == ("127.0.0.3", port)
+    assert time.time() - t0 < 0.1
+    sock.close()
+
+    # a hanging address is raced by the next one after the delay
+    hanging_port, socks = make_blackhole("127.0.0.4")
+    addrs = [ socket.getaddrinfo("127.0.0.4", hanging_port, socket.AF_INET, socket.SOCK_STREAM)[0] ] \
+            + get_addrs(["127.0.0.3"], port)
+    n = environ.dns_counters["fallbacks"]
+    t0 = time.time()
+    sock = resolver.connect(addrs, timeout=2)
+    elapsed = time.time() - t0
+    print("connected to %s in %.3f s" % (sock.getpeername(), elapsed))
+    assert sock.getpeername() == ("127.0.0.3", port)
+    assert 0.1 <= elapsed < 0.5
+    assert environ.dns_counters["fallbacks"] == n + 1
+    sock.close()
+
+    # no address is reachable in time
+    addrs = [ socket.getaddrinfo("127.0.0.4", hanging_port, socket.AF_INET, socket.SOCK_STREAM)[0] ]
+    try:
+        resolver.connect(addrs, timeout=0.2)
+    except socket.timeout:
+        pass
+    else:
+        raise AssertionError("connect() should time out")
+    for s in socks:
+        s.close()
+    server.shutdown()
+    server.server_close()
+
+def test_pinned_request():
+    server = start_server("127.0.0.7")
+    port = server.server_address[1]
+
+    # the first pinned address refuses the connection
+    resolver = Resolver(pins={ "elective.test": ["127.0.0.6", "127.0.0.7"] }, delay=0.1)
+    session = Session()
+    session.mount("http://", InstrumentedHTTPAdapter(HTTPStats(), resolver=resolver))
+    r = session.get("http://elective.test:%d/" % port, timeout=2)
+    assert r.text == "127.0.0.7"
+    server.shutdown()
+    server.server_close()
+
+def main():
+    test_cache_and_pins()
+    test_race()
+    test_pinned_request()
+
+if __name__ == "__main__":
+    main()